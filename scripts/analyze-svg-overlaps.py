@@ -1,13 +1,83 @@
 #!/usr/bin/env python3
-"""Analyze SVG files for potential visual issues like text overlap, clipping, etc."""
+"""Analyze SVG files for potential visual issues like text overlap, clipping, etc.
+
+Checks:
+1. Text outside the viewBox
+2. Significant text-on-text overlap
+3. Text overflowing the shape it sits in: each text is assigned to the
+   topmost rect, circle or ellipse drawn before it that contains its
+   anchor point, found through a grid index of the shapes, and reported
+   when its estimated box crosses any side of that shape's box (with the
+   margin on every side). Same-fill shapes around the anchor count as one,
+   as in a rounded header squared off by a second rect.
+
+Text boxes are estimated from Liberation Sans advance widths, using the
+font-size, font-weight and text-anchor from attributes or inline styles
+(inherited from parent groups). Text under a rotate/scale/matrix transform
+is skipped by the containment check, as only translate() is followed.
+
+HTML diagrams (ebooks/<book>/assets/*.html) are extracted with
+extract-svg.py first, as the build does, so no build is needed. The exit
+status is 1 if any issue is found.
+"""
 
 import sys
 import re
 import glob
+import importlib.util
+import os
+import tempfile
+from collections import defaultdict
 from dataclasses import dataclass
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 import xml.etree.ElementTree as ET
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Liberation Sans advance widths (per 1000 em) for ASCII 32-126; it is
+# metric-compatible with Arial
+REGULAR_WIDTHS = (
+    [278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278]
+    + [556] * 10
+    + [278, 278, 584, 584, 584, 556, 1015]
+    + [667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833,
+       722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611]
+    + [278, 278, 278, 469, 556, 333]
+    + [556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833,
+       556, 556, 556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500]
+    + [334, 260, 334, 584]
+)
+BOLD_WIDTHS = (
+    [278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278]
+    + [556] * 10
+    + [333, 333, 584, 584, 584, 611, 975]
+    + [722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833,
+       722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611]
+    + [333, 278, 333, 584, 556, 333]
+    + [556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889,
+       611, 611, 611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500]
+    + [389, 280, 389, 584]
+)
+# Other Latin-1 characters, and symbols such as arrows and dashes
+LATIN_WIDTH = 556
+SYMBOL_WIDTH = 1000
+
+# Glyph extent above and below the baseline, in em: capitals, digits and
+# ascenders reach ASCENT, other lowercase letters X_HEIGHT
+ASCENT = 0.73
+X_HEIGHT = 0.53
+DESCENT = 0.21
+SHORT_CHARACTERS = set('acegmnopqrsuvwxyz .,:;-_=~')
+DESCENDING_CHARACTERS = set('gjpqyQ,;()[]{}|/@$')
+
+TEXT_PROPERTIES = ('font-size', 'font-weight', 'text-anchor')
+STYLE_PROPERTY_PATTERN = re.compile(r'([\w-]+)\s*:\s*([^;]+)')
+
+# Estimated widths are approximate, so smaller overflows aren't reported
+OVERFLOW_TOLERANCE = 1.0
+# Grid cell size for the rect index, in user units
+INDEX_CELL = 64
+
 @dataclass
 class BoundingBox:
     x: float
@@ -31,6 +101,47 @@ class BoundingBox:
         y_overlap = max(0, min(self.y + self.height, other.y + other.height) - max(self.y, other.y))
         return x_overlap * y_overlap
 
+    def contains(self, x: float, y: float) -> bool:
+        """Check if a point lies strictly inside the box (a label starting on an edge is outside)."""
+        return self.x < x < self.x + self.width and self.y < y < self.y + self.height
+
+
+class RectIndex:
+    """Grid index of shape boxes, so the shapes around a point are found in one cell."""
+
+    def __init__(self, rects: List[Tuple[int, BoundingBox, str]]):
+        self.cells: Dict[Tuple[int, int], List[Tuple[int, BoundingBox, str]]] = defaultdict(list)
+        for order, box, fill in rects:
+            for cx in range(int(box.x // INDEX_CELL), int((box.x + box.width) // INDEX_CELL) + 1):
+                for cy in range(int(box.y // INDEX_CELL), int((box.y + box.height) // INDEX_CELL) + 1):
+                    self.cells[(cx, cy)].append((order, box, fill))
+
+    def enclosing(self, x: float, y: float, before: int) -> List[Tuple[BoundingBox, str]]:
+        """Return the shapes drawn before `before` that contain (x, y), topmost first."""
+        found = [(order, box, fill) for order, box, fill
+                 in self.cells.get((int(x // INDEX_CELL), int(y // INDEX_CELL)), ())
+                 if order < before and box.contains(x, y)]
+        return [(box, fill) for order, box, fill in sorted(found, key=lambda item: -item[0])]
+
+
+def container_region(candidates: List[Tuple[BoundingBox, str]], min_height: float) -> Optional[BoundingBox]:
+    """The box a text sits in: the topmost enclosing shape at least as tall as the text.
+
+    Rects of the same fill around the same point are drawn as one shape
+    (e.g. a rounded header whose bottom corners are squared off by a second
+    rect), so the region is their union.
+    """
+    candidates = [(box, fill) for box, fill in candidates if box.height >= min_height]
+    if not candidates:
+        return None
+    container, fill = candidates[0]
+    same_fill = [box for box, other in candidates if other == fill]
+    left = min(box.x for box in same_fill)
+    top = min(box.y for box in same_fill)
+    right = max(box.x + box.width for box in same_fill)
+    bottom = max(box.y + box.height for box in same_fill)
+    return BoundingBox(left, top, right - left, bottom - top, container.label)
+
 def parse_transform(transform: str) -> Tuple[float, float]:
     """Extract translate(x, y) values from transform attribute."""
     if not transform:
@@ -42,35 +153,68 @@ def parse_transform(transform: str) -> Tuple[float, float]:
         return x, y
     return 0, 0
 
-def get_text_bbox(elem, parent_transform: Tuple[float, float] = (0, 0)) -> Optional[BoundingBox]:
-    """Estimate bounding box for a text element."""
+def text_properties(elem, inherited: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Font size, weight and anchor for an element, from attributes or its style.
+
+    An inline style wins over the attribute, and unset properties are inherited.
+    """
+    properties = dict(inherited or {})
+    for name in TEXT_PROPERTIES:
+        if elem.get(name):
+            properties[name] = elem.get(name)
+    for name, value in STYLE_PROPERTY_PATTERN.findall(elem.get('style', '')):
+        if name in TEXT_PROPERTIES:
+            properties[name] = value.strip()
+    return properties
+
+
+def text_width(text: str, font_size: float, bold: bool) -> float:
+    """Estimate the advance width of a string in Liberation Sans."""
+    widths = BOLD_WIDTHS if bold else REGULAR_WIDTHS
+    total = 0
+    for char in text:
+        code = ord(char)
+        if 32 <= code <= 126:
+            total += widths[code - 32]
+        else:
+            total += LATIN_WIDTH if code < 0x2000 else SYMBOL_WIDTH
+    return total * font_size / 1000
+
+
+def get_text_bbox(elem, parent_transform: Tuple[float, float] = (0, 0),
+                  properties: Optional[Dict[str, str]] = None) -> Optional[BoundingBox]:
+    """Estimate bounding box for a text element.
+
+    properties are the text properties inherited from its parents.
+    """
     try:
         x = float(elem.get('x', 0)) + parent_transform[0]
         y = float(elem.get('y', 0)) + parent_transform[1]
-        text = elem.text or ''
+        text = ''.join(elem.itertext())
+        properties = text_properties(elem, properties)
 
-        # Estimate width based on font size and character count
         font_size = 12  # default
-        fs_attr = elem.get('font-size', '')
-        if fs_attr:
-            try:
-                font_size = float(fs_attr.replace('px', ''))
-            except:
-                pass
+        try:
+            font_size = float(properties.get('font-size', '12').replace('px', ''))
+        except ValueError:
+            pass
+        weight = properties.get('font-weight', 'normal')
+        bold = weight in ('bold', 'bolder') or (weight.isdigit() and int(weight) >= 600)
 
-        # Rough estimate: each character is about 0.6 * font_size wide
-        width = len(text) * font_size * 0.6
-        height = font_size * 1.2
+        width = text_width(text.strip(), font_size, bold)
+        ascent = X_HEIGHT if set(text) <= SHORT_CHARACTERS else ASCENT
+        descent = DESCENT if DESCENDING_CHARACTERS & set(text) else 0
+        height = font_size * (ascent + descent)
 
         # Adjust for text-anchor
-        anchor = elem.get('text-anchor', 'start')
+        anchor = properties.get('text-anchor', 'start')
         if anchor == 'middle':
             x -= width / 2
         elif anchor == 'end':
             x -= width
 
         # Y is baseline, so adjust up
-        y -= font_size * 0.8
+        y -= font_size * ascent
 
         if width > 0 and text.strip():
             return BoundingBox(x, y, width, height, f"text: '{text[:30]}..'" if len(text) > 30 else f"text: '{text}'")
@@ -91,6 +235,19 @@ def get_rect_bbox(elem, parent_transform: Tuple[float, float] = (0, 0)) -> Optio
         pass
     return None
 
+def get_circle_bbox(elem, parent_transform: Tuple[float, float] = (0, 0)) -> Optional[BoundingBox]:
+    """Get bounding box for a circle or ellipse element."""
+    try:
+        cx = float(elem.get('cx', 0)) + parent_transform[0]
+        cy = float(elem.get('cy', 0)) + parent_transform[1]
+        rx = float(elem.get('rx', elem.get('r', 0)))
+        ry = float(elem.get('ry', elem.get('r', 0)))
+        if rx > 0 and ry > 0:
+            return BoundingBox(cx - rx, cy - ry, 2 * rx, 2 * ry, f"{elem.tag.split('}')[-1]}({2 * rx:g}x{2 * ry:g})")
+    except ValueError:
+        pass
+    return None
+
 def analyze_svg(filepath: str) -> List[str]:
     """Analyze an SVG file for visual issues."""
     issues = []
@@ -110,36 +267,80 @@ def analyze_svg(filepath: str) -> List[str]:
     except:
         vb_width, vb_height = 900, 500
 
-    # Namespace handling
-    ns = {'svg': 'http://www.w3.org/2000/svg'}
-
-    # Collect all text elements with their bounding boxes
+    # Collect all text elements with their bounding boxes, and the shapes
+    # (with their document order and fill) that text may sit in
     text_boxes = []
+    contained_texts = []
+    rects = []
+    order = 0
+
+    def process_element(elem, parent_transform=(0, 0), inherited=None, exact=True):
+        nonlocal order
+        order += 1
 
-    def process_element(elem, parent_transform=(0, 0)):
         # Get this element's transform
         transform = elem.get('transform', '')
         tx, ty = parse_transform(transform)
         current_transform = (parent_transform[0] + tx, parent_transform[1] + ty)
+        exact = exact and not re.search(r'rotate|scale|matrix|skew', transform)
+        properties = text_properties(elem, inherited)
 
         # Handle text elements
         tag = elem.tag.replace('{http://www.w3.org/2000/svg}', '')
         if tag == 'text':
-            bbox = get_text_bbox(elem, current_transform)
+            bbox = get_text_bbox(elem, current_transform, inherited)
             if bbox:
                 text_boxes.append(bbox)
+                if exact:
+                    contained_texts.append((order, bbox, properties.get('text-anchor', 'start')))
                 # Check if text is outside viewBox
                 if bbox.x < -50 or bbox.x + bbox.width > vb_width + 50:
                     issues.append(f"Text possibly outside horizontal bounds: {bbox.label} at x={bbox.x:.0f}")
                 if bbox.y < -50 or bbox.y + bbox.height > vb_height + 50:
                     issues.append(f"Text possibly outside vertical bounds: {bbox.label} at y={bbox.y:.0f}")
+            return
+        if tag in ('rect', 'circle', 'ellipse') and exact:
+            if tag == 'rect':
+                bbox = get_rect_bbox(elem, current_transform)
+            else:
+                bbox = get_circle_bbox(elem, current_transform)
+            # A background covering the canvas is left to the viewBox check
+            if bbox and not (bbox.width >= vb_width * 0.95 and bbox.height >= vb_height * 0.95):
+                fill = elem.get('fill', '')
+                for name, value in STYLE_PROPERTY_PATTERN.findall(elem.get('style', '')):
+                    if name == 'fill':
+                        fill = value.strip()
+                rects.append((order, bbox, fill))
 
         # Recursively process children
         for child in elem:
-            process_element(child, current_transform)
+            process_element(child, current_transform, properties, exact)
 
     process_element(root)
 
+    # Check for text overflowing the shape it sits in
+    index = RectIndex(rects)
+    for text_order, box, anchor in contained_texts:
+        anchor_x = box.x + {'middle': box.width / 2, 'end': box.width}.get(anchor, 0)
+        rect = container_region(index.enclosing(anchor_x, box.y + box.height / 2, text_order),
+                                box.height)
+        if rect is None:
+            continue
+        margins = {
+            'left': box.x - rect.x,
+            'right': rect.x + rect.width - (box.x + box.width),
+            'top': box.y - rect.y,
+            'bottom': rect.y + rect.height - (box.y + box.height),
+        }
+        overflow = [side for side, margin in margins.items() if margin < -OVERFLOW_TOLERANCE]
+        if overflow:
+            sides = ', '.join(f"{side} by {-margins[side]:.0f}px" for side in overflow)
+            shown = ', '.join(f"{side} {margin:.0f}" for side, margin in margins.items())
+            issues.append(
+                f"Text overflows its {rect.label} at ({rect.x:.0f}, {rect.y:.0f}) on the {sides}: "
+                f"{box.label} (margins {shown})"
+            )
+
     # Check for text overlaps (only significant overlaps)
     for i, box1 in enumerate(text_boxes):
         for box2 in text_boxes[i+1:]:
@@ -150,10 +351,38 @@ def analyze_svg(filepath: str) -> List[str]:
 
     return issues
 
+def load_extractor():
+    """Import extract-svg.py, whose hyphenated name blocks a normal import."""
+    spec = importlib.util.spec_from_file_location(
+        'extract_svg', os.path.join(SCRIPT_DIR, 'extract-svg.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def analyze_file(filepath: str, extract_svg=None) -> List[str]:
+    """Analyze an SVG file, or the diagram in an HTML file."""
+    if not filepath.endswith('.html'):
+        return analyze_svg(filepath)
+    fd, svg_path = tempfile.mkstemp(suffix='.svg')
+    os.close(fd)
+    try:
+        try:
+            extract_svg(filepath, svg_path)
+        except ValueError as e:
+            return [str(e)]
+        return analyze_svg(svg_path)
+    finally:
+        if os.path.exists(svg_path):
+            os.unlink(svg_path)
+
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: analyze-svg-overlaps.py <glob-pattern>")
         print("Example: analyze-svg-overlaps.py 'build/api-optimization/assets/*.svg'")
+        print("         analyze-svg-overlaps.py 'ebooks/*/assets/*.html'")
         sys.exit(1)
 
     pattern = sys.argv[1]
@@ -165,9 +394,10 @@ def main():
 
     print(f"Analyzing {len(files)} SVG files...\n")
 
+    extract_svg = load_extractor().extract_svg if any(f.endswith('.html') for f in files) else None
     total_issues = 0
     for filepath in files:
-        issues = analyze_svg(filepath)
+        issues = analyze_file(filepath, extract_svg)
         if issues:
             filename = filepath.split('/')[-1]
             print(f"=== {filename} ===")
@@ -180,6 +410,7 @@ def main():
         print("No significant issues detected!")
     else:
         print(f"\nTotal issues found: {total_issues}")
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Benchmark the scripts/ toolchain against the real and scaled corpora.
+
+Runs each tool over every chapter or diagram in ebooks/* (or a corpus
+written by generate-corpus.py, via --corpus), then over
+corpora scaled up by replicating those files (10x, 100x, ...). Each
+tool/scale case runs in its own child process so peak RSS is measured per
+case. Reports wall time, peak RSS and per-file throughput, and compares
+them against a stored baseline.
+
+Tools benchmarked:
+  extract-svg        - extract_svg() on every diagram
+  lint-html          - lint-html-diagrams.py lint_file() on every diagram
+  lint-markdown      - lint-markdown.py check_file() on every chapter
+  plagiarism-extract - check-plagiarism.py passage extraction per chapter
+
+The markdown block cache is redirected to an empty temp directory and
+disabled for the run, so replicated chapters are measured cold rather
+than as cache hits.
+
+Usage:
+  benchmark.py                         # run, compare against the baseline
+  benchmark.py --save-baseline         # run and store results as the baseline
+  benchmark.py --scales 1,10 --tools lint-markdown --threshold 0.1
+"""
+import argparse
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+CORPUS_CACHE = os.path.join(REPO_ROOT, 'build', '.cache', 'bench-corpus')
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, '.benchmarks', 'baseline.json')
+
+# Tool name -> (script it exercises, input kind)
+TOOLS = {
+    'extract-svg': ('extract-svg.py', 'assets'),
+    'lint-html': ('lint-html-diagrams.py', 'assets'),
+    'lint-markdown': ('lint-markdown.py', 'chapters'),
+    'plagiarism-extract': ('check-plagiarism.py', 'chapters'),
+}
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+
+def real_corpus(books_dir: str) -> dict[str, list[str]]:
+    """Return the chapters and HTML diagrams of every book, sorted."""
+    return {
+        'chapters': sorted(glob.glob(os.path.join(books_dir, '*', 'chapters', '*.md'))),
+        'assets': sorted(glob.glob(os.path.join(books_dir, '*', 'assets', '*.html'))),
+    }
+
+
+def link_or_copy(source: str, target: str) -> None:
+    """Hard link source to target, copying when links are not supported."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def scaled_corpus(corpus: dict[str, list[str]], scale: int) -> dict[str, list[str]]:
+    """Return a corpus with every file replicated `scale` times.
+
+    Replicas are hard links under build/.cache/bench-corpus/<id>/x<scale>/,
+    where <id> identifies the source file list, and are reused by later
+    runs while the file count still matches.
+    """
+    if scale == 1:
+        return corpus
+
+    all_files = [path for files in corpus.values() for path in files]
+    corpus_id = hashlib.sha256('\n'.join(all_files).encode('utf-8')).hexdigest()[:12]
+
+    scaled = {}
+    for kind, files in corpus.items():
+        directory = os.path.join(CORPUS_CACHE, corpus_id, f'x{scale}', kind)
+        names = [
+            f'{replica:03d}-{os.path.basename(os.path.dirname(os.path.dirname(path)))}-'
+            f'{os.path.basename(path)}'
+            for replica in range(scale) for path in files
+        ]
+        targets = [os.path.join(directory, name) for name in names]
+
+        if not os.path.isdir(directory) or len(os.listdir(directory)) != len(targets):
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory)
+            for target, source in zip(targets, files * scale):
+                link_or_copy(source, target)
+
+        scaled[kind] = targets
+    return scaled
+
+
+# ---------------------------------------------------------------------------
+# Cases (run inside a child process)
+# ---------------------------------------------------------------------------
+
+def load_script(filename: str):
+    """Import a hyphenated script from scripts/ as a module."""
+    name = filename[:-3].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def disable_block_cache(cache_dir: str) -> None:
+    """Point the markdown block cache at cache_dir and turn cache reads off."""
+    import markdown_blocks
+    markdown_blocks.CACHE_DIR = cache_dir
+    markdown_blocks._load_cached_blocks = lambda digest: None
+    markdown_blocks._store_cached_blocks = lambda digest, blocks: None
+
+
+def run_case(tool: str, files: list[str]) -> float:
+    """Run one tool over files and return the elapsed seconds."""
+    script, _ = TOOLS[tool]
+    module = load_script(script)
+
+    with tempfile.TemporaryDirectory(prefix='bench-') as tmp:
+        disable_block_cache(tmp)
+        start = time.perf_counter()
+
+        if tool == 'extract-svg':
+            output = os.path.join(tmp, 'out.svg')
+            for path in files:
+                module.extract_svg(path, output)
+        elif tool == 'lint-html':
+            for path in files:
+                module.lint_file(path)
+        elif tool == 'lint-markdown':
+            for path in files:
+                module.check_file(path)
+        elif tool == 'plagiarism-extract':
+            for path in files:
+                paragraphs = module.extract_prose_paragraphs(path)
+                module.select_passages(paragraphs, 5, 75)
+
+        return time.perf_counter() - start
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def measure(tool: str, files: list[str], repeat: int) -> dict:
+    """Run a case in child processes and return its best timing and peak RSS."""
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.write('\n'.join(files))
+        list_path = f.name
+
+    try:
+        runs = []
+        peak_rss_kb = 0
+        for _ in range(repeat):
+            proc = subprocess.Popen(
+                [sys.executable, __file__, '--run-case', tool, '--files-from', list_path],
+                stdout=subprocess.PIPE, text=True,
+            )
+            output = proc.stdout.read()
+            proc.stdout.close()
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            if proc.returncode != 0:
+                raise RuntimeError(f"{tool} case failed with exit code {proc.returncode}")
+            runs.append(json.loads(output)['seconds'])
+            peak_rss_kb = max(peak_rss_kb, usage.ru_maxrss)
+    finally:
+        os.unlink(list_path)
+
+    seconds = min(runs)
+    total_bytes = sum(os.path.getsize(path) for path in files)
+    return {
+        'files': len(files),
+        'bytes': total_bytes,
+        'seconds': round(seconds, 4),
+        'peak_rss_mb': round(peak_rss_kb / 1024, 1),
+        'files_per_second': round(len(files) / seconds, 1) if seconds else None,
+        'ms_per_file': round(seconds / len(files) * 1000, 3) if files else None,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Return regression messages for cases slower or larger than the baseline."""
+    regressions = []
+    for case, result in results.items():
+        base = baseline.get(case)
+        if not base or base['files'] != result['files']:
+            continue
+        for metric in ('seconds', 'peak_rss_mb'):
+            if base[metric] and result[metric] > base[metric] * (1 + threshold):
+                change = (result[metric] / base[metric] - 1) * 100
+                regressions.append(
+                    f"{case}: {metric} {base[metric]} -> {result[metric]} (+{change:.0f}%)"
+                )
+    return regressions
+
+
+def format_table(results: dict, baseline: dict) -> str:
+    """Format benchmark results, with the change against the baseline."""
+    lines = []
+    lines.append(f'{"Case":<28}{"Files":>8}{"Seconds":>10}{"ms/file":>10}'
+                 f'{"RSS MB":>9}{"vs base":>10}')
+    for case, result in results.items():
+        base = baseline.get(case)
+        if base and base['files'] == result['files'] and base['seconds']:
+            delta = f'{(result["seconds"] / base["seconds"] - 1) * 100:+.0f}%'
+        else:
+            delta = '-'
+        lines.append(
+            f'{case:<28}{result["files"]:>8}{result["seconds"]:>10.3f}'
+            f'{result["ms_per_file"]:>10.3f}{result["peak_rss_mb"]:>9.1f}{delta:>10}'
+        )
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scripts/ toolchain')
+    parser.add_argument('--tools', default=','.join(TOOLS),
+                        help=f'Comma-separated tools (default: {",".join(TOOLS)})')
+    parser.add_argument('--scales', default='1,10,100',
+                        help='Comma-separated corpus scale factors (default: 1,10,100)')
+    parser.add_argument('--corpus', default=os.path.join(REPO_ROOT, 'ebooks'),
+                        help='Directory of books to benchmark, e.g. one written by '
+                             'generate-corpus.py (default: ebooks/)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per case; the fastest is reported (default: 3)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='Baseline results file (default: .benchmarks/baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store these results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed slowdown before failing, as a fraction (default: 0.2)')
+    parser.add_argument('--json', metavar='PATH',
+                        help='Also write the results as JSON to PATH')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--files-from', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        with open(args.files_from, 'r', encoding='utf-8') as f:
+            files = f.read().split('\n')
+        print(json.dumps({'seconds': run_case(args.run_case, files)}))
+        return
+
+    tools = [t.strip() for t in args.tools.split(',') if t.strip()]
+    unknown = [t for t in tools if t not in TOOLS]
+    if unknown:
+        parser.error(f"unknown tool(s): {', '.join(unknown)}")
+    scales = [int(s) for s in args.scales.split(',')]
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+    corpus = real_corpus(args.corpus)
+    if not corpus['chapters'] and not corpus['assets']:
+        parser.error(f"no chapters or diagrams found under {args.corpus}")
+    results = {}
+    for scale in scales:
+        scaled = scaled_corpus(corpus, scale)
+        for tool in tools:
+            case = f'{tool}@x{scale}'
+            if not scaled[TOOLS[tool][1]]:
+                print(f'  Skipping {case}: no {TOOLS[tool][1]} in corpus', file=sys.stderr)
+                continue
+            print(f'  Running {case}...', file=sys.stderr)
+            results[case] = measure(tool, scaled[TOOLS[tool][1]], args.repeat)
+
+    print(format_table(results, baseline))
+
+    report = {'python': sys.version.split()[0], 'results': results}
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nSaved baseline: {args.baseline}')
+        return
+
+    if not baseline:
+        print(f'\nNo baseline at {args.baseline}; run with --save-baseline to create one')
+        return
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:')
+        for regression in regressions:
+            print(f'  - {regression}')
+        sys.exit(1)
+    print(f'\nNo regressions beyond {args.threshold:.0%}')
+
+
+if __name__ == '__main__':
+    main()
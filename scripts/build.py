@@ -0,0 +1,945 @@
+#!/usr/bin/env python3
+"""Build ebooks as a task graph, running independent tasks concurrently.
+
+Every step of a build is a task with declared inputs and outputs:
+
+  diagram     extract one HTML diagram to SVG, then PDF via rsvg-convert
+  asset       copy one non-HTML asset
+  preprocess  rewrite one chapter for a target extension (pdf or svg)
+  parse       convert one chapter to a cached pandoc AST (incremental mode)
+  assemble    join a book's chapter ASTs into one document (incremental mode)
+  render      run the justfile's _build-<format> recipe for one format
+              (html then inlines its diagrams around a shared SVG sheet,
+              and PDFs merge the diagrams' font subsets)
+
+Tasks run on a thread pool up to --jobs at a time, as soon as the tasks
+they depend on have finished, so diagrams, chapters and formats of
+several books proceed in parallel. PDF renders additionally share a
+global cap (--pdf-jobs) so concurrent xelatex runs don't exhaust memory.
+A task whose outputs are all newer than its inputs is skipped (--force
+runs everything). Build scripts and templates are inputs too, so editing
+them rebuilds what they affect.
+
+Output lines are prefixed with the book (and format, for renders) and
+also written to build/<book>/build.log. The first failing task stops the
+run: nothing new is scheduled and running renders are terminated. A
+per-book summary is printed at the end (and written as JSON with
+--summary), and the exit status is 1 unless every book built.
+
+Outputs per book go to build/<book>/ as before: assets/, chapters-pdf/ and
+chapters-svg/ (chapters preprocessed per target extension), the finished
+books, and build-profile.json with per-phase and per-file timings.
+
+Several builds of the same book can run at once (e.g. `just build x pdf`
+and `just build x html` in two terminals). Every file is written under a
+temporary name and moved into place, so nothing ever reads a half-written
+file. The shared inputs (assets, preprocessed chapters and assembled
+ASTs) are built while holding build/<book>/.inputs.lock. Before the lock
+is released they are hard-linked into a per-run snapshot under
+build/<book>/.staging/, and the renders read the snapshot, so another
+build pruning or regenerating the inputs can't change what a running
+render sees. Each render writes into its own staging directory under
+build/<book>/.staging/ and the finished book is then moved over the
+previous one.
+
+Usage:
+  build.py api-optimization --formats pdf
+  build.py api-optimization ml-inference-apis --formats all --mode incremental
+"""
+import argparse
+import fcntl
+import glob
+import importlib.util
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable
+
+import pdf_fonts
+from build_profile import record
+from svg_symbols import inline_diagrams
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+BUILD_ROOT = os.path.join(REPO_ROOT, 'build')
+
+FORMATS = ('pdf', 'pdf-mobile', 'epub', 'html', 'outline')
+FORMAT_GROUPS = {
+    'all': ('pdf', 'pdf-mobile', 'epub', 'html'),
+    'pdf-all': ('pdf', 'pdf-mobile'),
+}
+MODES = ('full', 'incremental')
+
+# Asset extension chapters reference for each format
+TARGET_EXT = {'pdf': 'pdf', 'pdf-mobile': 'pdf', 'epub': 'svg', 'html': 'svg', 'outline': 'svg'}
+# Pandoc reader used for each format (see the _build-* recipes)
+READERS = {
+    'pdf': 'markdown-implicit_figures',
+    'pdf-mobile': 'markdown-implicit_figures',
+    'epub': 'markdown',
+    'html': 'markdown',
+}
+RENDER_RECIPES = {
+    'pdf': '_build-pdf',
+    'pdf-mobile': '_build-pdf-mobile',
+    'epub': '_build-epub',
+    'html': '_build-html',
+    'outline': '_build-outline',
+}
+
+
+def load_script(filename: str):
+    """Import a hyphenated script from scripts/ as a module."""
+    name = filename[:-3].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+_print_lock = threading.Lock()
+_book_logs = {}
+
+
+def open_book_log(book: str) -> None:
+    """Start this run's log for a book; close_book_log() moves it to build.log."""
+    path = os.path.join(BUILD_ROOT, book, f'.build-{os.getpid()}.log')
+    _book_logs[book] = open(path, 'w', encoding='utf-8')
+
+
+def close_book_log(book: str) -> None:
+    f = _book_logs.pop(book)
+    f.close()
+    os.replace(f.name, os.path.join(BUILD_ROOT, book, 'build.log'))
+
+
+def log(book: str, message: str, tag: str | None = None) -> None:
+    """Print one line prefixed with its book (or tag) and add it to the book's log."""
+    line = f"[{tag or book}] {message}"
+    with _print_lock:
+        print(f"  {line}", flush=True)
+        if book in _book_logs:
+            _book_logs[book].write(line + '\n')
+            _book_logs[book].flush()
+
+
+class Cancelled(Exception):
+    """Raised by a task stopped because another task failed."""
+
+
+_cancelled = threading.Event()
+_processes = set()
+_processes_lock = threading.Lock()
+
+
+def cancel_running() -> None:
+    """Stop scheduling work and terminate running render processes."""
+    _cancelled.set()
+    with _processes_lock:
+        for proc in _processes:
+            try:
+                os.killpg(proc.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+# ---------------------------------------------------------------------------
+# Task graph
+# ---------------------------------------------------------------------------
+
+@dataclass(eq=False)
+class Task:
+    name: str
+    book: str
+    phase: str
+    action: Callable[[], None]
+    inputs: list[str] = field(default_factory=list)
+    outputs: list[str] = field(default_factory=list)
+    deps: list['Task'] = field(default_factory=list)
+    pool: str | None = None  # capped resource the task uses, e.g. xelatex
+
+    def up_to_date(self) -> bool:
+        """True when every output exists and is newer than every input."""
+        if not self.outputs:
+            return False
+        try:
+            oldest_output = min(os.path.getmtime(path) for path in self.outputs)
+            newest_input = max((os.path.getmtime(path) for path in self.inputs), default=0)
+        except OSError:
+            return False
+        return newest_input <= oldest_output
+
+
+@dataclass
+class TaskResult:
+    task: Task
+    ran: bool
+    start: float = 0.0
+    end: float = 0.0
+    error: str | None = None
+    cancelled: bool = False
+
+
+def run_graph(tasks: list[Task], jobs: int, force: bool,
+              pool_limits: dict[str, int] | None = None) -> dict[Task, TaskResult]:
+    """Run tasks in dependency order, up to `jobs` at a time.
+
+    Tasks in a pool also count against that pool's limit. After the first
+    failure nothing new is scheduled and running renders are cancelled.
+    Tasks that never ran are missing from the result.
+    """
+    pool_limits = pool_limits or {}
+    in_pool = {}
+    waiting = {task: len(task.deps) for task in tasks}
+    dependents = {task: [] for task in tasks}
+    for task in tasks:
+        for dep in task.deps:
+            dependents[dep].append(task)
+
+    ready = [task for task, count in waiting.items() if count == 0]
+    results = {}
+    failed = False
+
+    def execute(task: Task) -> TaskResult:
+        if not force and task.up_to_date():
+            return TaskResult(task, ran=False)
+        for path in task.outputs:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if _cancelled.is_set():
+            return TaskResult(task, False, error='cancelled after another task failed',
+                              cancelled=True)
+        start = time.perf_counter()
+        try:
+            task.action()
+        except Cancelled as e:
+            return TaskResult(task, True, start, time.perf_counter(), str(e), cancelled=True)
+        except Exception as e:
+            return TaskResult(task, True, start, time.perf_counter(), str(e) or type(e).__name__)
+        return TaskResult(task, True, start, time.perf_counter())
+
+    def has_capacity(task: Task) -> bool:
+        return task.pool is None or in_pool.get(task.pool, 0) < pool_limits.get(task.pool, jobs)
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        running = set()
+        try:
+            while ready or running:
+                if not failed:
+                    for task in list(ready):
+                        if not has_capacity(task):
+                            continue
+                        ready.remove(task)
+                        if task.pool:
+                            in_pool[task.pool] = in_pool.get(task.pool, 0) + 1
+                        running.add(executor.submit(execute, task))
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    results[result.task] = result
+                    if result.task.pool:
+                        in_pool[result.task.pool] -= 1
+                    if result.error:
+                        if not result.cancelled:
+                            log(result.task.book, f"Error in {result.task.name}: {result.error}")
+                        if not failed:
+                            failed = True
+                            cancel_running()
+                        continue
+                    for dependent in dependents[result.task]:
+                        waiting[dependent] -= 1
+                        if waiting[dependent] == 0:
+                            ready.append(dependent)
+        except KeyboardInterrupt:
+            # Renders run in their own session and never see the terminal's
+            # SIGINT, so terminate them before the executor waits on them
+            cancel_running()
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Task actions
+# ---------------------------------------------------------------------------
+
+class Toolchain:
+    """Build helpers shared by every task, loaded once per run."""
+
+    def __init__(self, mode: str):
+        self.extract_svg = load_script('extract-svg.py').extract_svg
+        self.rewrite_chapter = load_script('rewrite-chapters.py').rewrite_chapter
+        self.have_rsvg = shutil.which('rsvg-convert') is not None
+        self.pandoc = None
+        self.pandoc_version = None
+        if mode == 'incremental':
+            self.pandoc = load_script('pandoc-chapters.py')
+            self.pandoc_version = self.pandoc.pandoc_version()
+            os.makedirs(self.pandoc.CACHE_DIR, exist_ok=True)
+
+
+def profile_log(book: str) -> str:
+    return os.path.join(BUILD_ROOT, book, f'.build-profile-{os.getpid()}.jsonl')
+
+
+def convert_diagram(tools: Toolchain, book: str, html_path: str, svg_path: str,
+                    pdf_path: str | None) -> None:
+    name = os.path.basename(html_path)
+    log(book, f"Converting: {name} -> {os.path.basename(svg_path)}")
+
+    start = time.perf_counter()
+    with atomic_output(svg_path) as tmp_path:
+        tools.extract_svg(html_path, tmp_path)
+    record('diagrams', 'extract', name, time.perf_counter() - start, profile_log(book))
+
+    # Convert SVG to PDF for crisp rendering in xelatex (vector, not rasterized)
+    if pdf_path:
+        start = time.perf_counter()
+        with atomic_output(pdf_path) as tmp_path:
+            result = subprocess.run(
+                ['rsvg-convert', '-f', 'pdf', '-o', tmp_path, svg_path], capture_output=True
+            )
+            # Raising drops the temporary file, so no empty PDF is installed
+            if result.returncode != 0:
+                raise RuntimeError(
+                    f"rsvg-convert failed on {os.path.basename(svg_path)}: "
+                    f"{result.stderr.decode(errors='replace').strip()}"
+                )
+        record('diagrams', 'rsvg', name, time.perf_counter() - start, profile_log(book))
+
+
+def preprocess_chapter(tools: Toolchain, book: str, chapter_path: str, ext: str,
+                       output_path: str) -> None:
+    filename = os.path.basename(chapter_path)
+    start = time.perf_counter()
+    content = tools.rewrite_chapter(chapter_path, ext)
+    record('preprocess', 'rewrite', filename, time.perf_counter() - start, profile_log(book))
+    with atomic_output(output_path) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+def copy_asset(source: str, target: str) -> None:
+    with atomic_output(target) as tmp_path:
+        shutil.copy2(source, tmp_path)
+
+
+def parse_chapter(tools: Toolchain, book: str, chapter_path: str, reader: str) -> None:
+    if os.path.exists(tools.pandoc.cached_ast_path(chapter_path, reader, tools.pandoc_version)):
+        return
+    start = time.perf_counter()
+    tools.pandoc.convert_chapter(chapter_path, reader, tools.pandoc_version)
+    record('parse', 'pandoc', os.path.basename(chapter_path),
+           time.perf_counter() - start, profile_log(book))
+
+
+def assemble_book(tools: Toolchain, chapters: list[str], reader: str, output_path: str) -> None:
+    asts = [tools.pandoc.convert_chapter(path, reader, tools.pandoc_version)[0]
+            for path in chapters]
+    with atomic_output(output_path) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(tools.pandoc.assemble(asts, chapters), f)
+
+
+def snapshot_dir(book: str) -> str:
+    """Return this run's snapshot of a book's generated inputs."""
+    return os.path.join(BUILD_ROOT, book, '.staging', f'inputs-{os.getpid()}')
+
+
+def in_snapshot(book: str, path: str) -> str:
+    """Return where a generated input is found in this run's snapshot."""
+    return os.path.join(snapshot_dir(book), os.path.relpath(path, os.path.join(BUILD_ROOT, book)))
+
+
+def snapshot_inputs(book: str, tasks: list[Task]) -> None:
+    """Hard-link the generated inputs of a book's renders into this run's snapshot.
+
+    Generated files are only ever replaced (by rename) or unlinked, so a
+    link keeps the content this run built whatever another build does next.
+    """
+    for task in tasks:
+        if task.phase == 'render':
+            continue
+        for path in task.outputs:
+            target = in_snapshot(book, path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copy2(path, target)
+
+
+def render(book: str, fmt: str, output: str, sources: list[str], reader: str | None,
+           merge_fonts: bool = False) -> None:
+    """Run a _build-<format> recipe into a staging directory, then move the result to `output`.
+
+    `sources` (chapters, or an assembled AST read as `reader`) and the
+    diagrams are read from this run's snapshot. The recipe's output is
+    prefixed with the book and format.
+    """
+    build_dir = os.path.join(BUILD_ROOT, book)
+    staging_root = os.path.join(build_dir, '.staging')
+    os.makedirs(staging_root, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix=f'{fmt}-', dir=staging_root)
+    try:
+        staged = os.path.join(staging_dir, os.path.basename(output))
+        recipe_args = [' '.join(in_snapshot(book, path) for path in sources)]
+        if reader:
+            recipe_args.append(reader)
+        run_recipe(book, fmt, [os.path.join(REPO_ROOT, 'ebooks', book), snapshot_dir(book),
+                               staged, *recipe_args])
+        if fmt == 'html':
+            share_diagram_symbols(book, staged)
+        elif merge_fonts and TARGET_EXT[fmt] == 'pdf':
+            share_diagram_fonts(book, fmt, staged)
+        os.replace(staged, output)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        try:
+            os.rmdir(staging_root)
+        except OSError:
+            pass  # another build is still staging
+
+
+def share_diagram_symbols(book: str, html_path: str) -> None:
+    """Inline the HTML book's diagrams around one shared SVG sheet (see svg_symbols.py)."""
+    start = time.perf_counter()
+    with open(html_path, encoding='utf-8') as f:
+        document = f.read()
+    result, stats = inline_diagrams(document)
+    with open(html_path, 'w', encoding='utf-8') as f:
+        f.write(result)
+    record('render', 'svg-symbols', os.path.basename(html_path),
+           time.perf_counter() - start, profile_log(book))
+    log(book, f"Inlined {stats['diagrams']} diagrams ({stats['defs']} shared definitions, "
+              f"{stats['symbols']} symbols): {len(document.encode()) // 1024} KB -> "
+              f"{len(result.encode()) // 1024} KB", tag=f'{book}/html')
+
+
+def share_diagram_fonts(book: str, fmt: str, pdf_path: str) -> None:
+    """Merge the diagrams' font subsets in a PDF book (see pdf_fonts.py)."""
+    if not pdf_fonts.AVAILABLE:
+        log(book, "Skipping diagram font merging: pikepdf and fontTools are not installed",
+            tag=f'{book}/{fmt}')
+        return
+    start = time.perf_counter()
+    merged_path = pdf_path + '.merged'
+    try:
+        stats = pdf_fonts.dedupe_fonts(pdf_path, merged_path)
+    except Exception as e:
+        try:
+            os.remove(merged_path)
+        except OSError:
+            pass
+        log(book, f"Warning: diagram font merging failed ({e}); keeping the unmerged PDF",
+            tag=f'{book}/{fmt}')
+        return
+    os.replace(merged_path, pdf_path)
+    record('render', 'pdf-fonts', os.path.basename(pdf_path),
+           time.perf_counter() - start, profile_log(book))
+    log(book, f"Merged diagram fonts: {stats['fonts']} -> {stats['merged_fonts']}, "
+              f"{stats['bytes'] // 1024} KB -> {stats['merged_bytes'] // 1024} KB",
+        tag=f'{book}/{fmt}')
+
+
+def run_recipe(book: str, fmt: str, recipe_args: list[str]) -> None:
+    env = dict(os.environ)
+    # timed-bin wraps xelatex so its passes are recorded separately from pandoc
+    env['PATH'] = os.path.join(SCRIPT_DIR, 'timed-bin') + os.pathsep + env.get('PATH', '')
+    env['BUILD_PROFILE_LOG'] = profile_log(book)
+
+    # Own process group, so cancelling reaches pandoc and xelatex too
+    with _processes_lock:
+        if _cancelled.is_set():
+            raise Cancelled('cancelled after another task failed')
+        proc = subprocess.Popen(
+            ['just', RENDER_RECIPES[fmt], *recipe_args], cwd=REPO_ROOT, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+            start_new_session=True,
+        )
+        _processes.add(proc)
+    try:
+        for line in proc.stdout:
+            log(book, line.rstrip(), tag=f'{book}/{fmt}')
+        proc.wait()
+    finally:
+        with _processes_lock:
+            _processes.discard(proc)
+
+    if proc.returncode != 0:
+        if _cancelled.is_set():
+            raise Cancelled('cancelled after another task failed')
+        raise RuntimeError(f"{RENDER_RECIPES[fmt]} failed with exit code {proc.returncode}")
+
+
+# ---------------------------------------------------------------------------
+# Concurrent builds
+# ---------------------------------------------------------------------------
+
+# mkstemp creates files as 0600; finished files get the usual permissions
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextmanager
+def atomic_output(path: str):
+    """Yield a temporary path beside `path` and move it over `path` on success."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                    prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+class InputsLock:
+    """Exclusive lock on a book's shared inputs, held by one build at a time.
+
+    Uses flock on build/<book>/.inputs.lock, so the lock goes away with
+    the process if a build is killed.
+    """
+
+    def __init__(self, book: str):
+        self.book = book
+        self.path = os.path.join(BUILD_ROOT, book, '.inputs.lock')
+        self.fd = None
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print(f"Waiting for another build of {self.book} to finish preparing its inputs...")
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def release(self) -> None:
+        with self._lock:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+
+
+def release_inputs(book: str, tasks: list[Task], lock: InputsLock) -> None:
+    try:
+        snapshot_inputs(book, tasks)
+    finally:
+        lock.release()
+
+
+def gate_renders(book: str, tasks: list[Task], lock: InputsLock) -> Task:
+    """Add a task snapshotting the book's inputs and releasing the lock once they are built.
+
+    Renders depend on it, so they start only after the lock is released and
+    can run alongside other builds of the same book.
+    """
+    inputs = [t for t in tasks if t.phase != 'render']
+    gate = Task('release inputs lock', book, 'render',
+                lambda: release_inputs(book, inputs, lock), deps=inputs)
+    for task in tasks:
+        if task.phase == 'render':
+            task.deps.append(gate)
+    tasks.append(gate)
+    return gate
+
+
+# ---------------------------------------------------------------------------
+# Planning
+# ---------------------------------------------------------------------------
+
+def output_path(book: str, fmt: str) -> str:
+    """Return the finished file for a format (pdf-mobile -> <book>-mobile.pdf)."""
+    if fmt == 'pdf-mobile':
+        return os.path.join(BUILD_ROOT, book, f'{book}-mobile.pdf')
+    return os.path.join(BUILD_ROOT, book, f'{book}.{fmt}')
+
+
+def manifest_path(directory: str) -> str:
+    """Return the file listing what a generated directory should contain."""
+    return os.path.join(os.path.dirname(directory), f'.{os.path.basename(directory)}.manifest')
+
+
+def manifest_inputs(paths: list[str], build_dir: str) -> list[str]:
+    """Manifests of the generated directories holding `paths`.
+
+    Listing them as inputs makes adding or removing a chapter or asset
+    rebuild what uses the directory, which the mtimes of the files that
+    are still there can't show.
+    """
+    directories = {os.path.dirname(path) for path in paths}
+    return [manifest_path(d) for d in sorted(directories) if d != build_dir]
+
+
+def render_inputs(book_dir: str) -> list[str]:
+    """Files outside the chapters and diagrams that affect rendering."""
+    inputs = [os.path.join(REPO_ROOT, 'justfile')]
+    inputs += sorted(glob.glob(os.path.join(REPO_ROOT, 'templates', '*')))
+    readme = os.path.join(book_dir, 'README.md')
+    if os.path.exists(readme):
+        inputs.append(readme)
+    return inputs
+
+
+def plan_book(book: str, formats: list[str], mode: str, tools: Toolchain,
+              merge_fonts: bool = False) -> list[Task]:
+    """Return the tasks that build the given formats of one book."""
+    book_dir = os.path.join(REPO_ROOT, 'ebooks', book)
+    build_dir = os.path.join(BUILD_ROOT, book)
+    chapters = sorted(glob.glob(os.path.join(book_dir, 'chapters', '*.md')))
+    if not chapters:
+        raise ValueError(f"No chapters found in {book_dir}/chapters")
+
+    tasks = []
+
+    # Diagrams and other assets, shared by every format that embeds them
+    asset_tasks = []
+    if any(fmt != 'outline' for fmt in formats):
+        extractor = os.path.join(SCRIPT_DIR, 'extract-svg.py')
+        for source in sorted(glob.glob(os.path.join(book_dir, 'assets', '*'))):
+            if not os.path.isfile(source):
+                continue
+            name = os.path.basename(source)
+            stem, extension = os.path.splitext(name)
+            if extension == '.html':
+                svg_path = os.path.join(build_dir, 'assets', f'{stem}.svg')
+                pdf_path = os.path.join(build_dir, 'assets', f'{stem}.pdf') if tools.have_rsvg else None
+                task = Task(
+                    f'diagram {name}', book, 'diagrams',
+                    lambda s=source, v=svg_path, p=pdf_path: convert_diagram(tools, book, s, v, p),
+                    inputs=[source, extractor],
+                    outputs=[svg_path] + ([pdf_path] if pdf_path else []),
+                )
+            else:
+                target = os.path.join(build_dir, 'assets', name)
+                task = Task(
+                    f'asset {name}', book, 'diagrams',
+                    lambda s=source, t=target: copy_asset(s, t),
+                    inputs=[source], outputs=[target],
+                )
+            asset_tasks.append(task)
+    tasks += asset_tasks
+
+    # Chapters, preprocessed once per target extension
+    rewriter = [os.path.join(SCRIPT_DIR, 'rewrite-chapters.py'),
+                os.path.join(SCRIPT_DIR, 'markdown_blocks.py')]
+    preprocessed = {}
+    for ext in sorted({TARGET_EXT[fmt] for fmt in formats}):
+        preprocessed[ext] = []
+        for chapter in chapters:
+            target = os.path.join(build_dir, f'chapters-{ext}', os.path.basename(chapter))
+            preprocessed[ext].append(Task(
+                f'preprocess {os.path.basename(chapter)} ({ext})', book, 'preprocess',
+                lambda c=chapter, e=ext, t=target: preprocess_chapter(tools, book, c, e, t),
+                inputs=[chapter] + rewriter, outputs=[target],
+            ))
+        tasks += preprocessed[ext]
+
+    # Incremental mode: per-chapter cached ASTs, assembled once per reader
+    assembled = {}
+    if mode == 'incremental':
+        assembler = [os.path.join(SCRIPT_DIR, name) for name in (
+            'pandoc-chapters.py', 'check-links.py', 'markdown_blocks.py',
+        )]
+        for reader in sorted({READERS[fmt] for fmt in formats if fmt in READERS}):
+            ext = 'pdf' if reader == READERS['pdf'] else 'svg'
+            parse_tasks = [
+                Task(
+                    f'parse {os.path.basename(t.outputs[0])} ({reader})', book, 'parse',
+                    lambda path=t.outputs[0], r=reader: parse_chapter(tools, book, path, r),
+                    deps=[t],
+                )
+                for t in preprocessed[ext]
+            ]
+            chapter_paths = [t.outputs[0] for t in preprocessed[ext]]
+            ast_path = os.path.join(build_dir, f'{book}.{reader}.ast.json')
+            assembled[reader] = Task(
+                f'assemble {os.path.basename(ast_path)}', book, 'parse',
+                lambda paths=chapter_paths, r=reader, a=ast_path: assemble_book(tools, paths, r, a),
+                inputs=chapter_paths + manifest_inputs(chapter_paths, build_dir) + assembler,
+                outputs=[ast_path], deps=parse_tasks,
+            )
+            tasks += parse_tasks + [assembled[reader]]
+
+    # One render per format
+    extra_inputs = render_inputs(book_dir)
+    for fmt in formats:
+        output = output_path(book, fmt)
+        chapter_tasks = preprocessed[TARGET_EXT[fmt]]
+        chapter_paths = [t.outputs[0] for t in chapter_tasks]
+
+        if fmt == 'outline':
+            deps = list(chapter_tasks)
+            sources, reader = chapter_paths, None
+        elif fmt in READERS and READERS[fmt] in assembled:
+            deps = [assembled[READERS[fmt]]] + asset_tasks
+            sources, reader = [assembled[READERS[fmt]].outputs[0]], 'json'
+        else:
+            deps = chapter_tasks + asset_tasks
+            sources, reader = chapter_paths, None
+
+        inputs = [p for t in deps for p in t.outputs] + extra_inputs
+        inputs += manifest_inputs([p for t in deps for p in t.outputs], build_dir)
+        if fmt == 'html':
+            inputs.append(os.path.join(SCRIPT_DIR, 'svg_symbols.py'))
+        elif merge_fonts and TARGET_EXT[fmt] == 'pdf':
+            inputs.append(os.path.join(SCRIPT_DIR, 'pdf_fonts.py'))
+
+        tasks.append(Task(
+            f'render {fmt}', book, 'render',
+            lambda f=fmt, o=output, c=sources, r=reader: render(book, f, o, c, r, merge_fonts),
+            inputs=inputs,
+            outputs=[output], deps=deps,
+            pool='xelatex' if TARGET_EXT[fmt] == 'pdf' else None,
+        ))
+
+    return tasks
+
+
+def prune_stale_files(book: str, tasks: list[Task]) -> None:
+    """Remove files left in generated directories by earlier builds.
+
+    Each directory's manifest is rewritten when the set of files it should
+    hold changes, so tasks using the directory see a newer input.
+    """
+    build_dir = os.path.join(BUILD_ROOT, book)
+    expected = {path for task in tasks for path in task.outputs}
+    directories = {os.path.dirname(path) for path in expected
+                   if os.path.dirname(path) != build_dir}
+    for directory in directories:
+        listing = ''.join(f'{os.path.basename(path)}\n' for path in sorted(expected)
+                          if os.path.dirname(path) == directory)
+        write_if_changed(manifest_path(directory), listing)
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path) and path not in expected:
+                os.unlink(path)
+
+
+def write_if_changed(path: str, content: str) -> None:
+    """Write `path` unless it already holds `content`, keeping its mtime."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            if f.read() == content:
+                return
+    except OSError:
+        pass
+    with atomic_output(path) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+def write_profile(book: str, formats: list[str], mode: str,
+                  results: list[TaskResult]) -> None:
+    """Record per-phase wall time and summarize the book's profile log."""
+    log_path = profile_log(book)
+    spans = {}
+    for result in results:
+        if result.ran:
+            start, end = spans.get(result.task.phase, (result.start, result.end))
+            spans[result.task.phase] = (min(start, result.start), max(end, result.end))
+    for phase, (start, end) in spans.items():
+        record(phase, 'total', None, end - start, log_path)
+
+    if not os.path.exists(log_path):
+        open(log_path, 'w').close()
+    subprocess.run(
+        [sys.executable, os.path.join(SCRIPT_DIR, 'profile-report.py'), log_path,
+         os.path.relpath(os.path.join(BUILD_ROOT, book, 'build-profile.json')),
+         '--book', book, '--format', ','.join(formats), '--mode', mode],
+        check=False,
+    )
+    os.unlink(log_path)
+
+
+def summarize(books: list[str], formats: list[str], tasks: list[Task],
+              results: dict[Task, TaskResult]) -> list[dict]:
+    """Return one summary row per book: status, task counts and outputs."""
+    rows = []
+    for book in books:
+        book_tasks = [t for t in tasks if t.book == book]
+        book_results = [results[t] for t in book_tasks if t in results]
+        failures = [r for r in book_results if r.error and not r.cancelled]
+        complete = len(book_results) == len(book_tasks) and not any(r.error for r in book_results)
+        ran = [r for r in book_results if r.ran]
+
+        if failures:
+            status = 'failed'
+        elif complete:
+            status = 'ok'
+        else:
+            status = 'cancelled'
+
+        rows.append({
+            'book': book,
+            'status': status,
+            'tasks': len(book_tasks),
+            'ran': len(ran),
+            'up_to_date': sum(1 for r in book_results if not r.ran and not r.error),
+            'seconds': round(max((r.end for r in ran), default=0)
+                             - min((r.start for r in ran), default=0), 3),
+            'failed': [f'{r.task.name}: {r.error}' for r in failures],
+            'outputs': [os.path.relpath(output_path(book, fmt), REPO_ROOT) for fmt in formats]
+                       if complete else [],
+        })
+    return rows
+
+
+def format_summary(rows: list[dict]) -> str:
+    """Format the per-book summary table."""
+    lines = [f'\n{"Book":<32}{"Status":<12}{"Run":>6}{"Up to date":>12}{"Seconds":>10}']
+    for row in rows:
+        lines.append(f'{row["book"]:<32}{row["status"]:<12}{row["ran"]:>6}'
+                     f'{row["up_to_date"]:>12}{row["seconds"]:>10.1f}')
+        for failure in row['failed']:
+            lines.append(f'  - {failure}')
+    return '\n'.join(lines)
+
+
+def expand_formats(names: str) -> list[str]:
+    """Expand a comma-separated format list, including all and pdf-all."""
+    formats = []
+    for name in names.split(','):
+        name = name.strip()
+        for fmt in FORMAT_GROUPS.get(name, (name,)):
+            if fmt not in FORMATS:
+                raise ValueError(
+                    f"Unsupported format '{fmt}'. Supported: "
+                    f"{', '.join(FORMATS + tuple(FORMAT_GROUPS))}"
+                )
+            if fmt not in formats:
+                formats.append(fmt)
+    return formats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build ebooks as a parallel task graph')
+    parser.add_argument('books', nargs='+', help='Book directory names under ebooks/')
+    parser.add_argument('--formats', default='all',
+                        help='Comma-separated formats: pdf, pdf-mobile, epub, html, outline, '
+                             'or all / pdf-all (default: all)')
+    parser.add_argument('--mode', choices=MODES, default='full',
+                        help='incremental reuses cached per-chapter pandoc ASTs (default: full)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Tasks run at once (default: CPU count)')
+    parser.add_argument('--pdf-jobs', type=int, default=2,
+                        help='PDF renders (xelatex) run at once across all books (default: 2)')
+    parser.add_argument('--summary', metavar='PATH',
+                        help='Also write the per-book summary as JSON to PATH')
+    parser.add_argument('--force', action='store_true',
+                        help='Run every task, even when its outputs are up to date')
+    parser.add_argument('--merge-fonts', action='store_true',
+                        help='Merge the diagrams\' font subsets in PDF books (needs pikepdf '
+                             'and fontTools; see BUILD.md)')
+    args = parser.parse_args()
+
+    try:
+        formats = expand_formats(args.formats)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for book in args.books:
+        book_dir = os.path.join(REPO_ROOT, 'ebooks', book)
+        if not os.path.isdir(book_dir):
+            print(f"Error: Book '{os.path.relpath(book_dir, REPO_ROOT)}' does not exist",
+                  file=sys.stderr)
+            sys.exit(1)
+        if not os.path.isdir(os.path.join(book_dir, 'chapters')):
+            print(f"Error: No chapters directory found in {os.path.relpath(book_dir, REPO_ROOT)}",
+                  file=sys.stderr)
+            sys.exit(1)
+
+    tools = Toolchain(args.mode)
+    planned = {}
+    for book in args.books:
+        try:
+            planned[book] = plan_book(book, formats, args.mode, tools, args.merge_fonts)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    # Locks are taken in name order so two multi-book builds can't deadlock
+    locks = {}
+    tasks = []
+    for book in sorted(planned):
+        os.makedirs(os.path.join(BUILD_ROOT, book), exist_ok=True)
+        locks[book] = InputsLock(book)
+        locks[book].acquire()
+    for book in args.books:
+        book_tasks = planned[book]
+        prune_stale_files(book, book_tasks)
+        gate_renders(book, book_tasks, locks[book])
+        open(profile_log(book), 'w').close()
+        open_book_log(book)
+        tasks += book_tasks
+
+    print(f"Building {', '.join(args.books)} as {', '.join(formats)} "
+          f"({len(tasks)} tasks, {args.jobs} job(s), {args.pdf_jobs} PDF render(s))...")
+    results = None
+    try:
+        results = run_graph(tasks, args.jobs, args.force, {'xelatex': max(args.pdf_jobs, 1)})
+    except KeyboardInterrupt:
+        cancel_running()
+        print("\nBuild interrupted", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        for lock in locks.values():
+            lock.release()
+        for book in args.books:
+            shutil.rmtree(snapshot_dir(book), ignore_errors=True)
+            try:
+                os.rmdir(os.path.dirname(snapshot_dir(book)))
+            except OSError:
+                pass  # another build is still staging
+        if results is None:
+            # Interrupted: keep this run's log as build.log, drop its partial profile
+            for book in args.books:
+                close_book_log(book)
+                try:
+                    os.unlink(profile_log(book))
+                except FileNotFoundError:
+                    pass
+
+    for book in args.books:
+        book_results = [r for r in results.values() if r.task.book == book]
+        write_profile(book, formats, args.mode, book_results)
+        close_book_log(book)
+
+    rows = summarize(args.books, formats, tasks, results)
+    print(format_summary(rows))
+    if args.summary:
+        os.makedirs(os.path.dirname(os.path.abspath(args.summary)), exist_ok=True)
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump({'formats': formats, 'mode': args.mode, 'books': rows}, f, indent=2)
+
+    failed_books = [row['book'] for row in rows if row['status'] != 'ok']
+    if failed_books:
+        print(f"\nBuild failed for {len(failed_books)} of {len(rows)} book(s): "
+              f"{', '.join(failed_books)}", file=sys.stderr)
+        sys.exit(1)
+
+    print()
+    for row in rows:
+        for output in row['outputs']:
+            print(f"✓ Built: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Build profiling events for the Python build helpers.
+
+Mirrors profile_record in profile.sh: when BUILD_PROFILE_LOG is set, each
+timed step is appended to it as one JSON line. Use as a context manager:
+
+    with profile_step('preprocess', 'rewrite', filename):
+        ...
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+
+
+def record(phase: str, step: str, file: str | None, seconds: float,
+           log_path: str | None = None) -> None:
+    """Append one timing event to the build profile log, if enabled.
+
+    log_path overrides BUILD_PROFILE_LOG, for callers building several
+    books in one process.
+    """
+    log_path = log_path or os.environ.get('BUILD_PROFILE_LOG')
+    if not log_path:
+        return
+    event = {'phase': phase, 'step': step, 'file': file, 'seconds': round(seconds, 6)}
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(event) + '\n')
+
+
+@contextmanager
+def profile_step(phase: str, step: str, file: str | None = None):
+    """Time the enclosed block and record it as a build profile event."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, step, file, time.perf_counter() - start)
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""Cross-check inline [Source: ...] citations against a book's WORKS_CITED.md.
+
+WORKS_CITED.md is parsed once into an index of numbered entries, each with
+its chapter section, author or organization names, title and years:
+
+  1. **Dean, Jeffrey and Luiz André Barroso.** "The Tail at Scale." ... 2013.
+  1. **AssemblyAI** (2025). "The 300ms Rule: ..." https://...
+
+Every name (the first author's surname, later authors' surnames, an
+organization name and any parenthesized acronym), every RFC number and
+every alias from the "Frequently Cited Works" table
+(`Google SRE Book (Beyer et al., 2016)`) becomes a key. All keys are
+compiled into one alternation, longest first, so each citation is resolved
+with a single regex search plus a year filter:
+
+  [Source: Dean & Barroso, 2013]      -> Dean / Barroso entries from 2013
+  [Source: Google SRE Book, 2016]     -> the Beyer et al. entries (alias)
+  [Source: RFC 8446, TLS 1.3]         -> the entry mentioning RFC 8446
+
+An organization's first word is a key too, but only when the citation
+doesn't go on with more name words (a trailing "Documentation" or "Blog"
+is fine) and it identifies a single name, after narrowing by the cited
+year if several names share it. `[Source: Google, 2017]` finds
+Google/SOASTA; `[Source: Google SRE Workbook, 2018]` is an unknown source.
+
+A citation may list several sources separated by ';'. Every chapter is
+then checked in one pass, reporting:
+
+  unknown-source  - no entry matches the cited name
+  year-mismatch   - entries match the name, but none has the cited year
+  unused-entry    - a WORKS_CITED entry no citation resolves to
+
+Unused entries are reported but only fail the run with --strict, since
+bibliographies also list background reading.
+
+Usage:
+  check-citations.py                         # every book with a WORKS_CITED.md
+  check-citations.py api-optimization --strict --format json
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+
+from lint_report import FORMATS, Diagnostic, make_reporter
+from markdown_blocks import parse_file, parse_markdown
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RULES = {
+    'unknown-source': 'Inline citation matches no WORKS_CITED.md entry',
+    'year-mismatch': 'Inline citation names a WORKS_CITED.md source but not a year it lists',
+    'unused-entry': 'WORKS_CITED.md entry that no inline citation refers to',
+}
+
+# Same pattern check-plagiarism.py strips from prose
+INLINE_CITATION = re.compile(r'\[Source:\s*([^\]]+)\]')
+INLINE_CODE_PATTERN = re.compile(r'(`+)(.+?)\1')
+
+# Blocks that can carry citations; code and comments are skipped
+CITATION_BLOCKS = ('paragraph', 'callout', 'table', 'heading')
+
+CHAPTER_SECTION_PATTERN = re.compile(r'^##\s+(Chapter\s+\d+.*?)\s*$')
+SECTION_PATTERN = re.compile(r'^##\s')
+ENTRY_PATTERN = re.compile(r'^\d+\.\s+\*\*(.+?)\*\*(.*)$')
+ALIAS_ROW_PATTERN = re.compile(r'^\|\s*([^|(]+?)\s*\(([^|)]+)\)[^|]*\|')
+TITLE_PATTERN = re.compile(r'"([^"]+?)[.,]?"|\*([^*]+?)[.,]?\*')
+YEAR_PATTERN = re.compile(r'\b(?:19|20)\d\d\b')
+RFC_PATTERN = re.compile(r'\bRFC\s*(\d+)', re.IGNORECASE)
+ACRONYM_PATTERN = re.compile(r'\(([^)]+)\)')
+ET_AL_PATTERN = re.compile(r',?\s*et al\.?', re.IGNORECASE)
+AUTHOR_SEPARATOR_PATTERN = re.compile(r',\s*(?:and\s+)?|\s+and\s+|\s*&\s*')
+NEXT_WORD_PATTERN = re.compile(r'[\s/-]+([^\W\d_]+)')
+
+# Words after an organization's first word that name a kind of source,
+# not a different organization ("Redis Documentation", "PostgreSQL Wiki")
+SOURCE_WORDS = {'documentation', 'docs', 'wiki', 'blog', 'benchmarks'}
+
+# First words too generic to identify an organization on their own
+GENERIC_WORDS = {'the', 'open', 'cloud', 'web', 'data', 'red', 'real'}
+
+
+@dataclass
+class Entry:
+    number: int
+    chapter: str
+    line: int
+    names: list[str]
+    title: str
+    years: set[str]
+    keys: set[str] = field(default_factory=set)
+    first_words: set[str] = field(default_factory=set)
+
+
+@dataclass
+class Bibliography:
+    path: str
+    entries: list[Entry]
+    lookup: dict[str, list[Entry]]
+    matcher: re.Pattern | None
+    first_words: dict[str, list[Entry]] = field(default_factory=dict)
+
+
+def entry_names(author: str) -> list[str]:
+    """Return the surnames or organization names in a bold author field."""
+    author = ET_AL_PATTERN.sub('', author.strip().rstrip('.')).strip()
+    if ',' not in author and ' and ' not in author and '&' not in author:
+        return [author]
+
+    # "Surname, First, First Last, and First Last": the second part is the
+    # first author's given name, later parts end in a surname
+    first, _, rest = author.partition(',')
+    names = [first.strip()]
+    for part in AUTHOR_SEPARATOR_PATTERN.split(rest)[1:]:
+        words = part.split()
+        if len(words) > 1:
+            names.append(words[-1])
+    return names
+
+
+def entry_keys(names: list[str], text: str) -> set[str]:
+    """Return the lowercase lookup keys for an entry."""
+    keys = set()
+    for name in names:
+        acronym = ACRONYM_PATTERN.search(name)
+        if acronym:
+            keys.add(acronym.group(1).lower())
+            name = ACRONYM_PATTERN.sub('', name).strip()
+        keys.add(name.lower())
+    for number in RFC_PATTERN.findall(text):
+        keys.add(f'rfc {number}')
+    return keys
+
+
+def entry_first_words(names: list[str]) -> set[str]:
+    """Return the first words of an entry's multi-word names."""
+    words = set()
+    for name in names:
+        name = ACRONYM_PATTERN.sub('', name).strip()
+        first_word = re.split(r'[\s/]', name)[0].lower()
+        if first_word != name.lower() and len(first_word) > 2 \
+                and first_word not in GENERIC_WORDS:
+            words.add(first_word)
+    return words
+
+
+def parse_works_cited(content: str, path: str) -> Bibliography:
+    """Parse WORKS_CITED.md into entries and a compiled citation matcher."""
+    document = parse_markdown(content, path)
+    lines = document.lines
+    entries = []
+    aliases = []
+
+    chapter = ''
+    for block in document.blocks:
+        if block.kind == 'heading':
+            heading = lines[block.start - 1].strip()
+            match = CHAPTER_SECTION_PATTERN.match(heading)
+            if match:
+                chapter = match.group(1)
+            elif SECTION_PATTERN.match(heading):
+                chapter = ''
+        elif block.kind == 'table':
+            for line in document.block_lines(block):
+                match = ALIAS_ROW_PATTERN.match(line.strip())
+                if match:
+                    aliases.append((match.group(1).lower(), match.group(2)))
+        elif block.kind == 'paragraph' and chapter:
+            text = ' '.join(line.strip() for line in document.block_lines(block))
+            match = ENTRY_PATTERN.match(text)
+            if not match:
+                continue
+            author, rest = match.groups()
+            names = entry_names(author)
+            title = TITLE_PATTERN.search(rest)
+            entries.append(Entry(
+                number=int(text.split('.', 1)[0]),
+                chapter=chapter,
+                line=block.start,
+                names=names,
+                title=(title.group(1) or title.group(2)) if title else '',
+                years=set(YEAR_PATTERN.findall(text)),
+                keys=entry_keys(names, text),
+                first_words=entry_first_words(names),
+            ))
+
+    lookup = {}
+    for entry in entries:
+        for key in entry.keys:
+            lookup.setdefault(key, []).append(entry)
+
+    # "Google SRE Book (Beyer et al., 2016)": the alias resolves to the
+    # entries matching the parenthesized author and year
+    for alias, reference in aliases:
+        years = set(YEAR_PATTERN.findall(reference))
+        name = ET_AL_PATTERN.sub('', reference.split(',')[0]).strip().lower()
+        targets = [e for e in lookup.get(name, []) if not years or e.years & years]
+        if targets and alias not in lookup:
+            lookup[alias] = targets
+
+    # First words are only a fallback for names that aren't keys themselves
+    first_words = {}
+    for entry in entries:
+        for word in entry.first_words:
+            if word not in lookup:
+                first_words.setdefault(word, []).append(entry)
+
+    matcher = None
+    if lookup or first_words:
+        keys = sorted([*lookup, *first_words], key=len, reverse=True)
+        alternation = '|'.join(re.escape(key) for key in keys)
+        matcher = re.compile(rf'(?<!\w)(?:{alternation})(?!\w)')
+    return Bibliography(path, entries, lookup, matcher, first_words)
+
+
+def first_word_entries(entries: list[Entry], years: set[str]) -> list[Entry]:
+    """Return the entries of the one name a first-word key identifies, or []."""
+    if len({entry.names[0] for entry in entries}) > 1:
+        entries = [entry for entry in entries if entry.years & years]
+    return entries if len({entry.names[0] for entry in entries}) == 1 else []
+
+
+def continues_name(author: str, end: int) -> bool:
+    """Whether another name word follows a first-word key in a cited author."""
+    match = NEXT_WORD_PATTERN.match(author, end)
+    return bool(match) and match.group(1) not in SOURCE_WORDS
+
+
+def split_sources(citation: str) -> list[str]:
+    """Split '[Source: A, 2020; Source: B, 2021]' contents into single sources."""
+    sources = []
+    for source in citation.split(';'):
+        source = re.sub(r'^\s*Source:\s*', '', source).strip()
+        if source:
+            sources.append(source)
+    return sources
+
+
+def resolve(source: str, bibliography: Bibliography) -> tuple[list[Entry], str | None]:
+    """Return (matching entries, problem rule or None) for one cited source."""
+    if bibliography.matcher is None:
+        return [], 'unknown-source'
+
+    # Match names in the author part only, so a cited title can't hit an
+    # unrelated author; RFC numbers can appear anywhere
+    lowered = source.lower()
+    author = lowered.split(',')[0].split('"')[0]
+    years = set(YEAR_PATTERN.findall(source))
+    matches = []
+    for match in bibliography.matcher.finditer(author):
+        key = match.group(0)
+        if key not in bibliography.first_words:
+            matches.append(bibliography.lookup[key])
+        elif not continues_name(author, match.end()):
+            matches.append(first_word_entries(bibliography.first_words[key], years))
+    for number in RFC_PATTERN.findall(source):
+        matches.append(bibliography.lookup.get(f'rfc {number}', []))
+    candidates = []
+    for entries in matches:
+        for entry in entries:
+            if entry not in candidates:
+                candidates.append(entry)
+    if not candidates:
+        return [], 'unknown-source'
+
+    if years:
+        dated = [entry for entry in candidates if entry.years & years]
+        if not dated:
+            return candidates, 'year-mismatch'
+        candidates = dated
+    return candidates, None
+
+
+def chapter_citations(path: str):
+    """Yield (line, column, source) for every cited source in a chapter."""
+    document = parse_file(path)
+    for block in document.blocks_of(*CITATION_BLOCKS):
+        for offset, line in enumerate(document.block_lines(block)):
+            masked = INLINE_CODE_PATTERN.sub(lambda m: ' ' * len(m.group(0)), line)
+            for match in INLINE_CITATION.finditer(masked):
+                for source in split_sources(match.group(1)):
+                    yield block.start + offset, match.start() + 1, source
+
+
+def describe(entries: list[Entry]) -> str:
+    years = sorted({year for entry in entries for year in entry.years})
+    return f"{entries[0].names[0]} ({', '.join(years) or 'no year'})"
+
+
+def check_book(book_dir: str, bibliography: Bibliography):
+    """Check every chapter of a book against its bibliography.
+
+    Returns (citation count, [(chapter path, diagnostics)], unused entries).
+    """
+    used = set()
+    results = []
+    total = 0
+    for path in sorted(glob.glob(os.path.join(book_dir, 'chapters', '*.md'))):
+        diagnostics = []
+        for line, column, source in chapter_citations(path):
+            total += 1
+            entries, problem = resolve(source, bibliography)
+            if problem == 'unknown-source':
+                message = f"No WORKS_CITED.md entry for [Source: {source}]"
+            elif problem == 'year-mismatch':
+                message = (f"[Source: {source}] matches {describe(entries)} "
+                           f"in WORKS_CITED.md, but not the cited year")
+            else:
+                used.update(id(entry) for entry in entries)
+                continue
+            diagnostics.append(Diagnostic(path, line, column, problem, message))
+        results.append((path, diagnostics))
+
+    unused = [entry for entry in bibliography.entries if id(entry) not in used]
+    return total, results, unused
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Cross-check inline citations against WORKS_CITED.md'
+    )
+    parser.add_argument('books', nargs='*',
+                        help='Book directory names under ebooks/ '
+                             '(default: every book with a WORKS_CITED.md)')
+    parser.add_argument('--strict', action='store_true',
+                        help='Also fail when WORKS_CITED.md has entries no citation uses')
+    parser.add_argument(
+        '--format',
+        choices=FORMATS,
+        default='text',
+        help='Output format: text (default), or json/sarif diagnostics '
+             'streamed as each chapter is checked'
+    )
+    args = parser.parse_args()
+
+    books = args.books or sorted(
+        os.path.basename(os.path.dirname(path))
+        for path in glob.glob(os.path.join(REPO_ROOT, 'ebooks', '*', 'WORKS_CITED.md'))
+    )
+    for book in books:
+        if not os.path.exists(os.path.join(REPO_ROOT, 'ebooks', book, 'WORKS_CITED.md')):
+            print(f"Error: No WORKS_CITED.md found in ebooks/{book}", file=sys.stderr)
+            sys.exit(1)
+
+    reporter = None
+    if args.format != 'text':
+        reporter = make_reporter(args.format, sys.stdout, 'check-citations', RULES)
+
+    total_citations = 0
+    total_errors = 0
+    total_unused = 0
+    for book in books:
+        book_dir = os.path.join(REPO_ROOT, 'ebooks', book)
+        works_cited = os.path.join(book_dir, 'WORKS_CITED.md')
+        with open(works_cited, 'r', encoding='utf-8') as f:
+            bibliography = parse_works_cited(f.read(), works_cited)
+
+        citations, results, unused = check_book(book_dir, bibliography)
+        total_citations += citations
+        total_unused += len(unused)
+
+        for path, diagnostics in results:
+            path = os.path.relpath(path, REPO_ROOT)
+            total_errors += len(diagnostics)
+            if reporter is not None:
+                for diagnostic in diagnostics:
+                    diagnostic.path = path
+                    reporter.report(diagnostic)
+                reporter.end_file()
+            elif diagnostics:
+                print(f"\n{path}:")
+                for diagnostic in diagnostics:
+                    print(f"  - Line {diagnostic.line}: {diagnostic.message}")
+
+        relative = os.path.relpath(works_cited, REPO_ROOT)
+        if reporter is not None:
+            for entry in unused:
+                reporter.report(Diagnostic(
+                    relative, entry.line, 1, 'unused-entry',
+                    f"{entry.chapter}, entry {entry.number} ({entry.names[0]}) is never cited",
+                ))
+            reporter.end_file()
+        elif unused:
+            print(f"\n{relative}: {len(unused)} of {len(bibliography.entries)} entries never cited")
+            for entry in unused:
+                title = f': "{entry.title}"' if entry.title else ''
+                print(f"  - Line {entry.line}: {entry.chapter}, "
+                      f"entry {entry.number} ({entry.names[0]}){title}")
+
+    failed = total_errors or (args.strict and total_unused)
+    if reporter is not None:
+        reporter.finish({
+            'books': len(books),
+            'citations': total_citations,
+            'violations': total_errors,
+            'unused_entries': total_unused,
+        })
+        sys.exit(1 if failed else 0)
+
+    print(f"\n{total_citations} citation(s) checked: {total_errors} unresolved, "
+          f"{total_unused} unused WORKS_CITED entr{'y' if total_unused == 1 else 'ies'}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
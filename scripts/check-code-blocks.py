@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""Syntax-check the fenced code examples in book chapters.
+
+Fenced blocks are found with the shared block parser (markdown_blocks), so
+the fences this checks are the same ones the linters and the build see.
+Each block is checked according to the language on its fence:
+
+  python                  - compile() to an AST (top-level await allowed)
+  rust                    - rustc parse only (-Zunpretty=normal, no name
+                            resolution); statement snippets are retried
+                            wrapped in a function
+  typescript              - tsc --noEmit, keeping only syntax errors
+                            (TS1xxx), since snippets reference undeclared
+                            names
+  javascript              - node --check, as an ES module
+
+Other languages and unlabelled fences are not checked. Languages whose tool
+isn't on PATH are skipped and counted in the summary.
+
+Results are cached per block under build/.cache/code-blocks/, keyed by the
+sha256 of the checker version, language, tool version and block content,
+so only new or edited examples are checked again. Blocks that do need
+checking run in parallel across processes (--jobs).
+
+Usage:
+  check-code-blocks.py                       # every book under ebooks/
+  check-code-blocks.py api-optimization --format json
+"""
+
+import argparse
+import ast
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from lint_report import FORMATS, Diagnostic, make_reporter
+from markdown_blocks import parse_file
+
+# Bump when a checker changes to invalidate cached results
+CHECKER_VERSION = 1
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+CACHE_DIR = os.path.join(REPO_ROOT, 'build', '.cache', 'code-blocks')
+
+RULES = {
+    'syntax-error': 'Code example does not parse in its fence language',
+    'checker-failed': 'Syntax checker could not be run on a code example',
+}
+
+# Fence info strings, by first word, mapped to a checked language
+LANGUAGES = {
+    'python': 'python', 'py': 'python', 'python3': 'python',
+    'rust': 'rust', 'rs': 'rust',
+    'typescript': 'typescript', 'ts': 'typescript',
+    'javascript': 'javascript', 'js': 'javascript', 'node': 'javascript',
+}
+
+# External tool each language needs; python is checked in-process
+TOOLS = {
+    'rust': 'rustc',
+    'typescript': 'tsc',
+    'javascript': 'node',
+}
+
+TOOL_TIMEOUT = 60
+
+RUST_ERROR_PATTERN = re.compile(r'^[^:]+:(\d+):(\d+): error: (.*)$')
+TSC_ERROR_PATTERN = re.compile(r'^[^(]+\((\d+),(\d+)\): error TS(\d+): (.*)$')
+NODE_LOCATION_PATTERN = re.compile(r'^.+:(\d+)$')
+NODE_ERROR_PATTERN = re.compile(r'^SyntaxError: (.*)$')
+
+
+@dataclass
+class CodeBlock:
+    path: str
+    line: int       # chapter line of the opening fence
+    language: str
+    code: str
+    key: str = ''
+
+
+def fence_language(info: str) -> str | None:
+    """Return the checked language for a fence info string, or None."""
+    words = info.replace('{', ' ').replace('.', ' ').split()
+    return LANGUAGES.get(words[0].lower()) if words else None
+
+
+def extract_blocks(path: str) -> list[CodeBlock]:
+    """Return a chapter's fenced code blocks in checked languages."""
+    document = parse_file(path)
+    blocks = []
+    for block in document.blocks_of('code'):
+        language = fence_language(block.info)
+        if language is None:
+            continue
+        lines = document.block_lines(block)[1:]
+        # An unclosed fence runs to the end of the file without a closing line
+        if lines and lines[-1].strip().startswith('```'):
+            lines = lines[:-1]
+        code = textwrap.dedent('\n'.join(lines))
+        blocks.append(CodeBlock(path, block.start, language, code + '\n'))
+    return blocks
+
+
+def tool_version(language: str) -> str | None:
+    """Return the version string of a language's checker, or None if unavailable."""
+    if language == 'python':
+        return sys.version
+    tool = shutil.which(TOOLS[language])
+    if tool is None:
+        return None
+    try:
+        result = subprocess.run([tool, '--version'], capture_output=True, text=True,
+                                timeout=TOOL_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout.strip() or None
+
+
+def block_key(block: CodeBlock, version: str) -> str:
+    key = f'{CHECKER_VERSION}:{block.language}:{version}:{block.code}'
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+# Checkers return (line, column, message) errors with 1-based lines relative
+# to the first line of code. They run in worker processes.
+
+def check_python(code: str) -> list[tuple[int, int, str]]:
+    flags = ast.PyCF_ONLY_AST | ast.PyCF_ALLOW_TOP_LEVEL_AWAIT
+    try:
+        compile(code, '<code block>', 'exec', flags)
+    except SyntaxError as e:
+        return [(e.lineno or 1, e.offset or 1, e.msg)]
+    return []
+
+
+def _run_tool(args: list[str], tmp_dir: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, RUSTC_BOOTSTRAP='1')
+    return subprocess.run(args, capture_output=True, text=True, cwd=tmp_dir, env=env,
+                          timeout=TOOL_TIMEOUT)
+
+
+def check_rust(code: str) -> list[tuple[int, int, str]]:
+    def parse(source: str) -> list[tuple[int, int, str]]:
+        with open(os.path.join(tmp_dir, 'block.rs'), 'w', encoding='utf-8') as f:
+            f.write(source)
+        result = _run_tool(['rustc', '--edition', '2021', '--error-format=short',
+                            '-Zunpretty=normal', 'block.rs'], tmp_dir)
+        if result.returncode == 0:
+            return []
+        errors = []
+        for line in result.stderr.splitlines():
+            match = RUST_ERROR_PATTERN.match(line)
+            if match and not match.group(3).startswith('aborting due to'):
+                errors.append((int(match.group(1)), int(match.group(2)), match.group(3)))
+        return errors or [(1, 1, result.stderr.strip() or 'rustc failed')]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        errors = parse(code)
+        # Snippets are often a few statements rather than whole items
+        if errors and not parse('fn __block() {\n' + code + '}\n'):
+            return []
+        return errors
+
+
+def check_typescript(code: str) -> list[tuple[int, int, str]]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(os.path.join(tmp_dir, 'block.ts'), 'w', encoding='utf-8') as f:
+            f.write(code)
+        result = _run_tool(['tsc', '--noEmit', '--pretty', 'false', '--target', 'es2022',
+                            '--module', 'esnext', 'block.ts'], tmp_dir)
+    errors = []
+    for line in result.stdout.splitlines():
+        match = TSC_ERROR_PATTERN.match(line)
+        # TS1xxx are the parser's diagnostics; the rest need declarations
+        if match and match.group(3).startswith('1') and len(match.group(3)) == 4:
+            errors.append((int(match.group(1)), int(match.group(2)), match.group(4)))
+    return errors
+
+
+def check_javascript(code: str) -> list[tuple[int, int, str]]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(os.path.join(tmp_dir, 'block.mjs'), 'w', encoding='utf-8') as f:
+            f.write(code)
+        result = _run_tool(['node', '--check', 'block.mjs'], tmp_dir)
+    if result.returncode == 0:
+        return []
+    line_number = 1
+    message = result.stderr.strip() or 'node --check failed'
+    for line in result.stderr.splitlines():
+        location = NODE_LOCATION_PATTERN.match(line)
+        if location and line_number == 1:
+            line_number = int(location.group(1))
+        error = NODE_ERROR_PATTERN.match(line)
+        if error:
+            message = error.group(1)
+    return [(line_number, 1, message)]
+
+
+CHECKERS = {
+    'python': check_python,
+    'rust': check_rust,
+    'typescript': check_typescript,
+    'javascript': check_javascript,
+}
+
+
+def check_code(language: str, code: str) -> list[list]:
+    """Check one block; failures to run the tool are reported, not raised."""
+    try:
+        return [[line, column, 'syntax-error', message]
+                for line, column, message in CHECKERS[language](code)]
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return [[1, 1, 'checker-failed', f'{TOOLS[language]}: {e}']]
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, f'{key}.json')
+
+
+def load_result(key: str) -> list[list] | None:
+    try:
+        with open(_cache_path(key), 'r', encoding='utf-8') as f:
+            return json.load(f)['errors']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def store_result(key: str, errors: list[list]) -> None:
+    path = _cache_path(key)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'errors': errors}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Caching is best-effort; a read-only tree still checks fine
+        pass
+
+
+def check_blocks(blocks: list[CodeBlock], jobs: int) -> tuple[dict[str, list[list]], int]:
+    """Return errors by block key, and how many distinct blocks were checked.
+
+    Identical blocks (the same example in two chapters) are checked once.
+    """
+    results = {}
+    pending = {}
+    for block in blocks:
+        if block.key in results or block.key in pending:
+            continue
+        cached = load_result(block.key)
+        if cached is not None:
+            results[block.key] = cached
+        else:
+            pending[block.key] = block
+
+    keys = list(pending)
+    languages = [pending[key].language for key in keys]
+    codes = [pending[key].code for key in keys]
+    if jobs > 1 and len(keys) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            chunksize = max(1, len(keys) // (jobs * 4))
+            checked = list(pool.map(check_code, languages, codes, chunksize=chunksize))
+    else:
+        checked = list(map(check_code, languages, codes))
+
+    for key, errors in zip(keys, checked):
+        if not any(rule == 'checker-failed' for _, _, rule, _ in errors):
+            store_result(key, errors)
+        results[key] = errors
+    return results, len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Syntax-check the fenced code examples in chapters'
+    )
+    parser.add_argument('books', nargs='*',
+                        help='Book directory names under ebooks/ (default: all books)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Blocks checked in parallel (default: CPU count)')
+    parser.add_argument(
+        '--format',
+        choices=FORMATS,
+        default='text',
+        help='Output format: text (default), or json/sarif diagnostics'
+    )
+    args = parser.parse_args()
+
+    books = args.books or sorted(
+        os.path.basename(os.path.dirname(path))
+        for path in glob.glob(os.path.join(REPO_ROOT, 'ebooks', '*', 'chapters'))
+        if not os.path.basename(os.path.dirname(path)).startswith('_')
+    )
+    chapters = []
+    for book in books:
+        chapters_dir = os.path.join(REPO_ROOT, 'ebooks', book, 'chapters')
+        if not os.path.isdir(chapters_dir):
+            print(f"Error: No chapters directory found in ebooks/{book}", file=sys.stderr)
+            sys.exit(1)
+        chapters += sorted(glob.glob(os.path.join(chapters_dir, '*.md')))
+
+    by_chapter = {path: extract_blocks(path) for path in chapters}
+    versions = {}
+    skipped = {}
+    blocks = []
+    for chapter_blocks in by_chapter.values():
+        for block in chapter_blocks:
+            if block.language not in versions:
+                versions[block.language] = tool_version(block.language)
+            if versions[block.language] is None:
+                skipped[block.language] = skipped.get(block.language, 0) + 1
+                continue
+            block.key = block_key(block, versions[block.language])
+            blocks.append(block)
+
+    results, checked = check_blocks(blocks, args.jobs)
+
+    reporter = None
+    if args.format != 'text':
+        reporter = make_reporter(args.format, sys.stdout, 'check-code-blocks', RULES)
+
+    total_errors = 0
+    files_with_errors = 0
+    for path, chapter_blocks in by_chapter.items():
+        diagnostics = [
+            # Error lines count from the first line after the opening fence
+            Diagnostic(os.path.relpath(path, REPO_ROOT), block.line + line, column, rule,
+                       f'{block.language}: {message}')
+            for block in chapter_blocks if block.key
+            for line, column, rule, message in results[block.key]
+        ]
+        if reporter is not None:
+            for diagnostic in diagnostics:
+                reporter.report(diagnostic)
+            reporter.end_file()
+        elif diagnostics:
+            print(f"\n{os.path.relpath(path, REPO_ROOT)}:")
+            for diagnostic in diagnostics:
+                print(f"  - Line {diagnostic.line}: {diagnostic.message}")
+
+        if diagnostics:
+            files_with_errors += 1
+            total_errors += len(diagnostics)
+
+    if reporter is not None:
+        reporter.finish({
+            'files': len(chapters),
+            'blocks': len(blocks),
+            'checked': checked,
+            'skipped': sum(skipped.values()),
+            'violations': total_errors,
+            'files_with_violations': files_with_errors,
+        })
+        sys.exit(1 if total_errors else 0)
+
+    for language, count in sorted(skipped.items()):
+        print(f"Skipped {count} {language} block(s): {TOOLS[language]} not found on PATH")
+    if total_errors:
+        print(f"\n{total_errors} syntax error(s) found in {files_with_errors} file(s)")
+        sys.exit(1)
+    print(f"All {len(blocks)} code block(s) in {len(chapters)} chapter(s) parse "
+          f"({checked} checked, {len(blocks) - checked} unchanged)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""Check internal links, anchors and image references in book chapters.
+
+Builds a heading index for every chapter of a book in one pass, then
+resolves each link against it with set lookups:
+
+  ./02-fundamentals.md            - the chapter must exist
+  ./02-fundamentals.md#caching    - and have a heading with that anchor
+  #caching                        - some heading in the book has it
+  ![...](../assets/diagram.html)  - the referenced file must exist
+
+External links (http:, https:, mailto:) are not checked. Links inside code
+blocks, inline code and HTML comments are ignored.
+
+Anchors follow pandoc's auto_identifiers rules (with the default smart
+extension): the heading text without formatting, lowercased, keeping only
+letters, digits, '_', '-' and '.', with whitespace runs turned into '-'
+and everything before the first letter dropped ('section' if nothing is
+left). An explicit {#id} wins. Headings are slugged as the build sees
+them, after rewrite-chapters.py strips the "Chapter N: " prefix. The
+book's chapters are built as one document, so a repeated heading gets
+'-1', '-2', ... across the whole book, in chapter order.
+
+Each chapter's headings and links are cached per file content hash under
+build/.cache/link-index/, so re-checking unchanged chapters doesn't parse
+them again.
+
+Usage:
+  check-links.py                       # every book under ebooks/
+  check-links.py api-optimization --format json
+"""
+
+import argparse
+import difflib
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass
+
+from lint_report import FORMATS, Diagnostic, make_reporter
+from markdown_blocks import parse_markdown
+
+# Bump when slug or link extraction changes to invalidate cached indexes
+INDEX_VERSION = 1
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+CACHE_DIR = os.path.join(REPO_ROOT, 'build', '.cache', 'link-index')
+
+RULES = {
+    'missing-chapter': 'Link to a chapter file that does not exist',
+    'missing-anchor': 'Link to an anchor no heading produces',
+    'missing-file': 'Image or link to a file that does not exist',
+}
+
+# Blocks that can contain links; code and comments are skipped
+LINK_BLOCKS = ('heading', 'paragraph', 'image', 'callout', 'table', 'navigation')
+
+INLINE_CODE_PATTERN = re.compile(r'(`+)(.+?)\1')
+LINK_PATTERN = re.compile(r'(!?)\[((?:[^\[\]]|\[[^\[\]]*\])*)\]\(\s*<?([^)\s>]*)>?(?:\s+"[^"]*")?\s*\)')
+EXTERNAL_PATTERN = re.compile(r'^(?:[a-zA-Z][a-zA-Z0-9+.-]*:|//)')
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*?)\s*$')
+CLOSING_HASHES_PATTERN = re.compile(r'(?:^|\s+)#+$')
+ATTRIBUTES_PATTERN = re.compile(r'\s*\{([^{}]*)\}$')
+
+# Inline markup removed before slugging (pandoc's stringify)
+FOOTNOTE_PATTERN = re.compile(r'\[\^[^\]]*\]')
+IMAGE_OR_LINK_PATTERN = re.compile(r'!?\[((?:[^\[\]]|\[[^\[\]]*\])*)\]\([^)]*\)')
+HTML_TAG_PATTERN = re.compile(r'</?[a-zA-Z][^>]*>')
+EMPHASIS_UNDERSCORE_PATTERN = re.compile(r'(?<![0-9A-Za-z])_+|_+(?![0-9A-Za-z])')
+SMART_DASH_PATTERN = re.compile(r'-{2,3}|\.\.\.')
+ESCAPE_PATTERN = re.compile(r'\\(.)')
+
+
+def load_rewriter():
+    """Import rewrite-chapters.py, whose hyphenated name blocks a normal import."""
+    spec = importlib.util.spec_from_file_location(
+        'rewrite_chapters', os.path.join(SCRIPT_DIR, 'rewrite-chapters.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+CHAPTER_PREFIX_PATTERN = load_rewriter().CHAPTER_PREFIX_PATTERN
+
+
+@dataclass
+class Link:
+    line: int
+    column: int  # 1-based
+    target: str
+    image: bool
+
+
+@dataclass
+class ChapterIndex:
+    path: str
+    headings: list[tuple[int, str, str | None]]  # (line, base slug, explicit id)
+    links: list[Link]
+
+
+def stringify_heading(text: str) -> str:
+    """Return heading text without inline markup, as pandoc's stringify sees it."""
+    spans = []
+
+    def keep_code(match):
+        spans.append(match.group(2).strip())
+        return f'\0{len(spans) - 1}\0'
+
+    text = INLINE_CODE_PATTERN.sub(keep_code, text)
+    text = FOOTNOTE_PATTERN.sub('', text)
+    text = IMAGE_OR_LINK_PATTERN.sub(r'\1', text)
+    text = HTML_TAG_PATTERN.sub('', text)
+    text = EMPHASIS_UNDERSCORE_PATTERN.sub('', text)
+    text = SMART_DASH_PATTERN.sub('', text)  # smart dashes and ellipses are punctuation
+    text = ESCAPE_PATTERN.sub(r'\1', text)
+    return re.sub(r'\0(\d+)\0', lambda m: spans[int(m.group(1))], text)
+
+
+def slugify(text: str) -> str:
+    """Return pandoc's auto identifier for heading text (before deduplication)."""
+    text = stringify_heading(text).lower()
+    kept = ''.join(c for c in text if c.isalnum() or c in '_-.' or c.isspace())
+    slug = '-'.join(kept.split())
+    for i, c in enumerate(slug):
+        if c.isalpha():
+            return slug[i:]
+    return 'section'
+
+
+def parse_heading(line: str) -> tuple[str, str | None]:
+    """Return (base slug, explicit id or None) for an ATX heading line."""
+    line = CHAPTER_PREFIX_PATTERN.sub('# ', line.strip())
+    text = HEADING_PATTERN.match(line).group(2)
+    text = CLOSING_HASHES_PATTERN.sub('', text)
+    explicit = None
+    attributes = ATTRIBUTES_PATTERN.search(text)
+    if attributes:
+        text = text[:attributes.start()]
+        for attribute in attributes.group(1).split():
+            if attribute.startswith('#'):
+                explicit = attribute[1:]
+    return slugify(text), explicit
+
+
+def extract_links(line: str, line_number: int) -> list[Link]:
+    """Return the links and images on a line, ignoring inline code."""
+    masked = INLINE_CODE_PATTERN.sub(lambda m: ' ' * len(m.group(0)), line)
+    return [
+        Link(line_number, match.start() + 1, match.group(3), match.group(1) == '!')
+        for match in LINK_PATTERN.finditer(masked)
+        if match.group(3)
+    ]
+
+
+def build_index(content: str, path: str) -> ChapterIndex:
+    """Index a chapter's headings and links in one pass over its blocks."""
+    document = parse_markdown(content, path)
+    headings = []
+    links = []
+    for block in document.blocks_of(*LINK_BLOCKS):
+        for offset, line in enumerate(document.block_lines(block)):
+            line_number = block.start + offset
+            if block.kind == 'heading':
+                base, explicit = parse_heading(line)
+                headings.append((line_number, base, explicit))
+            links += extract_links(line, line_number)
+    return ChapterIndex(path, headings, links)
+
+
+def _cache_path(digest: str) -> str:
+    return os.path.join(CACHE_DIR, f'{digest}.json')
+
+
+def load_index(path: str) -> ChapterIndex:
+    """Return a chapter's index, from the cache when its content is unchanged."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    key = f'{INDEX_VERSION}:{CHAPTER_PREFIX_PATTERN.pattern}:'
+    digest = hashlib.sha256(key.encode('utf-8') + raw).hexdigest()
+
+    try:
+        with open(_cache_path(digest), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return ChapterIndex(
+            path,
+            [tuple(heading) for heading in data['headings']],
+            [Link(*fields) for fields in data['links']],
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    index = build_index(raw.decode('utf-8'), path)
+    data = {
+        'headings': index.headings,
+        'links': [[l.line, l.column, l.target, l.image] for l in index.links],
+    }
+    cache_path = _cache_path(digest)
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Caching is best-effort; a read-only tree still checks fine
+        pass
+    return index
+
+
+def heading_anchors(indexes: list[ChapterIndex]) -> dict[str, list[str]]:
+    """Return each chapter's heading anchors in order, deduplicated across the book as pandoc does."""
+    # Explicit ids are taken in document order: an automatic id only avoids
+    # the explicit ones before it
+    used = set()
+    anchors = {}
+    for index in indexes:
+        chapter_anchors = anchors[index.path] = []
+        for _, base, explicit in index.headings:
+            if explicit:
+                used.add(explicit)
+                chapter_anchors.append(explicit)
+                continue
+            anchor = base
+            suffix = 0
+            while anchor in used:
+                suffix += 1
+                anchor = f'{base}-{suffix}'
+            used.add(anchor)
+            chapter_anchors.append(anchor)
+    return anchors
+
+
+def assign_anchors(indexes: list[ChapterIndex]) -> dict[str, set[str]]:
+    """Return the anchors of each chapter, deduplicated across the book as pandoc does."""
+    return {path: set(anchors) for path, anchors in heading_anchors(indexes).items()}
+
+
+def suggest(name: str, candidates) -> str:
+    """Return a ' (did you mean ...?)' hint for a close match, or ''."""
+    matches = difflib.get_close_matches(name, list(candidates), n=1)
+    return f" (did you mean {matches[0]}?)" if matches else ''
+
+
+def check_link(link: Link, chapter: str, anchors: dict[str, set[str]],
+               book_anchors: set[str]) -> tuple[str, str] | None:
+    """Return (rule, message) for a broken link, or None if it resolves."""
+    target, _, fragment = link.target.partition('#')
+
+    if not target:
+        if fragment in book_anchors:
+            return None
+        return 'missing-anchor', f"No heading with anchor #{fragment}{suggest(fragment, book_anchors)}"
+
+    resolved = os.path.normpath(os.path.join(os.path.dirname(chapter), target))
+    if resolved.endswith('.md') and not link.image:
+        if resolved not in anchors:
+            siblings = [os.path.basename(p) for p in anchors]
+            return 'missing-chapter', (f"Link to missing chapter {target}"
+                                       f"{suggest(os.path.basename(target), siblings)}")
+        if fragment and fragment not in anchors[resolved]:
+            return 'missing-anchor', (f"No heading with anchor #{fragment} in {target}"
+                                      f"{suggest(fragment, anchors[resolved])}")
+        return None
+
+    if not os.path.exists(resolved):
+        kind = 'Image' if link.image else 'Link'
+        directory = os.path.dirname(resolved)
+        siblings = os.listdir(directory) if os.path.isdir(directory) else []
+        return 'missing-file', (f"{kind} references missing file {target}"
+                                f"{suggest(os.path.basename(target), siblings)}")
+    return None
+
+
+def check_book(book_dir: str) -> tuple[int, list[tuple[str, list[Diagnostic]]]]:
+    """Check every chapter of a book. Returns (link count, [(chapter, diagnostics)])."""
+    chapters = sorted(glob.glob(os.path.join(book_dir, 'chapters', '*.md')))
+    indexes = [load_index(path) for path in chapters]
+    anchors = assign_anchors(indexes)
+    book_anchors = set().union(*anchors.values()) if anchors else set()
+
+    results = []
+    total = 0
+    for index in indexes:
+        diagnostics = []
+        for link in index.links:
+            if EXTERNAL_PATTERN.match(link.target):
+                continue
+            total += 1
+            problem = check_link(link, index.path, anchors, book_anchors)
+            if problem:
+                rule, message = problem
+                diagnostics.append(Diagnostic(index.path, link.line, link.column, rule, message))
+        results.append((index.path, diagnostics))
+    return total, results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check internal links, anchors and image references in chapters'
+    )
+    parser.add_argument('books', nargs='*',
+                        help='Book directory names under ebooks/ (default: all books)')
+    parser.add_argument(
+        '--format',
+        choices=FORMATS,
+        default='text',
+        help='Output format: text (default), or json/sarif diagnostics '
+             'streamed as each chapter is checked'
+    )
+    args = parser.parse_args()
+
+    books = args.books or sorted(
+        os.path.basename(os.path.dirname(path))
+        for path in glob.glob(os.path.join(REPO_ROOT, 'ebooks', '*', 'chapters'))
+        if not os.path.basename(os.path.dirname(path)).startswith('_')
+    )
+    for book in books:
+        if not os.path.isdir(os.path.join(REPO_ROOT, 'ebooks', book, 'chapters')):
+            print(f"Error: No chapters directory found in ebooks/{book}", file=sys.stderr)
+            sys.exit(1)
+
+    reporter = None
+    if args.format != 'text':
+        reporter = make_reporter(args.format, sys.stdout, 'check-links', RULES)
+
+    total_links = 0
+    total_chapters = 0
+    total_errors = 0
+    files_with_errors = 0
+    for book in books:
+        links, results = check_book(os.path.join(REPO_ROOT, 'ebooks', book))
+        total_links += links
+        total_chapters += len(results)
+        for path, diagnostics in results:
+            path = os.path.relpath(path, REPO_ROOT)
+            if reporter is not None:
+                for diagnostic in diagnostics:
+                    diagnostic.path = path
+                    reporter.report(diagnostic)
+                reporter.end_file()
+            elif diagnostics:
+                print(f"\n{path}:")
+                for diagnostic in diagnostics:
+                    print(f"  - Line {diagnostic.line}: {diagnostic.message}")
+
+            if diagnostics:
+                files_with_errors += 1
+                total_errors += len(diagnostics)
+
+    if reporter is not None:
+        reporter.finish({
+            'files': total_chapters,
+            'links': total_links,
+            'violations': total_errors,
+            'files_with_violations': files_with_errors,
+        })
+        sys.exit(1 if total_errors else 0)
+
+    if total_errors:
+        print(f"\n{total_errors} broken link(s) found in {files_with_errors} file(s)")
+        sys.exit(1)
+    print(f"All {total_links} internal link(s) in {total_chapters} chapter(s) resolve")
+
+
+if __name__ == '__main__':
+    main()
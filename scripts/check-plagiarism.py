@@ -10,10 +10,16 @@ Severity levels:
   CLEAN           - no matches found
   CITED MATCH     - match found but source is cited (likely intentional)
   POTENTIAL MATCH - match found against an uncited source (needs review)
+
+Long runs can be streamed to a JSON Lines file with --output, one record
+per passage as it completes. Re-running with --resume skips passages that
+are already recorded there, so an interrupted run picks up where it left off;
+passages whose search failed are checked again.
 """
 
 import argparse
 import glob
+import hashlib
 import html
 import json
 import os
@@ -24,6 +30,13 @@ import urllib.error
 import urllib.parse
 import urllib.request
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; scoring falls back to pure Python
+    np = None
+
+from markdown_blocks import parse_file
+
 
 # ---------------------------------------------------------------------------
 # Passage Extraction
@@ -67,45 +80,12 @@ def strip_inline_markdown(text):
 
 def extract_prose_paragraphs(filepath):
     """Extract prose paragraphs from a markdown file, skipping non-prose."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
+    document = parse_file(filepath)
 
     paragraphs = []
-    current_paragraph = []
-    in_code_block = False
-
-    for line in content.split('\n'):
-        stripped = line.strip()
-
-        # Track code blocks
-        if stripped.startswith('```'):
-            in_code_block = not in_code_block
-            if current_paragraph:
-                paragraphs.append(' '.join(current_paragraph))
-                current_paragraph = []
-            continue
-
-        if in_code_block:
-            continue
-
-        # Skip non-prose lines
-        if any(pat.match(stripped) for pat in SKIP_LINE_PATTERNS):
-            if current_paragraph:
-                paragraphs.append(' '.join(current_paragraph))
-                current_paragraph = []
-            continue
-
-        # Blank line ends paragraph
-        if not stripped:
-            if current_paragraph:
-                paragraphs.append(' '.join(current_paragraph))
-                current_paragraph = []
-            continue
-
-        current_paragraph.append(stripped)
-
-    if current_paragraph:
-        paragraphs.append(' '.join(current_paragraph))
+    for block in document.blocks_of('paragraph'):
+        lines = document.block_lines(block)
+        paragraphs.append(' '.join(line.strip() for line in lines))
 
     # Clean up inline markdown and filter short paragraphs
     cleaned = []
@@ -118,25 +98,65 @@ def extract_prose_paragraphs(filepath):
     return cleaned
 
 
+# Very common words that make a passage less distinctive
+COMMON_WORDS = frozenset({
+    'the', 'is', 'are', 'was', 'were', 'be', 'to', 'of',
+    'and', 'a', 'in', 'that', 'it', 'for', 'on', 'with',
+})
+
+
 def score_passage(text):
     """Score a passage for distinctiveness. Higher = more distinctive."""
-    words = text.split()
-    word_count = len(words)
+    return score_paragraphs([text])[0]
 
-    # Prefer passages around the target length
-    length_score = word_count
 
-    # Prefer sentences with narrative flow (longer average word length)
-    avg_word_len = sum(len(w) for w in words) / max(word_count, 1)
-    vocabulary_score = avg_word_len * 10
+def tokenize_paragraphs(paragraphs):
+    """Tokenize paragraphs once into flat word-length and stopword arrays.
 
-    # Prefer passages with fewer very common technical words
-    common_words = {'the', 'is', 'are', 'was', 'were', 'be', 'to', 'of',
-                    'and', 'a', 'in', 'that', 'it', 'for', 'on', 'with'}
-    common_ratio = sum(1 for w in words if w.lower() in common_words) / max(word_count, 1)
-    uniqueness_score = (1 - common_ratio) * 50
-
-    return length_score + vocabulary_score + uniqueness_score
+    Returns (word_lengths, stopword_flags, offsets) where the words of
+    paragraph i occupy word_lengths[offsets[i]:offsets[i + 1]].
+    """
+    word_lengths = []
+    stopword_flags = []
+    offsets = [0]
+    for paragraph in paragraphs:
+        words = paragraph.split()
+        word_lengths.extend(len(w) for w in words)
+        stopword_flags.extend(w.lower() in COMMON_WORDS for w in words)
+        offsets.append(len(word_lengths))
+    return word_lengths, stopword_flags, offsets
+
+
+def score_paragraphs(paragraphs):
+    """Score every paragraph of a chapter for distinctiveness in bulk.
+
+    Each score combines word count (prefer passages around the target
+    length), average word length (narrative flow) and the share of words
+    that are not very common. Uses NumPy when available.
+    """
+    word_lengths, stopword_flags, offsets = tokenize_paragraphs(paragraphs)
+
+    if np is not None:
+        offsets = np.asarray(offsets)
+        length_sums = np.concatenate(([0], np.cumsum(word_lengths)))
+        stopword_sums = np.concatenate(([0], np.cumsum(stopword_flags)))
+        word_counts = np.diff(offsets)
+        total_lengths = length_sums[offsets[1:]] - length_sums[offsets[:-1]]
+        stopwords = stopword_sums[offsets[1:]] - stopword_sums[offsets[:-1]]
+        denominators = np.maximum(word_counts, 1)
+        scores = (word_counts
+                  + total_lengths / denominators * 10
+                  + (1 - stopwords / denominators) * 50)
+        return scores.tolist()
+
+    scores = []
+    for start, end in zip(offsets, offsets[1:]):
+        word_count = end - start
+        denominator = max(word_count, 1)
+        avg_word_len = sum(word_lengths[start:end]) / denominator
+        common_ratio = sum(stopword_flags[start:end]) / denominator
+        scores.append(word_count + avg_word_len * 10 + (1 - common_ratio) * 50)
+    return scores
 
 
 def extract_passage(text, target_words):
@@ -176,6 +196,8 @@ def select_passages(paragraphs, num_passages, target_words):
     if len(paragraphs) <= num_passages:
         return [extract_passage(p, target_words) for p in paragraphs]
 
+    scores = score_paragraphs(paragraphs)
+
     # Divide paragraphs into equal segments
     segment_size = len(paragraphs) / num_passages
     passages = []
@@ -183,14 +205,17 @@ def select_passages(paragraphs, num_passages, target_words):
     for i in range(num_passages):
         start = int(i * segment_size)
         end = int((i + 1) * segment_size)
-        segment = paragraphs[start:end]
 
-        if not segment:
+        if start >= end:
             continue
 
         # Pick the most distinctive paragraph from this segment
-        best = max(segment, key=score_passage)
-        passages.append(extract_passage(best, target_words))
+        # (first wins on ties, matching max())
+        if np is not None:
+            best = start + int(np.argmax(scores[start:end]))
+        else:
+            best = max(range(start, end), key=scores.__getitem__)
+        passages.append(extract_passage(paragraphs[best], target_words))
 
     return passages
 
@@ -296,77 +321,143 @@ def parse_duckduckgo_results(html_body):
 # Citation Cross-Reference
 # ---------------------------------------------------------------------------
 
-def load_works_cited(book_dir):
-    """Load author names and keywords from WORKS_CITED.md for matching."""
-    works_cited_path = os.path.join(book_dir, 'WORKS_CITED.md')
-    if not os.path.exists(works_cited_path):
-        return []
-
-    with open(works_cited_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+# Compiled matchers keyed by the SHA-256 of WORKS_CITED.md content
+_CITED_MATCHERS = {}
 
-    # Extract author names, book titles, and organization names
-    cited_terms = []
 
-    # Author names from bold entries: **Name, First.**
-    for match in re.finditer(r'\*\*([^*]+?)\.\*\*', content):
-        name = match.group(1).strip()
-        # Extract last name (first part before comma)
-        parts = name.split(',')
-        if parts:
-            cited_terms.append(parts[0].strip().lower())
+def parse_cited_terms(content):
+    """Extract author names, titles and site names from WORKS_CITED.md text."""
+    cited_terms = set()
 
-    # Organization/tool names from bold entries
+    # Author and organization names from bold entries: **Name, First.**
+    # (the surname or organization is the part before the first comma)
     for match in re.finditer(r'\*\*([^*]+?)\.\*\*', content):
         term = match.group(1).split(',')[0].strip()
         if term:
-            cited_terms.append(term.lower())
+            cited_terms.add(term.lower())
 
     # Italic book titles: *Title*
     for match in re.finditer(r'\*([^*]{5,}?)\*', content):
         title = match.group(1).strip()
         if not title.startswith('Last updated'):
-            cited_terms.append(title.lower())
+            cited_terms.add(title.lower())
 
     # Website/org names
     for match in re.finditer(r'\b(\w+\.(?:com|org|io|net))\b', content):
-        cited_terms.append(match.group(1).lower())
+        cited_terms.add(match.group(1).lower())
+
+    return cited_terms
+
+
+def compile_cited_matcher(cited_terms):
+    """Compile cited terms into one alternation anchored on word boundaries.
+
+    Longer terms are listed first so the regex engine prefers the most
+    specific match, and a single search() covers the whole bibliography.
+    """
+    if not cited_terms:
+        return None
+    alternation = '|'.join(
+        re.escape(term) for term in sorted(cited_terms, key=len, reverse=True)
+    )
+    return re.compile(rf'(?<!\w)(?:{alternation})(?!\w)')
+
+
+def load_works_cited(book_dir):
+    """Load a compiled citation matcher from WORKS_CITED.md.
 
-    return list(set(cited_terms))
+    Returns None when the book has no WORKS_CITED.md. The matcher is cached
+    per file content hash, so repeated calls for an unchanged bibliography
+    reuse the compiled pattern.
+    """
+    works_cited_path = os.path.join(book_dir, 'WORKS_CITED.md')
+    if not os.path.exists(works_cited_path):
+        return None
 
+    with open(works_cited_path, 'rb') as f:
+        raw = f.read()
 
-def is_cited_match(result, cited_terms):
+    digest = hashlib.sha256(raw).hexdigest()
+    if digest not in _CITED_MATCHERS:
+        cited_terms = parse_cited_terms(raw.decode('utf-8'))
+        _CITED_MATCHERS[digest] = compile_cited_matcher(cited_terms)
+    return _CITED_MATCHERS[digest]
+
+
+def is_cited_match(result, cited_matcher):
     """Check if a search result matches a known citation."""
+    if cited_matcher is None:
+        return False
     text = (result.get('title', '') + ' ' + result.get('snippet', '')).lower()
-    for term in cited_terms:
-        if term in text:
-            return True
-    return False
+    return cited_matcher.search(text) is not None
 
 
 # ---------------------------------------------------------------------------
 # Report Generation
 # ---------------------------------------------------------------------------
 
-def format_text_report(all_results):
-    """Format results as human-readable text."""
+SEVERITIES = ['CLEAN', 'CITED MATCH', 'POTENTIAL MATCH', 'SEARCH ERROR']
+
+
+def summarize(records):
+    """Count passage records by severity."""
+    summary_counts = {severity: 0 for severity in SEVERITIES}
+    for record in records:
+        summary_counts[record['severity']] += 1
+    return summary_counts
+
+
+def group_by_chapter(records):
+    """Group flat passage records into per-chapter results, in stream order."""
+    all_results = []
+    by_chapter = {}
+    for record in records:
+        chapter = record['chapter']
+        if chapter not in by_chapter:
+            by_chapter[chapter] = {
+                'chapter': chapter,
+                'paragraph_count': record['paragraph_count'],
+                'passages': [],
+            }
+            all_results.append(by_chapter[chapter])
+        passage_result = {
+            k: v for k, v in record.items()
+            if k not in ('chapter', 'paragraph_count')
+        }
+        by_chapter[chapter]['passages'].append(passage_result)
+    return all_results
+
+
+def format_summary(summary_counts):
+    """Format severity counts as the report summary block."""
     lines = []
     lines.append('=' * 70)
-    lines.append('PLAGIARISM SPOT-CHECK REPORT')
+    lines.append('SUMMARY')
+    lines.append(f'  Clean passages:     {summary_counts["CLEAN"]}')
+    lines.append(f'  Cited matches:      {summary_counts["CITED MATCH"]}')
+    lines.append(f'  Potential matches:  {summary_counts["POTENTIAL MATCH"]}')
+    lines.append(f'  Search errors:      {summary_counts["SEARCH ERROR"]}')
+
+    total = sum(summary_counts.values())
+    lines.append(f'  Total checked:      {total}')
     lines.append('=' * 70)
+    return '\n'.join(lines)
 
-    summary_counts = {
-        'CLEAN': 0, 'CITED MATCH': 0, 'POTENTIAL MATCH': 0, 'SEARCH ERROR': 0,
-    }
 
-    for chapter_result in all_results:
+def format_text_report(records):
+    """Format passage records as human-readable text."""
+    lines = []
+    lines.append('=' * 70)
+    lines.append('PLAGIARISM SPOT-CHECK REPORT')
+    lines.append('=' * 70)
+
+    for chapter_result in group_by_chapter(records):
         chapter = chapter_result['chapter']
         lines.append(f'\n--- {chapter} ---')
 
         for passage_result in chapter_result['passages']:
             phrase = passage_result['search_phrase']
             severity = passage_result['severity']
-            summary_counts[severity] += 1
 
             if severity == 'CLEAN':
                 lines.append(f'  [{severity}] "{phrase}"')
@@ -385,23 +476,15 @@ def format_text_report(all_results):
                     if r['snippet']:
                         lines.append(f'       {r["snippet"][:100]}')
 
-    lines.append('\n' + '=' * 70)
-    lines.append('SUMMARY')
-    lines.append(f'  Clean passages:     {summary_counts["CLEAN"]}')
-    lines.append(f'  Cited matches:      {summary_counts["CITED MATCH"]}')
-    lines.append(f'  Potential matches:  {summary_counts["POTENTIAL MATCH"]}')
-    lines.append(f'  Search errors:      {summary_counts["SEARCH ERROR"]}')
-
-    total = sum(summary_counts.values())
-    lines.append(f'  Total checked:      {total}')
-    lines.append('=' * 70)
+    lines.append('')
+    lines.append(format_summary(summarize(records)))
 
     return '\n'.join(lines)
 
 
-def format_json_report(all_results):
-    """Format results as JSON."""
-    return json.dumps(all_results, indent=2)
+def format_json_report(records):
+    """Format passage records as JSON, grouped by chapter."""
+    return json.dumps(group_by_chapter(records), indent=2)
 
 
 def format_dry_run(all_results):
@@ -434,6 +517,58 @@ def format_dry_run(all_results):
     return '\n'.join(lines)
 
 
+# ---------------------------------------------------------------------------
+# Streaming Output
+# ---------------------------------------------------------------------------
+
+def passage_key(chapter, search_phrase):
+    """Identify a passage across runs by chapter and search phrase."""
+    return (chapter, search_phrase)
+
+
+def load_recorded_results(path):
+    """Load passage records from a previous JSON Lines output.
+
+    A run killed mid-write can leave a truncated final line; it is ignored
+    so the passage is simply checked again.
+    """
+    if not os.path.exists(path):
+        return []
+
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f'  Ignoring incomplete record in {path}',
+                      file=sys.stderr)
+    return records
+
+
+def rewrite_records(path, records):
+    """Replace a JSON Lines output with just the records being kept.
+
+    Run before --resume appends, so a truncated final line (or any other
+    unreadable one) doesn't get a new record joined onto it, and a passage
+    being retried after a search error isn't recorded twice.
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    os.replace(tmp_path, path)
+
+
+def write_record(stream, record):
+    """Append one passage record as a JSON line and flush it to disk."""
+    stream.write(json.dumps(record) + '\n')
+    stream.flush()
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
@@ -489,11 +624,26 @@ def main():
     )
     parser.add_argument(
         '--format',
-        choices=['text', 'json'], default='text',
-        help='Output format (default: text)',
+        choices=['text', 'json', 'jsonl'], default='text',
+        help='Output format; jsonl streams one record per passage to '
+             'stdout as it completes (default: text)',
+    )
+    parser.add_argument(
+        '--output',
+        help='Append passage records as JSON Lines to this file as they '
+             'complete; the final report is still printed to stdout',
+        default=None,
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Skip passages already recorded in the --output file',
     )
     args = parser.parse_args()
 
+    if args.resume and not args.output:
+        parser.error('--resume requires --output')
+
     book_dir = os.path.join('ebooks', args.bookname)
     if not os.path.isdir(book_dir):
         print(f'Error: book directory not found: {book_dir}', file=sys.stderr)
@@ -504,66 +654,116 @@ def main():
         print(f'Error: no chapters found', file=sys.stderr)
         sys.exit(1)
 
-    cited_terms = load_works_cited(book_dir)
-
-    all_results = []
-
-    for chapter_path in chapters:
-        chapter_name = os.path.basename(chapter_path)
-        paragraphs = extract_prose_paragraphs(chapter_path)
-        passages = select_passages(
-            paragraphs, args.passages_per_chapter, args.target_words
-        )
-
-        chapter_result = {
-            'chapter': chapter_name,
-            'paragraph_count': len(paragraphs),
-            'passages': [],
-        }
+    cited_matcher = load_works_cited(book_dir)
 
-        for passage in passages:
-            phrase = extract_search_phrase(passage)
-            passage_result = {
-                'passage': passage,
-                'search_phrase': phrase,
-                'severity': 'CLEAN',
-                'results': [],
-            }
+    if args.dry_run:
+        all_results = []
+        for chapter_path in chapters:
+            paragraphs = extract_prose_paragraphs(chapter_path)
+            passages = select_passages(
+                paragraphs, args.passages_per_chapter, args.target_words
+            )
+            all_results.append({
+                'chapter': os.path.basename(chapter_path),
+                'paragraph_count': len(paragraphs),
+                'passages': [
+                    {'passage': p, 'search_phrase': extract_search_phrase(p)}
+                    for p in passages
+                ],
+            })
+        print(format_dry_run(all_results))
+        return
+
+    # Records already in the stream (from --resume) count toward the report
+    records = []
+    if args.resume:
+        records = load_recorded_results(args.output)
+        # Failed searches are dropped from the file and checked again
+        failed = sum(r['severity'] == 'SEARCH ERROR' for r in records)
+        records = [r for r in records if r['severity'] != 'SEARCH ERROR']
+        note = f', retrying {failed} search error(s)' if failed else ''
+        print(f'  Resuming: {len(records)} passage(s) already recorded{note}',
+              file=sys.stderr)
+        if os.path.exists(args.output):
+            rewrite_records(args.output, records)
+    recorded = {passage_key(r['chapter'], r['search_phrase']) for r in records}
+
+    streams = []
+    if args.output:
+        streams.append(open(args.output, 'a' if args.resume else 'w',
+                            encoding='utf-8'))
+    if args.format == 'jsonl':
+        streams.append(sys.stdout)
+        for record in records:
+            write_record(sys.stdout, record)
+
+    try:
+        for chapter_path in chapters:
+            chapter_name = os.path.basename(chapter_path)
+            paragraphs = extract_prose_paragraphs(chapter_path)
+            passages = select_passages(
+                paragraphs, args.passages_per_chapter, args.target_words
+            )
+
+            checked = 0
+            for passage in passages:
+                phrase = extract_search_phrase(passage)
+                if passage_key(chapter_name, phrase) in recorded:
+                    continue
+
+                record = {
+                    'chapter': chapter_name,
+                    'paragraph_count': len(paragraphs),
+                    'passage': passage,
+                    'search_phrase': phrase,
+                    'severity': 'CLEAN',
+                    'results': [],
+                }
 
-            if not args.dry_run:
                 search = search_duckduckgo(phrase)
                 results = search['results']
-                passage_result['results'] = results
+                record['results'] = results
 
                 if search['error']:
-                    passage_result['severity'] = 'SEARCH ERROR'
-                    passage_result['error'] = search['error']
+                    record['severity'] = 'SEARCH ERROR'
+                    record['error'] = search['error']
                 elif results:
-                    if all(is_cited_match(r, cited_terms) for r in results):
-                        passage_result['severity'] = 'CITED MATCH'
+                    if all(is_cited_match(r, cited_matcher) for r in results):
+                        record['severity'] = 'CITED MATCH'
                     else:
-                        passage_result['severity'] = 'POTENTIAL MATCH'
+                        record['severity'] = 'POTENTIAL MATCH'
+
+                records.append(record)
+                for stream in streams:
+                    write_record(stream, record)
+                checked += 1
 
                 # Rate limit
                 time.sleep(args.delay)
 
-            chapter_result['passages'].append(passage_result)
-
-        all_results.append(chapter_result)
-
-        if not args.dry_run:
             # Progress indicator
-            print(f'  Checked {chapter_name} '
-                  f'({len(passages)} passages)',
+            skipped = len(passages) - checked
+            note = f', {skipped} already recorded' if skipped else ''
+            print(f'  Checked {chapter_name} ({checked} passages{note})',
                   file=sys.stderr)
-
-    # Output
-    if args.dry_run:
-        print(format_dry_run(all_results))
+    except KeyboardInterrupt:
+        print(f'\nInterrupted after {len(records)} passage(s).',
+              file=sys.stderr)
+        if args.output:
+            print(f'Re-run with --output {args.output} --resume to continue.',
+                  file=sys.stderr)
+        sys.exit(130)
+    finally:
+        if args.output:
+            streams[0].close()
+
+    # Output (computed from the streamed records)
+    if args.format == 'jsonl':
+        print(format_summary(summarize(records)), file=sys.stderr)
     elif args.format == 'json':
-        print(format_json_report(all_results))
+        print(format_json_report(records))
     else:
-        print(format_text_report(all_results))
+        print(format_text_report(records))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""Measure diagram complexity, check it against per-book budgets and rank the costliest.
+
+Each HTML diagram's <svg> is located with the same parse as
+lint-html-diagrams.py, and measured:
+
+  elements  - SVG elements, including the <svg> itself
+  segments  - drawn path segments: each command in a path's d attribute
+              (implicit repeats included), each line, and each edge of a
+              polyline or polygon
+  texts     - <text> elements
+  bytes     - size of the <svg> markup
+  render_ms - rsvg-convert time to PDF, the conversion the PDF build does
+              (median of --repeat runs; skipped with --no-render or when
+              rsvg-convert isn't installed)
+
+Diagrams are ranked by measured render time, or by an estimated cost when
+it isn't measured. The estimate weighs text most (shaping dominates
+rsvg's time for these diagrams), then path segments, then elements; see
+COST_WEIGHTS.
+
+Budgets default to DEFAULT_BUDGET and can be overridden per book in
+ebooks/<book>/diagram-budget.json, e.g. {"segments": 300, "render_ms": 150}.
+A diagram over any budget is reported (--format json|sarif streams the
+diagnostics, see lint_report.py) and the exit status is 1.
+
+Usage:
+  diagram-budget.py                       # every book under ebooks/
+  diagram-budget.py api-optimization --top 20 --repeat 3
+"""
+
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from lint_report import FORMATS, Diagnostic, make_reporter
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+
+BUDGET_FILE = 'diagram-budget.json'
+DEFAULT_BUDGET = {
+    'elements': 250,
+    'segments': 200,
+    'texts': 120,
+    'bytes': 32 * 1024,
+    'render_ms': 250,
+}
+
+# Estimated cost per unit when render time isn't measured
+COST_WEIGHTS = {'elements': 1.0, 'segments': 0.5, 'texts': 4.0}
+
+RULES = {
+    f'over-{metric.replace("_", "-")}': f'Diagram exceeds its {metric} budget'
+    for metric in DEFAULT_BUDGET
+}
+
+ELEMENT_PATTERN = re.compile(r'<([a-zA-Z][\w:-]*)[\s/>]')
+PATH_DATA_PATTERN = re.compile(r'<path\b[^>]*?\sd="([^"]*)"')
+POINTS_PATTERN = re.compile(r'<(polyline|polygon)\b[^>]*?\spoints="([^"]*)"')
+PATH_TOKEN_PATTERN = re.compile(r'([MmLlHhVvCcSsQqTtAaZz])|(-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)')
+NUMBER_PATTERN = re.compile(r'-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+# Numbers consumed by one segment of each path command
+COMMAND_ARITY = {'m': 2, 'l': 2, 't': 2, 'h': 1, 'v': 1, 'c': 6, 's': 4, 'q': 4, 'a': 7}
+
+
+@dataclass
+class Metrics:
+    path: str
+    line: int        # line of the <svg> tag
+    elements: int
+    segments: int
+    texts: int
+    bytes: int
+    render_ms: float | None = None
+
+    @property
+    def estimated_cost(self) -> float:
+        return sum(getattr(self, metric) * weight for metric, weight in COST_WEIGHTS.items())
+
+
+def load_linter():
+    """Import lint-html-diagrams.py, whose hyphenated name blocks a normal import."""
+    spec = importlib.util.spec_from_file_location(
+        'lint_html_diagrams', os.path.join(SCRIPT_DIR, 'lint-html-diagrams.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_extractor():
+    """Import extract-svg.py, whose hyphenated name blocks a normal import."""
+    spec = importlib.util.spec_from_file_location(
+        'extract_svg', os.path.join(SCRIPT_DIR, 'extract-svg.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def path_segments(data: str) -> int:
+    """Count the segments a path's d attribute draws (moves aren't counted)."""
+    segments = 0
+    command = None
+    numbers = 0
+
+    def flush() -> int:
+        if command is None:
+            return 0
+        if command == 'z':
+            return 1
+        count = max(numbers // COMMAND_ARITY[command], 1)
+        # The first pair after a move is the move itself; the rest are lines
+        return count - 1 if command == 'm' else count
+
+    for token_command, token_number in PATH_TOKEN_PATTERN.findall(data):
+        if token_command:
+            segments += flush()
+            command = token_command.lower()
+            numbers = 0
+        elif token_number:
+            numbers += 1
+    return segments + flush()
+
+
+def measure_svg(svg: str) -> tuple[int, int, int]:
+    """Return (elements, segments, texts) for an <svg> element's markup."""
+    elements = 0
+    texts = 0
+    segments = 0
+    for match in ELEMENT_PATTERN.finditer(svg):
+        elements += 1
+        tag = match.group(1)
+        if tag == 'text':
+            texts += 1
+        elif tag == 'line':
+            segments += 1
+    for match in PATH_DATA_PATTERN.finditer(svg):
+        segments += path_segments(match.group(1))
+    for tag, points in POINTS_PATTERN.findall(svg):
+        pairs = len(NUMBER_PATTERN.findall(points)) // 2
+        segments += max(pairs - 1, 0) + (1 if tag == 'polygon' and pairs > 2 else 0)
+    return elements, segments, texts
+
+
+def measure_file(path: str, find_svg) -> Metrics | None:
+    """Measure a diagram's markup; None if it has no <svg>."""
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    svg_match = find_svg(content)
+    if svg_match is None:
+        return None
+    svg = svg_match.group(0)
+    elements, segments, texts = measure_svg(svg)
+    return Metrics(
+        path, content.count('\n', 0, svg_match.start()) + 1,
+        elements, segments, texts, len(svg.encode('utf-8')),
+    )
+
+
+def render_time(html_path: str, extract_svg, repeat: int) -> float:
+    """Median rsvg-convert time to PDF in milliseconds."""
+    fd, svg_path = tempfile.mkstemp(suffix='.svg')
+    os.close(fd)
+    try:
+        extract_svg(html_path, svg_path)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = subprocess.run(['rsvg-convert', '-f', 'pdf', '-o', os.devnull, svg_path],
+                                    capture_output=True, text=True)
+            times.append((time.perf_counter() - start) * 1000)
+            if result.returncode != 0:
+                raise RuntimeError(f"rsvg-convert failed on {html_path}:\n{result.stderr}")
+        return statistics.median(times)
+    finally:
+        os.unlink(svg_path)
+
+
+def load_budget(book_dir: str) -> dict[str, float]:
+    """The default budget, overridden by the book's diagram-budget.json if present."""
+    budget = dict(DEFAULT_BUDGET)
+    path = os.path.join(book_dir, BUDGET_FILE)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            overrides = json.load(f)
+        unknown = set(overrides) - set(DEFAULT_BUDGET)
+        if unknown:
+            raise ValueError(f"{os.path.relpath(path, REPO_ROOT)}: unknown budget(s) "
+                             f"{', '.join(sorted(unknown))}; expected {', '.join(DEFAULT_BUDGET)}")
+        budget.update(overrides)
+    return budget
+
+
+def check_budget(metrics: Metrics, budget: dict[str, float]) -> list[Diagnostic]:
+    diagnostics = []
+    for metric, limit in budget.items():
+        value = getattr(metrics, metric)
+        if value is not None and value > limit:
+            shown = f'{value:.0f} ms' if metric == 'render_ms' else f'{value}'
+            diagnostics.append(Diagnostic(
+                metrics.path, metrics.line, 1, f'over-{metric.replace("_", "-")}',
+                f"{metric} {shown} exceeds budget of {limit}",
+            ))
+    return diagnostics
+
+
+def rank(results: list[Metrics]) -> list[Metrics]:
+    """Costliest first: by measured render time when every diagram has one."""
+    if results and all(m.render_ms is not None for m in results):
+        return sorted(results, key=lambda m: m.render_ms, reverse=True)
+    return sorted(results, key=lambda m: m.estimated_cost, reverse=True)
+
+
+def format_ranking(ranked: list[Metrics], top: int) -> str:
+    measured = bool(ranked) and ranked[0].render_ms is not None
+    cost_header = 'Render ms' if measured else 'Est. cost'
+    names = [os.path.relpath(metrics.path, REPO_ROOT) for metrics in ranked[:top]]
+    width = max([len('Diagram'), *map(len, names)]) + 2
+    lines = [f"{'Diagram':<{width}}{'Elements':>9}{'Segments':>9}{'Texts':>7}{'KB':>7}{cost_header:>11}"]
+    for name, metrics in zip(names, ranked):
+        cost = metrics.render_ms if measured else metrics.estimated_cost
+        lines.append(
+            f"{name:<{width}}{metrics.elements:>9}"
+            f"{metrics.segments:>9}{metrics.texts:>7}{metrics.bytes / 1024:>7.1f}{cost:>11.1f}"
+        )
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check diagram complexity against per-book budgets and rank the costliest'
+    )
+    parser.add_argument('books', nargs='*',
+                        help='Book directory names under ebooks/ (default: all books)')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Number of costliest diagrams to list (default: 10)')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='rsvg-convert runs per diagram; the median is used (default: 1)')
+    parser.add_argument('--no-render', action='store_true',
+                        help='Skip measuring render time; rank by estimated cost')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Parallel renders (default: CPU count)')
+    parser.add_argument(
+        '--format',
+        choices=FORMATS,
+        default='text',
+        help='Output format: text (default), or json/sarif diagnostics '
+             'streamed as each diagram is checked'
+    )
+    args = parser.parse_args()
+
+    books = args.books or sorted(
+        os.path.basename(os.path.dirname(path))
+        for path in glob.glob(os.path.join(REPO_ROOT, 'ebooks', '*', 'assets'))
+        if not os.path.basename(os.path.dirname(path)).startswith('_')
+    )
+    budgets = {}
+    for book in books:
+        book_dir = os.path.join(REPO_ROOT, 'ebooks', book)
+        if not os.path.isdir(os.path.join(book_dir, 'assets')):
+            print(f"Error: No assets directory found in ebooks/{book}", file=sys.stderr)
+            sys.exit(1)
+        try:
+            budgets[book] = load_budget(book_dir)
+        except (ValueError, json.JSONDecodeError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    render = not args.no_render
+    if render and not shutil.which('rsvg-convert'):
+        if args.format == 'text':
+            print("rsvg-convert not found; ranking by estimated cost without render times")
+        render = False
+
+    find_svg = load_linter().find_svg
+    extract_svg = load_extractor().extract_svg if render else None
+
+    by_book = {}
+    for book in books:
+        paths = sorted(glob.glob(os.path.join(REPO_ROOT, 'ebooks', book, 'assets', '*.html')))
+        by_book[book] = [m for m in (measure_file(path, find_svg) for path in paths) if m]
+        if render:
+            try:
+                with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+                    times = pool.map(
+                        lambda m: render_time(m.path, extract_svg, max(args.repeat, 1)),
+                        by_book[book],
+                    )
+                    for metrics, elapsed in zip(by_book[book], times):
+                        metrics.render_ms = elapsed
+            except (RuntimeError, ValueError) as e:
+                print(f"Error: {e}", file=sys.stderr)
+                sys.exit(1)
+
+    reporter = None
+    if args.format != 'text':
+        reporter = make_reporter(args.format, sys.stdout, 'diagram-budget', RULES)
+
+    total = 0
+    total_errors = 0
+    files_with_errors = 0
+    for book in books:
+        total += len(by_book[book])
+        for metrics in by_book[book]:
+            diagnostics = check_budget(metrics, budgets[book])
+            path = os.path.relpath(metrics.path, REPO_ROOT)
+            if reporter is not None:
+                for diagnostic in diagnostics:
+                    diagnostic.path = path
+                    reporter.report(diagnostic)
+                reporter.end_file()
+            elif diagnostics:
+                print(f"\n{path}:")
+                for diagnostic in diagnostics:
+                    print(f"  - Line {diagnostic.line}: {diagnostic.message}")
+            if diagnostics:
+                files_with_errors += 1
+                total_errors += len(diagnostics)
+
+    ranked = rank([m for book in books for m in by_book[book]])
+    if reporter is not None:
+        reporter.finish({
+            'files': total,
+            'violations': total_errors,
+            'files_with_violations': files_with_errors,
+            'costliest': [
+                {'file': os.path.relpath(m.path, REPO_ROOT), 'elements': m.elements,
+                 'segments': m.segments, 'texts': m.texts, 'bytes': m.bytes,
+                 'render_ms': None if m.render_ms is None else round(m.render_ms, 1),
+                 'estimated_cost': m.estimated_cost}
+                for m in ranked[:args.top]
+            ],
+        })
+        sys.exit(1 if total_errors else 0)
+
+    print(f"\nCostliest diagrams:\n{format_ranking(ranked, args.top)}")
+    if total_errors:
+        print(f"\n{total_errors} budget violation(s) in {files_with_errors} of {total} diagram(s)")
+        sys.exit(1)
+    print(f"\nAll {total} diagram(s) are within budget")
+
+
+if __name__ == '__main__':
+    main()
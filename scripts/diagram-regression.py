@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""Detect visual changes in rendered diagrams against a stored baseline.
+
+Renders every diagram in ebooks/*/assets/ (through the same cached
+pipeline as render-diagrams.py, so unchanged sources are not re-rendered)
+and compares each PNG with the baseline copy:
+
+1. Byte-identical PNGs are unchanged; nothing is decoded.
+2. Otherwise both images are decoded and diffed per pixel. A diagram is
+   reported when the fraction of pixels differing by more than
+   --tolerance (on any channel) exceeds --threshold.
+3. A 64-bit difference hash (dHash) is computed for every decoded image
+   and cached by PNG hash in build/.cache/diagram-hashes.json. Its Hamming
+   distance is reported alongside the pixel diff, and is the only measure
+   available when the image size changed (always reported as a change).
+
+Run with --save-baseline before editing extract-svg.py or
+fix-html-diagrams.py, then without it afterwards. With NumPy installed
+the None, Sub and Up scanline filters and the pixel diff are vectorized;
+without it a pure Python loop is used. Comparisons run in parallel across
+processes (--jobs), since decoding is CPU-bound.
+
+Usage:
+  diagram-regression.py --save-baseline
+  diagram-regression.py                     # exit 1 if any diagram changed
+  diagram-regression.py --books api-optimization --threshold 0.0005
+"""
+import argparse
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import struct
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, '.diagram-baseline')
+HASH_CACHE = os.path.join(REPO_ROOT, 'build', '.cache', 'diagram-hashes.json')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# PNG colour type -> channels, for 8-bit images
+PNG_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+
+
+def load_renderer():
+    """Import render-diagrams.py, whose hyphenated name blocks a normal import."""
+    spec = importlib.util.spec_from_file_location(
+        'render_diagrams', os.path.join(SCRIPT_DIR, 'render-diagrams.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def file_digest(path: str) -> str:
+    """Return the SHA-256 of a file's bytes."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# PNG decoding
+# ---------------------------------------------------------------------------
+
+def unfilter_row(filter_type: int, row: bytearray, previous: bytes, bpp: int) -> None:
+    """Reverse a PNG scanline filter in place."""
+    if filter_type == 0:
+        return
+    length = len(row)
+    if filter_type == 1:
+        for i in range(bpp, length):
+            row[i] = (row[i] + row[i - bpp]) & 0xFF
+    elif filter_type == 2:
+        for i in range(length):
+            row[i] = (row[i] + previous[i]) & 0xFF
+    elif filter_type == 3:
+        for i in range(length):
+            left = row[i - bpp] if i >= bpp else 0
+            row[i] = (row[i] + ((left + previous[i]) >> 1)) & 0xFF
+    elif filter_type == 4:
+        for i in range(length):
+            a = row[i - bpp] if i >= bpp else 0
+            b = previous[i]
+            c = previous[i - bpp] if i >= bpp else 0
+            p = a + b - c
+            pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+            if pa <= pb and pa <= pc:
+                predictor = a
+            elif pb <= pc:
+                predictor = b
+            else:
+                predictor = c
+            row[i] = (row[i] + predictor) & 0xFF
+    else:
+        raise ValueError(f"Unknown PNG filter type {filter_type}")
+
+
+def unfilter_rows(raw: bytes, height: int, stride: int, bpp: int) -> bytes:
+    """Reverse the scanline filters of a whole image.
+
+    With NumPy, None, Sub and Up rows are reversed with array operations
+    (uint8 arithmetic wraps like the filters do); Avg and Paeth rows depend
+    on the pixel just reversed to their left and go through unfilter_row().
+    """
+    if np is None:
+        pixels = bytearray(height * stride)
+        previous = bytearray(stride)
+        for y in range(height):
+            start = y * (stride + 1)
+            row = bytearray(raw[start + 1:start + 1 + stride])
+            unfilter_row(raw[start], row, previous, bpp)
+            pixels[y * stride:(y + 1) * stride] = row
+            previous = row
+        return bytes(pixels)
+
+    data = np.frombuffer(raw, dtype=np.uint8, count=height * (stride + 1))
+    data = data.reshape(height, stride + 1)
+    pixels = np.empty((height, stride), dtype=np.uint8)
+    previous = np.zeros(stride, dtype=np.uint8)
+    for y in range(height):
+        filter_type = int(data[y, 0])
+        row = data[y, 1:]
+        if filter_type == 0:
+            pixels[y] = row
+        elif filter_type == 1:
+            pixels[y] = np.cumsum(row.reshape(-1, bpp), axis=0, dtype=np.uint8).reshape(-1)
+        elif filter_type == 2:
+            np.add(row, previous, out=pixels[y])
+        else:
+            reversed_row = bytearray(row.tobytes())
+            unfilter_row(filter_type, reversed_row, previous.tobytes(), bpp)
+            pixels[y] = np.frombuffer(reversed_row, dtype=np.uint8)
+        previous = pixels[y]
+    return pixels.tobytes()
+
+
+def read_png(path: str) -> tuple[int, int, int, bytes]:
+    """Decode a non-interlaced 8-bit PNG into (width, height, channels, pixels)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:8] != PNG_SIGNATURE:
+        raise ValueError(f"Not a PNG file: {path}")
+
+    pos = 8
+    idat = []
+    header = None
+    while pos < len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        if chunk_type == b'IHDR':
+            header = struct.unpack('>IIBBBBB', body)
+        elif chunk_type == b'IDAT':
+            idat.append(body)
+        elif chunk_type == b'IEND':
+            break
+        pos += 12 + length
+
+    if header is None:
+        raise ValueError(f"PNG has no IHDR chunk: {path}")
+    width, height, bit_depth, color_type, _, _, interlace = header
+    if bit_depth != 8 or color_type not in PNG_CHANNELS or interlace:
+        raise ValueError(
+            f"Unsupported PNG (bit depth {bit_depth}, colour type {color_type}, "
+            f"interlace {interlace}): {path}"
+        )
+
+    channels = PNG_CHANNELS[color_type]
+    stride = width * channels
+    raw = zlib.decompress(b''.join(idat))
+    if len(raw) < height * (stride + 1):
+        raise ValueError(f"PNG image data is truncated: {path}")
+    return width, height, channels, unfilter_rows(raw, height, stride, channels)
+
+
+# ---------------------------------------------------------------------------
+# Comparison
+# ---------------------------------------------------------------------------
+
+def grayscale(width: int, height: int, channels: int, pixels: bytes) -> list[list[float]]:
+    """Return luminance rows, compositing any alpha onto white."""
+    rows = []
+    for y in range(height):
+        row = []
+        base = y * width * channels
+        for x in range(width):
+            p = pixels[base + x * channels:base + (x + 1) * channels]
+            if channels >= 3:
+                value = 0.299 * p[0] + 0.587 * p[1] + 0.114 * p[2]
+            else:
+                value = float(p[0])
+            if channels in (2, 4):
+                alpha = p[-1] / 255
+                value = value * alpha + 255 * (1 - alpha)
+            row.append(value)
+        rows.append(row)
+    return rows
+
+
+def difference_hash(image: tuple[int, int, int, bytes]) -> str:
+    """Return a 64-bit dHash: brightness gradients over a 9x8 block average."""
+    width, height, channels, pixels = image
+    cols, rows = 9, 8
+
+    y_edges = [r * height // rows for r in range(rows + 1)]
+    x_edges = [c * width // cols for c in range(cols + 1)]
+
+    if np is not None:
+        array = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, channels)
+        array = array.astype(np.float64)
+        if channels >= 3:
+            gray = array[..., 0] * 0.299 + array[..., 1] * 0.587 + array[..., 2] * 0.114
+        else:
+            gray = array[..., 0]
+        if channels in (2, 4):
+            alpha = array[..., -1] / 255
+            gray = gray * alpha + 255 * (1 - alpha)
+        blocks = [
+            [gray[y_edges[r]:max(y_edges[r + 1], y_edges[r] + 1),
+                  x_edges[c]:max(x_edges[c + 1], x_edges[c] + 1)].mean()
+             for c in range(cols)]
+            for r in range(rows)
+        ]
+    else:
+        gray = grayscale(width, height, channels, pixels)
+        blocks = []
+        for r in range(rows):
+            y0, y1 = y_edges[r], max(y_edges[r + 1], y_edges[r] + 1)
+            block_row = []
+            for c in range(cols):
+                x0, x1 = x_edges[c], max(x_edges[c + 1], x_edges[c] + 1)
+                values = [v for line in gray[y0:y1] for v in line[x0:x1]]
+                block_row.append(sum(values) / len(values))
+            blocks.append(block_row)
+
+    bits = 0
+    for r in range(rows):
+        for c in range(cols - 1):
+            bits = (bits << 1) | (1 if blocks[r][c] > blocks[r][c + 1] else 0)
+    return f'{bits:016x}'
+
+
+def hamming_distance(a: str, b: str) -> int:
+    """Return the number of differing bits between two hex hashes."""
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+def changed_pixels(current: tuple, baseline: tuple, tolerance: int) -> tuple[float, list | None]:
+    """Return (fraction of changed pixels, [x0, y0, x1, y1] bounds of the change)."""
+    width, height, channels, pixels = current
+    _, _, _, base_pixels = baseline
+
+    if np is not None:
+        a = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, channels)
+        b = np.frombuffer(base_pixels, dtype=np.uint8).reshape(height, width, channels)
+        mask = (np.abs(a.astype(np.int16) - b).max(axis=2) > tolerance)
+        count = int(mask.sum())
+        if not count:
+            return 0.0, None
+        ys = np.flatnonzero(mask.any(axis=1))
+        xs = np.flatnonzero(mask.any(axis=0))
+        return count / (width * height), [int(xs[0]), int(ys[0]), int(xs[-1]), int(ys[-1])]
+
+    count = 0
+    x0, y0, x1, y1 = width, height, -1, -1
+    for y in range(height):
+        base = y * width * channels
+        for x in range(width):
+            offset = base + x * channels
+            for k in range(channels):
+                if abs(pixels[offset + k] - base_pixels[offset + k]) > tolerance:
+                    count += 1
+                    x0, y0 = min(x0, x), min(y0, y)
+                    x1, y1 = max(x1, x), max(y1, y)
+                    break
+    if not count:
+        return 0.0, None
+    return count / (width * height), [x0, y0, x1, y1]
+
+
+class HashCache:
+    """dHash values keyed by PNG content hash, persisted between runs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hashes = {}
+        self.dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.hashes = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def known(self, *png_digests: str) -> dict[str, str]:
+        """Return the cached hashes among the given PNG digests."""
+        return {d: self.hashes[d] for d in png_digests if d in self.hashes}
+
+    def update(self, hashes: dict[str, str]) -> None:
+        if hashes:
+            self.hashes.update(hashes)
+            self.dirty = True
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.hashes, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # Caching is best-effort
+            pass
+
+
+def compare_diagram(name: str, png_path: str, png_digest: str, entry: dict,
+                    baseline_dir: str, known_hashes: dict[str, str], tolerance: int,
+                    threshold: float) -> tuple[dict | None, dict[str, str]]:
+    """Compare one diagram with its baseline in a worker process.
+
+    Returns a change record (None when unchanged) and the dHashes computed
+    for PNGs missing from `known_hashes`, for the caller to cache.
+    """
+    if png_digest == entry['sha256']:
+        return None, {}
+
+    base_path = os.path.join(baseline_dir, entry['file'])
+    current = read_png(png_path)
+    baseline = read_png(base_path)
+    computed = {}
+    for digest, image in ((png_digest, current), (entry['sha256'], baseline)):
+        if digest not in known_hashes:
+            computed[digest] = difference_hash(image)
+    hashes = {**known_hashes, **computed}
+    distance = hamming_distance(hashes[png_digest], hashes[entry['sha256']])
+
+    if current[:3] != baseline[:3]:
+        return {
+            'diagram': name,
+            'reason': f'size {baseline[0]}x{baseline[1]} -> {current[0]}x{current[1]}',
+            'hash_distance': distance,
+        }, computed
+
+    ratio, bounds = changed_pixels(current, baseline, tolerance)
+    if ratio <= threshold:
+        return None, computed
+    return {
+        'diagram': name,
+        'reason': f'{ratio:.2%} of pixels changed',
+        'changed_fraction': round(ratio, 6),
+        'bounds': bounds,
+        'hash_distance': distance,
+    }, computed
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def collect_diagrams(books: list[str] | None) -> dict[str, str]:
+    """Return {book/name: html path} for the selected books."""
+    diagrams = {}
+    for path in sorted(glob.glob(os.path.join(REPO_ROOT, 'ebooks', '*', 'assets', '*.html'))):
+        book = os.path.basename(os.path.dirname(os.path.dirname(path)))
+        if books and book not in books:
+            continue
+        diagrams[f'{book}/{os.path.splitext(os.path.basename(path))[0]}'] = path
+    return diagrams
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare rendered diagrams against a stored baseline'
+    )
+    parser.add_argument('--books', help='Comma-separated books to check (default: all)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='Baseline directory (default: .diagram-baseline/)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store the current renders as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.001,
+                        help='Changed-pixel fraction that counts as a change (default: 0.001)')
+    parser.add_argument('--tolerance', type=int, default=16,
+                        help='Per-channel difference ignored as antialiasing noise (default: 16)')
+    parser.add_argument('--width', type=int, default=1000,
+                        help='Render width in pixels (default: 1000)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Parallel renders and comparisons (default: CPU count)')
+    parser.add_argument('--json', metavar='PATH', help='Also write the changes as JSON to PATH')
+    args = parser.parse_args()
+
+    if not shutil.which('rsvg-convert'):
+        print("Error: rsvg-convert is required (sudo apt install librsvg2-bin)", file=sys.stderr)
+        sys.exit(1)
+
+    books = [b.strip() for b in args.books.split(',')] if args.books else None
+    diagrams = collect_diagrams(books)
+    if not diagrams:
+        print("No HTML diagrams found")
+        sys.exit(1)
+
+    manifest_path = os.path.join(args.baseline, 'manifest.json')
+    manifest = {'width': args.width, 'diagrams': {}}
+    if args.save_baseline and os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        # Only the selected books are replaced
+        selected_books = {name.split('/')[0] for name in diagrams}
+        manifest['diagrams'] = {
+            name: entry for name, entry in manifest['diagrams'].items()
+            if name.split('/')[0] not in selected_books
+        }
+        # The baseline has one width, so the kept books must match it
+        if manifest['diagrams'] and manifest.get('width') != args.width:
+            kept = sorted({name.split('/')[0] for name in manifest['diagrams']})
+            print(f"Error: baseline was rendered at width {manifest.get('width')}, "
+                  f"not {args.width}; save all books to change it "
+                  f"(also in baseline: {', '.join(kept)})", file=sys.stderr)
+            sys.exit(1)
+        manifest['width'] = args.width
+
+    renderer = load_renderer()
+    os.makedirs(renderer.CACHE_DIR, exist_ok=True)
+    extractor = renderer.extractor_digest()
+    extract_svg = renderer.load_extractor().extract_svg
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+            rendered = dict(zip(diagrams, pool.map(
+                lambda path: renderer.render_diagram(path, args.width, extractor, extract_svg),
+                diagrams.values(),
+            )))
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    misses = sum(1 for _, hit in rendered.values() if not hit)
+    print(f"  Rendered {misses} diagram(s), {len(rendered) - misses} from cache")
+    digests = {name: file_digest(png_path) for name, (png_path, _) in rendered.items()}
+
+    if args.save_baseline:
+        for name, (png_path, _) in rendered.items():
+            target = os.path.join(args.baseline, f'{name}.png')
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(png_path, target)
+            manifest['diagrams'][name] = {'file': f'{name}.png', 'sha256': digests[name]}
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        print(f"Saved baseline of {len(rendered)} diagram(s): {args.baseline}")
+        return
+
+    if not os.path.exists(manifest_path):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        sys.exit(1)
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('width') != args.width:
+        print(f"Error: baseline was rendered at width {manifest.get('width')}, "
+              f"not {args.width}", file=sys.stderr)
+        sys.exit(1)
+
+    baseline = manifest['diagrams']
+    selected_books = {name.split('/')[0] for name in diagrams}
+    added = [name for name in diagrams if name not in baseline]
+    removed = [name for name in baseline
+               if name.split('/')[0] in selected_books and name not in diagrams]
+
+    hashes = HashCache(HASH_CACHE)
+    common = [name for name in diagrams if name in baseline]
+    compare_args = [
+        [rendered[name][0] for name in common],
+        [digests[name] for name in common],
+        [baseline[name] for name in common],
+        [args.baseline] * len(common),
+        [hashes.known(digests[name], baseline[name]['sha256']) for name in common],
+        [args.tolerance] * len(common),
+        [args.threshold] * len(common),
+    ]
+    if args.jobs > 1 and len(common) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(compare_diagram, common, *compare_args))
+    else:
+        results = list(map(compare_diagram, common, *compare_args))
+    changes = []
+    for change, computed in results:
+        hashes.update(computed)
+        if change:
+            changes.append(change)
+    hashes.save()
+
+    unchanged = len(common) - len(changes)
+    print(f"  {unchanged} unchanged, {len(changes)} changed, "
+          f"{len(added)} new, {len(removed)} removed")
+    for change in changes:
+        bounds = f" in [{', '.join(map(str, change['bounds']))}]" if change.get('bounds') else ''
+        print(f"  - {change['diagram']}: {change['reason']}{bounds} "
+              f"(dHash distance {change['hash_distance']})")
+    for name in added:
+        print(f"  + {name}: not in baseline")
+    for name in removed:
+        print(f"  - {name}: missing (in baseline)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'changed': changes, 'added': added, 'removed': removed}, f, indent=2)
+
+    if changes or added or removed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
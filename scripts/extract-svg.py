@@ -3,10 +3,36 @@
 
 Handles diagrams that use CSS classes by inlining the styles directly
 onto SVG elements for standalone rendering.
+
+The HTML is read in chunks and split into tokens (tags, comments, text)
+as it streams. <style> rules before the SVG are collected, then each SVG
+token is rewritten once (CSS inlining, ampersand escaping, font
+substitution, text font-family injection) and written straight to the
+output, so memory stays bounded by the largest token rather than the
+document size.
 """
+import os
 import sys
 import re
 
+CHUNK_SIZE = 64 * 1024
+
+FONT_FAMILY = 'Liberation Sans, Arial, sans-serif'
+
+# Comments, CDATA, tags and text runs, in document order
+TOKEN_PATTERN = re.compile(
+    r'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<[^>]*>|[^<]+|<', re.DOTALL
+)
+CLASS_TAG_PATTERN = re.compile(r'<([a-zA-Z][a-zA-Z0-9]*)[^>]*class="[^"]*"[^>]*/?>')
+# Match & not followed by amp; lt; gt; quot; apos; or #
+BARE_AMPERSAND_PATTERN = re.compile(r'&(?!(amp|lt|gt|quot|apos|#);)')
+# font-family="..." with double quotes (handles embedded single quotes)
+FONT_ATTR_DOUBLE_PATTERN = re.compile(r'font-family="-apple-system[^"]*"')
+# font-family='...' with single quotes (handles embedded double quotes)
+FONT_ATTR_SINGLE_PATTERN = re.compile(r"font-family='-apple-system[^']*'")
+FONT_STYLE_PATTERN = re.compile(r"font-family:\s*-apple-system[^;\"']*")
+TEXT_TAG_PATTERN = re.compile(r'<text[^>]*>')
+
 
 def parse_css_rules(style_content: str) -> dict[str, str]:
     """Parse CSS rules from a style block into a dict of class -> properties."""
@@ -21,109 +47,148 @@ def parse_css_rules(style_content: str) -> dict[str, str]:
     return rules
 
 
-def inline_css_classes(svg_content: str, css_rules: dict[str, str]) -> str:
-    """Replace class attributes with inline styles on SVG elements."""
+def inline_css_tag(full_tag: str, css_rules: dict[str, str]) -> str:
+    """Replace the class attribute of one tag with an inline style."""
+    class_attr_match = re.search(r'class="([^"]*)"', full_tag)
+    if not class_attr_match:
+        return full_tag
 
-    def replace_class(match):
-        full_tag = match.group(0)
-        class_attr_match = re.search(r'class="([^"]*)"', full_tag)
-        if not class_attr_match:
-            return full_tag
+    class_names = class_attr_match.group(1).split()
+    styles_to_add = []
 
-        class_names = class_attr_match.group(1).split()
-        styles_to_add = []
+    for class_name in class_names:
+        if class_name in css_rules:
+            styles_to_add.append(css_rules[class_name])
 
-        for class_name in class_names:
-            if class_name in css_rules:
-                styles_to_add.append(css_rules[class_name])
+    if not styles_to_add:
+        return full_tag
 
-        if not styles_to_add:
-            return full_tag
+    # Combine all styles
+    combined_style = '; '.join(styles_to_add)
 
-        # Combine all styles
-        combined_style = '; '.join(styles_to_add)
+    # Check if there's an existing style attribute
+    existing_style_match = re.search(r'style="([^"]*)"', full_tag)
+    if existing_style_match:
+        existing_style = existing_style_match.group(1).rstrip(';')
+        combined_style = existing_style + '; ' + combined_style
+        # Replace existing style with combined
+        full_tag = re.sub(r'style="[^"]*"', f'style="{combined_style}"', full_tag)
+    else:
+        # Add style attribute before the closing >
+        full_tag = re.sub(r'(/?)>$', f' style="{combined_style}"\\1>', full_tag)
 
-        # Check if there's an existing style attribute
-        existing_style_match = re.search(r'style="([^"]*)"', full_tag)
-        if existing_style_match:
-            existing_style = existing_style_match.group(1).rstrip(';')
-            combined_style = existing_style + '; ' + combined_style
-            # Replace existing style with combined
-            full_tag = re.sub(r'style="[^"]*"', f'style="{combined_style}"', full_tag)
-        else:
-            # Add style attribute before the closing >
-            full_tag = re.sub(r'(/?)>$', f' style="{combined_style}"\\1>', full_tag)
+    # Remove class attribute
+    full_tag = re.sub(r'\s*class="[^"]*"', '', full_tag)
 
-        # Remove class attribute
-        full_tag = re.sub(r'\s*class="[^"]*"', '', full_tag)
+    return full_tag
 
-        return full_tag
-
-    # Match opening tags with class attribute (not self-closing for now, handle both)
-    result = re.sub(r'<([a-zA-Z][a-zA-Z0-9]*)[^>]*class="[^"]*"[^>]*/?>',
-                    replace_class, svg_content)
-    return result
 
+def inline_css_classes(svg_content: str, css_rules: dict[str, str]) -> str:
+    """Replace class attributes with inline styles on SVG elements."""
+    return CLASS_TAG_PATTERN.sub(
+        lambda match: inline_css_tag(match.group(0), css_rules), svg_content
+    )
 
-def extract_svg(html_path: str, output_path: str) -> None:
-    """Extract SVG from HTML file, inlining CSS classes."""
-    with open(html_path, 'r', encoding='utf-8') as f:
-        content = f.read()
 
-    # Extract CSS rules from <style> tags
-    css_rules = {}
-    for style_match in re.finditer(r'<style[^>]*>(.*?)</style>', content, re.DOTALL):
-        css_rules.update(parse_css_rules(style_match.group(1)))
+def add_font_to_text(match: re.Match) -> str:
+    """Give a <text> tag an explicit font-family if it has none.
 
-    # Extract SVG element (including all content)
-    svg_match = re.search(r'(<svg[^>]*>.*?</svg>)', content, re.DOTALL)
-    if not svg_match:
-        raise ValueError(f"No SVG found in {html_path}")
+    Text inherits its font from CSS, which doesn't survive extraction.
+    """
+    tag = match.group(0)
+    if 'font-family=' not in tag:
+        # Add font-family before the closing >
+        return tag[:-1] + f' font-family="{FONT_FAMILY}">'
+    return tag
 
-    svg = svg_match.group(1)
 
+def rewrite_svg_token(token: str, css_rules: dict[str, str]) -> str:
+    """Apply every SVG fix-up to one token of the SVG."""
     # Inline CSS classes if there are any rules
-    if css_rules:
-        svg = inline_css_classes(svg, css_rules)
-
-    # Ensure xmlns is present
-    if 'xmlns=' not in svg:
-        svg = svg.replace('<svg', '<svg xmlns="http://www.w3.org/2000/svg"', 1)
+    if css_rules and 'class="' in token:
+        token = inline_css_classes(token, css_rules)
 
     # Escape unescaped ampersands for valid XML
-    # Match & not followed by amp; lt; gt; quot; apos; or #
-    svg = re.sub(r'&(?!(amp|lt|gt|quot|apos|#);)', '&amp;', svg)
+    if '&' in token:
+        token = BARE_AMPERSAND_PATTERN.sub('&amp;', token)
 
     # Replace web font stacks with standard fonts for rsvg-convert compatibility
     # This ensures text renders as vectors, not rasterized bitmaps
-    # Handle font-family in attributes - need to match until closing quote of same type
-    def replace_font_attr(match):
-        return 'font-family="Liberation Sans, Arial, sans-serif"'
-
-    # Match font-family="..." with double quotes (handles embedded single quotes)
-    svg = re.sub(r'font-family="-apple-system[^"]*"', replace_font_attr, svg)
-    # Match font-family='...' with single quotes (handles embedded double quotes)
-    svg = re.sub(r"font-family='-apple-system[^']*'", replace_font_attr, svg)
-
-    # Also handle font-family in style attributes
-    svg = re.sub(
-        r"font-family:\s*-apple-system[^;\"']*",
-        'font-family: Liberation Sans, Arial, sans-serif',
-        svg
-    )
+    if '-apple-system' in token:
+        token = FONT_ATTR_DOUBLE_PATTERN.sub(f'font-family="{FONT_FAMILY}"', token)
+        token = FONT_ATTR_SINGLE_PATTERN.sub(f'font-family="{FONT_FAMILY}"', token)
+        # Also handle font-family in style attributes
+        token = FONT_STYLE_PATTERN.sub(f'font-family: {FONT_FAMILY}', token)
+
+    if '<text' in token:
+        token = TEXT_TAG_PATTERN.sub(add_font_to_text, token)
+
+    return token
+
+
+def iter_tokens(f, chunk_size: int = CHUNK_SIZE):
+    """Yield tags, comments and text runs from a file, reading it in chunks."""
+    buffer = ''
+    eof = False
+    while not eof:
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+        pos = 0
+        while pos < len(buffer):
+            match = TOKEN_PATTERN.match(buffer, pos)
+            # A token reaching the end of the buffer may continue in the next chunk
+            if not eof and (match.end() == len(buffer) or match.group(0) == '<'):
+                break
+            yield match.group(0)
+            pos = match.end()
+        buffer = buffer[pos:]
 
-    # Add font-family to text elements that don't have one (they inherit from CSS which doesn't work in extracted SVG)
-    def add_font_to_text(match):
-        tag = match.group(0)
-        if 'font-family=' not in tag:
-            # Add font-family before the closing >
-            return tag[:-1] + ' font-family="Liberation Sans, Arial, sans-serif">'
-        return tag
 
-    svg = re.sub(r'<text[^>]*>', add_font_to_text, svg)
+def extract_svg(html_path: str, output_path: str) -> None:
+    """Extract SVG from HTML file, inlining CSS classes."""
+    css_rules = {}
+    style_parts = None
+    out = None
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(svg)
+    try:
+        with open(html_path, 'r', encoding='utf-8') as f:
+            for token in iter_tokens(f):
+                if out is None:
+                    # Before the SVG: collect CSS rules from <style> tags
+                    if style_parts is not None:
+                        if token.lower().startswith('</style'):
+                            css_rules.update(parse_css_rules(''.join(style_parts)))
+                            style_parts = None
+                        else:
+                            style_parts.append(token)
+                        continue
+                    if re.match(r'<style[\s>]', token, re.IGNORECASE):
+                        style_parts = []
+                        continue
+                    if not re.match(r'<svg[\s>/]', token):
+                        continue
+
+                    # Ensure xmlns is present
+                    if 'xmlns=' not in token:
+                        token = token.replace('<svg', '<svg xmlns="http://www.w3.org/2000/svg"', 1)
+                    out = open(output_path, 'w', encoding='utf-8')
+
+                out.write(rewrite_svg_token(token, css_rules))
+                if token.startswith('</svg'):
+                    break
+            else:
+                if out is None:
+                    raise ValueError(f"No SVG found in {html_path}")
+                raise ValueError(f"Unterminated SVG in {html_path}")
+    except BaseException:
+        if out is not None:
+            out.close()
+            os.unlink(output_path)
+        raise
+
+    out.close()
 
 
 if __name__ == '__main__':
@@ -4,16 +4,38 @@
 Fixes:
 1. CSS class attributes on SVG elements -> inline styles
 2. h1-h6 titles outside SVG -> move into SVG as <text> element
+
+Files are fixed in parallel (--jobs) and written through a temp file and
+rename, so an interrupted run never leaves a truncated diagram. With
+--dry-run, nothing is written and a unified diff of each fix is printed.
 """
+import argparse
+import difflib
+import os
 import sys
 import re
 import glob
-
-
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+SVG_PATTERN = re.compile(r'(<svg[^>]*>)(.*?)(</svg>)', re.DOTALL)
+STYLE_PATTERN = re.compile(r'<style[^>]*>(.*?)</style>', re.DOTALL)
+CONTAINER_PATTERN = re.compile(
+    r'(<div[^>]*class="diagram-container"[^>]*>)(.*?)(</div>)', re.DOTALL
+)
+CSS_RULE_PATTERN = re.compile(r'\.([a-zA-Z0-9_-]+)\s*\{([^}]+)\}')
+CLASS_TAG_PATTERN = re.compile(r'<([a-zA-Z][a-zA-Z0-9]*)[^>]*class="[^"]*"[^>]*/?>')
+CLASS_ATTR_PATTERN = re.compile(r'<[^>]+\sclass=')
+HEADING_PATTERN = re.compile(r'<h[1-6][^>]*>')
+
+
+# Diagrams made from the same template share identical style blocks
+@lru_cache(maxsize=256)
 def parse_css_rules(style_content: str) -> dict[str, str]:
     """Parse CSS rules from a style block into a dict of class -> properties."""
     rules = {}
-    for match in re.finditer(r'\.([a-zA-Z0-9_-]+)\s*\{([^}]+)\}', style_content):
+    for match in CSS_RULE_PATTERN.finditer(style_content):
         class_name = match.group(1)
         properties = match.group(2).strip()
         properties = re.sub(r'\s+', ' ', properties)
@@ -21,8 +43,12 @@ def parse_css_rules(style_content: str) -> dict[str, str]:
     return rules
 
 
-def inline_css_in_svg(content: str, css_rules: dict[str, str]) -> str:
-    """Inline CSS classes on SVG elements."""
+def inline_css_in_svg(content: str, css_rules: dict[str, str],
+                      svg_match: re.Match | None = None) -> str:
+    """Inline CSS classes on SVG elements.
+
+    svg_match may be passed when the caller already located the SVG.
+    """
 
     def replace_class(match):
         full_tag = match.group(0)
@@ -54,7 +80,8 @@ def inline_css_in_svg(content: str, css_rules: dict[str, str]) -> str:
         return full_tag
 
     # Find SVG content
-    svg_match = re.search(r'(<svg[^>]*>)(.*?)(</svg>)', content, re.DOTALL)
+    if svg_match is None:
+        svg_match = SVG_PATTERN.search(content)
     if not svg_match:
         return content
 
@@ -63,8 +90,7 @@ def inline_css_in_svg(content: str, css_rules: dict[str, str]) -> str:
     svg_close = svg_match.group(3)
 
     # Replace class attributes in SVG inner content
-    svg_inner_fixed = re.sub(r'<([a-zA-Z][a-zA-Z0-9]*)[^>]*class="[^"]*"[^>]*/?>',
-                              replace_class, svg_inner)
+    svg_inner_fixed = CLASS_TAG_PATTERN.sub(replace_class, svg_inner)
 
     # Reconstruct
     new_svg = svg_open + svg_inner_fixed + svg_close
@@ -75,10 +101,7 @@ def move_title_into_svg(content: str) -> str:
     """Move h1-h6 title from outside SVG into SVG as text element."""
 
     # Find h2 (or h1-h6) in diagram-container but outside SVG
-    container_match = re.search(
-        r'(<div[^>]*class="diagram-container"[^>]*>)(.*?)(</div>)',
-        content, re.DOTALL
-    )
+    container_match = CONTAINER_PATTERN.search(content)
     if not container_match:
         return content
 
@@ -96,7 +119,7 @@ def move_title_into_svg(content: str) -> str:
     title_text = re.sub(r'<[^>]+>', '', title_text)
 
     # Find SVG
-    svg_match = re.search(r'(<svg[^>]*>)(.*?)(</svg>)', container_inner, re.DOTALL)
+    svg_match = SVG_PATTERN.search(container_inner)
     if not svg_match:
         return content
 
@@ -141,73 +164,108 @@ def move_title_into_svg(content: str) -> str:
     return content[:container_match.start()] + new_container + content[container_match.end():]
 
 
-def fix_file(path: str) -> tuple[bool, list[str]]:
-    """Fix violations in a file. Returns (modified, fixes_applied)."""
-    with open(path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    original = content
+def fix_content(content: str) -> tuple[str, list[str]]:
+    """Return (fixed content, fixes applied) for one diagram's HTML."""
     fixes = []
 
-    # Parse CSS rules
-    css_rules = {}
-    for style_match in re.finditer(r'<style[^>]*>(.*?)</style>', content, re.DOTALL):
-        css_rules.update(parse_css_rules(style_match.group(1)))
-
-    # Check for CSS class violations in SVG
-    svg_match = re.search(r'<svg[^>]*>.*?</svg>', content, re.DOTALL)
-    if svg_match:
-        svg_content = svg_match.group(0)
-        inner_svg = re.sub(r'^<svg[^>]*>', '', svg_content)
-        if re.search(r'<[^>]+\sclass=', inner_svg) and css_rules:
-            content = inline_css_in_svg(content, css_rules)
+    # Check for CSS class violations in SVG; CSS is only parsed when needed
+    svg_match = SVG_PATTERN.search(content)
+    if svg_match and CLASS_ATTR_PATTERN.search(content, svg_match.end(1), svg_match.end()):
+        css_rules = {}
+        for style_match in STYLE_PATTERN.finditer(content):
+            css_rules.update(parse_css_rules(style_match.group(1)))
+        if css_rules:
+            content = inline_css_in_svg(content, css_rules, svg_match)
             fixes.append("Inlined CSS classes on SVG elements")
 
     # Check for title outside SVG
-    container_match = re.search(
-        r'<div[^>]*class="diagram-container"[^>]*>(.*?)</div>',
-        content, re.DOTALL
-    )
+    container_match = CONTAINER_PATTERN.search(content)
     if container_match:
-        container = container_match.group(1)
-        svg_in_container = re.search(r'<svg.*?</svg>', container, re.DOTALL)
+        container = container_match.group(2)
+        svg_in_container = SVG_PATTERN.search(container)
         if svg_in_container:
             outside_svg = container.replace(svg_in_container.group(0), '')
-            if re.search(r'<h[1-6][^>]*>', outside_svg):
+            if HEADING_PATTERN.search(outside_svg):
                 content = move_title_into_svg(content)
                 fixes.append("Moved title into SVG")
 
-    if content != original:
-        with open(path, 'w', encoding='utf-8') as f:
+    return content, fixes
+
+
+def write_atomic(path: str, content: str) -> None:
+    """Write content via a temp file in the same directory, then rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.fix-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
             f.write(content)
-        return True, fixes
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
 
-    return False, []
+def fix_file(path: str, dry_run: bool = False) -> tuple[bool, list[str], str]:
+    """Fix violations in a file. Returns (modified, fixes_applied, diff).
+
+    With dry_run the file is left untouched and diff holds a unified diff
+    of the fixes; otherwise diff is empty.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        original = f.read()
+
+    content, fixes = fix_content(original)
+    if content == original:
+        return False, [], ''
+
+    if dry_run:
+        relative = os.path.relpath(path)
+        diff = ''.join(difflib.unified_diff(
+            original.splitlines(keepends=True), content.splitlines(keepends=True),
+            fromfile=f'a/{relative}', tofile=f'b/{relative}',
+        ))
+        return True, fixes, diff
+
+    write_atomic(path, content)
+    return True, fixes, ''
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: fix-html-diagrams.py <path-or-glob>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Fix HTML diagram lint violations')
+    parser.add_argument('pattern', help='Glob pattern for diagram files to fix')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Files fixed in parallel (default: CPU count)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Print unified diffs instead of writing fixes')
+    args = parser.parse_args()
 
-    pattern = sys.argv[1]
-    files = glob.glob(pattern, recursive=True)
+    files = sorted(glob.glob(args.pattern, recursive=True))
 
     if not files:
-        print(f"No files found matching: {pattern}")
+        print(f"No files found matching: {args.pattern}")
         sys.exit(1)
 
+    dry_runs = [args.dry_run] * len(files)
+    if args.jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            chunksize = max(1, len(files) // (args.jobs * 4))
+            results = list(pool.map(fix_file, files, dry_runs, chunksize=chunksize))
+    else:
+        results = list(map(fix_file, files, dry_runs))
+
     total_fixed = 0
-    for path in sorted(files):
-        modified, fixes = fix_file(path)
+    for path, (modified, fixes, diff) in zip(files, results):
         if modified:
-            print(f"Fixed: {path}")
+            print(f"{'Would fix' if args.dry_run else 'Fixed'}: {path}")
             for fix in fixes:
                 print(f"  - {fix}")
+            if diff:
+                print(diff, end='' if diff.endswith('\n') else '\n')
             total_fixed += 1
 
     if total_fixed:
-        print(f"\nFixed {total_fixed} file(s)")
+        print(f"\n{'Would fix' if args.dry_run else 'Fixed'} {total_fixed} file(s)")
     else:
         print("No files needed fixing")
 
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""Generate a synthetic ebook corpus for scaling tests.
+
+Writes books laid out like ebooks/<book>/ (README.md, chapters/, assets/)
+with chapters and HTML diagrams shaped like the real ones, so the build
+scripts, linters, SVG analysis and plagiarism extraction can be exercised
+at thousands of chapters or diagrams without hand-authoring content.
+
+Chapters contain headings, prose paragraphs (long enough for passage
+extraction), fenced code blocks, tables, callouts, diagram references and
+a **Next:** navigation link. Diagrams follow .ai/templates/html-diagram.html
+and pass lint-html-diagrams.py: title inside the SVG at y=35, inline styles,
+Liberation Sans on every <text>, and content starting below the title gap.
+
+Output is deterministic for a given --seed.
+
+Usage:
+  generate-corpus.py build/synthetic --books 4 --chapters 25 --diagrams 100
+  generate-corpus.py build/synthetic --diagrams 10000 --boxes 40 --arrows 60
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+
+# Written into the output directory so a later run knows it may replace it
+MARKER = '.generated-corpus'
+
+FONT = 'Liberation Sans, Arial, sans-serif'
+
+WORDS = (
+    'latency throughput request response cache replica queue worker shard '
+    'connection pool backend service client server cluster region network '
+    'database index query transaction partition consumer producer stream '
+    'batch pipeline budget percentile histogram metric trace span signal '
+    'timeout retry backoff limit capacity memory thread process kernel '
+    'protocol payload header handshake compression encoding gateway proxy '
+    'balancer endpoint schema version deployment rollout failure recovery'
+).split()
+
+GLUE = 'the a of to and in for with that when under across before after'.split()
+
+LANGUAGES = {
+    'python': 'def handle_{n}(request):\n    result = cache.get(request.key)\n'
+              '    if result is None:\n        result = backend.fetch(request.key)\n'
+              '    return result\n',
+    'rust': 'fn handle_{n}(req: &Request) -> Response {{\n    let value = cache.get(&req.key);\n'
+            '    Response::new(value)\n}}\n',
+    'typescript': 'async function handle{n}(req: Request): Promise<Response> {{\n'
+                  '  const value = await cache.get(req.key);\n  return new Response(value);\n}}\n',
+    'yaml': 'service: handler-{n}\nreplicas: 3\ntimeout_ms: 250\n',
+}
+
+COLORS = ['#3b82f6', '#22c55e', '#f59e0b', '#ef4444', '#8b5cf6', '#64748b']
+
+
+# ---------------------------------------------------------------------------
+# Chapters
+# ---------------------------------------------------------------------------
+
+def sentence(rng: random.Random) -> str:
+    """Return one plausible technical sentence."""
+    words = []
+    for _ in range(rng.randint(10, 22)):
+        words.append(rng.choice(WORDS) if rng.random() < 0.6 else rng.choice(GLUE))
+    words[0] = words[0].capitalize()
+    return ' '.join(words) + '.'
+
+
+def paragraph(rng: random.Random) -> str:
+    """Return a prose paragraph with occasional inline code and emphasis."""
+    sentences = [sentence(rng) for _ in range(rng.randint(3, 7))]
+    if rng.random() < 0.3:
+        sentences[0] += f' Use `{rng.choice(WORDS)}_{rng.choice(WORDS)}` here.'
+    if rng.random() < 0.2:
+        sentences[-1] = f'**{rng.choice(WORDS).capitalize()}** ' + sentences[-1]
+    return ' '.join(sentences)
+
+
+def table(rng: random.Random) -> str:
+    """Return a small markdown table."""
+    columns = rng.randint(3, 5)
+    header = '| ' + ' | '.join(rng.choice(WORDS).capitalize() for _ in range(columns)) + ' |'
+    separator = '|' + '|'.join('---' for _ in range(columns)) + '|'
+    rows = [
+        '| ' + ' | '.join(f'{rng.randint(1, 999)}ms' for _ in range(columns)) + ' |'
+        for _ in range(rng.randint(3, 8))
+    ]
+    return '\n'.join([header, separator] + rows)
+
+
+def chapter(rng: random.Random, number: int, args: argparse.Namespace,
+            diagrams: list[str], next_title: str | None) -> str:
+    """Return the markdown for one synthetic chapter."""
+    title = ' '.join(rng.choice(WORDS).capitalize() for _ in range(3))
+    blocks = [f'# Chapter {number}: {title}', '## Overview', paragraph(rng)]
+
+    # Spread code blocks, tables, diagrams and callouts between paragraphs
+    extras = (
+        ['code'] * args.code_blocks + ['table'] * args.tables
+        + ['diagram'] * len(diagrams) + ['callout'] * args.callouts
+    )
+    rng.shuffle(extras)
+    slots = max(args.paragraphs, 1)
+    per_slot = [extras[i::slots] for i in range(slots)]
+    diagram_iter = iter(diagrams)
+
+    for i in range(args.paragraphs):
+        if i % 4 == 0 and i:
+            blocks.append(f'## {" ".join(rng.choice(WORDS).capitalize() for _ in range(2))}')
+        blocks.append(paragraph(rng))
+
+        for extra in per_slot[i]:
+            if extra == 'code':
+                language = rng.choice(list(LANGUAGES))
+                code = LANGUAGES[language].format(n=rng.randint(1, 9999))
+                blocks.append(f'```{language}\n{code}```')
+            elif extra == 'table':
+                blocks.append(table(rng))
+            elif extra == 'diagram':
+                name = next(diagram_iter)
+                blocks.append(f'![{name.replace("-", " ")}](../assets/{name}.html)')
+            else:
+                blocks.append(f'> **{rng.choice(WORDS).capitalize()} Note:** {sentence(rng)}')
+
+    blocks.append('## Summary')
+    blocks.append(paragraph(rng))
+    if next_title:
+        blocks.append(f'**Next: [{next_title}](./{next_title}.md)**')
+
+    return '\n\n'.join(blocks) + '\n'
+
+
+# ---------------------------------------------------------------------------
+# Diagrams
+# ---------------------------------------------------------------------------
+
+def diagram(rng: random.Random, title: str, args: argparse.Namespace) -> str:
+    """Return an HTML diagram following the repository template."""
+    width, height = 900, max(600, 140 + 70 * ((args.boxes + 3) // 4))
+    elements = []
+
+    # Boxes laid out on a grid, each with a label sized to fit inside it
+    boxes = []
+    for i in range(args.boxes):
+        col, row = i % 4, i // 4
+        x, y = 40 + col * 210, 90 + row * 70
+        boxes.append((x, y))
+        label = ' '.join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, 2)))[:24]
+        color = rng.choice(COLORS)
+        elements.append(
+            f'<g transform="translate({x}, {y})">\n'
+            f'                <rect x="0" y="0" width="180" height="50" rx="6" fill="{color}" '
+            f'stroke="#1e293b" stroke-width="1"/>\n'
+            f'                <text x="90" y="30" text-anchor="middle" fill="#ffffff" '
+            f'font-size="12" font-family="{FONT}">{label}</text>\n'
+            f'            </g>'
+        )
+
+    # Arrows between random pairs of boxes
+    for _ in range(args.arrows if len(boxes) > 1 else 0):
+        (x1, y1), (x2, y2) = rng.sample(boxes, 2)
+        elements.append(
+            f'<line x1="{x1 + 90}" y1="{y1 + 50}" x2="{x2 + 90}" y2="{y2}" '
+            f'stroke="#64748b" stroke-width="1.5" marker-end="url(#arrowhead)"/>'
+        )
+
+    # Dashboard-style polylines with many path segments
+    for _ in range(args.paths):
+        points = [f'{40 + i * 8} {height - 60 - rng.randint(0, 40)}' for i in range(100)]
+        elements.append(
+            f'<path d="M {points[0]} L {" L ".join(points[1:])}" fill="none" '
+            f'stroke="{rng.choice(COLORS)}" stroke-width="1"/>'
+        )
+
+    body = '\n            '.join(elements)
+    return f'''<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+    <style>
+        body {{
+            font-family: {FONT};
+            margin: 0;
+            padding: 20px;
+            background: #f8fafc;
+        }}
+        .diagram-container {{
+            background: white;
+            border-radius: 12px;
+            padding: 24px;
+            max-width: 100%;
+        }}
+    </style>
+</head>
+<body>
+    <div class="diagram-container">
+        <svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg">
+            <defs>
+                <marker id="arrowhead" markerWidth="10" markerHeight="7" refX="9" refY="3.5" orient="auto">
+                    <polygon points="0 0, 10 3.5, 0 7" fill="#64748b"/>
+                </marker>
+            </defs>
+
+            <rect width="{width}" height="{height}" fill="#ffffff" rx="8"/>
+
+            <text x="{width // 2}" y="35" text-anchor="middle" fill="#1e293b" font-size="20" font-weight="600" font-family="{FONT}">{title}</text>
+
+            {body}
+        </svg>
+    </div>
+</body>
+</html>
+'''
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def generate_book(output_dir: str, book: str, rng: random.Random,
+                  args: argparse.Namespace, diagram_count: int) -> None:
+    """Write one synthetic book with its chapters and diagrams."""
+    book_dir = os.path.join(output_dir, book)
+    os.makedirs(os.path.join(book_dir, 'chapters'))
+    os.makedirs(os.path.join(book_dir, 'assets'))
+
+    with open(os.path.join(book_dir, 'README.md'), 'w', encoding='utf-8') as f:
+        f.write(f'# Synthetic Book {book}\n\nGenerated by scripts/generate-corpus.py.\n')
+
+    # Distribute diagrams across chapters as evenly as possible
+    chapters = max(args.chapters, 1)
+    names = [f'{n:02d}-{rng.choice(WORDS)}-{rng.choice(WORDS)}' for n in range(1, chapters + 1)]
+    for index, name in enumerate(names):
+        count = diagram_count // chapters + (1 if index < diagram_count % chapters else 0)
+        diagrams = [f'ch{index + 1:02d}-diagram-{k + 1:03d}' for k in range(count)]
+
+        for diagram_name in diagrams:
+            path = os.path.join(book_dir, 'assets', f'{diagram_name}.html')
+            title = diagram_name.replace('-', ' ').title()
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(diagram(rng, title, args))
+
+        next_name = names[index + 1] if index + 1 < len(names) else None
+        path = os.path.join(book_dir, 'chapters', f'{name}.md')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(chapter(rng, index + 1, args, diagrams, next_name))
+
+
+def output_error(output: str, force: bool) -> str | None:
+    """Return why the output directory must not be replaced, or None if it can be."""
+    path = os.path.realpath(output)
+    ebooks = os.path.join(REPO_ROOT, 'ebooks')
+    # Never the repository (or a directory containing it) or anything under ebooks/
+    if os.path.commonpath([path, REPO_ROOT]) == path:
+        return f"{output} is or contains the repository"
+    if os.path.commonpath([path, ebooks]) == ebooks:
+        return f"{output} is inside ebooks/"
+    if not os.path.exists(path):
+        return None
+    if not os.path.isdir(path):
+        return f"{output} exists and is not a directory"
+    if os.listdir(path) and not force and not os.path.exists(os.path.join(path, MARKER)):
+        return (f"{output} is not empty and was not written by generate-corpus.py "
+                f"(use --force to replace it)")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generate a synthetic ebook corpus for scaling tests'
+    )
+    parser.add_argument('output', help='Directory to write books into (replaced if an earlier run wrote it)')
+    parser.add_argument('--books', type=int, default=1, help='Number of books (default: 1)')
+    parser.add_argument('--chapters', type=int, default=15,
+                        help='Chapters per book (default: 15)')
+    parser.add_argument('--diagrams', type=int, default=90,
+                        help='Diagrams per book, spread over its chapters (default: 90)')
+    parser.add_argument('--paragraphs', type=int, default=40,
+                        help='Prose paragraphs per chapter (default: 40)')
+    parser.add_argument('--code-blocks', type=int, default=8,
+                        help='Fenced code blocks per chapter (default: 8)')
+    parser.add_argument('--tables', type=int, default=3, help='Tables per chapter (default: 3)')
+    parser.add_argument('--callouts', type=int, default=2,
+                        help='Callouts per chapter (default: 2)')
+    parser.add_argument('--boxes', type=int, default=12,
+                        help='Labelled boxes per diagram (default: 12)')
+    parser.add_argument('--arrows', type=int, default=10,
+                        help='Arrows per diagram (default: 10)')
+    parser.add_argument('--paths', type=int, default=0,
+                        help='100-segment chart paths per diagram (default: 0)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+    parser.add_argument('--force', action='store_true',
+                        help='Replace a non-empty output directory not written by this script')
+    args = parser.parse_args()
+
+    error = output_error(args.output, args.force)
+    if error:
+        print(f"Error: {error}", file=sys.stderr)
+        sys.exit(1)
+    if os.path.exists(args.output):
+        shutil.rmtree(args.output)
+    os.makedirs(args.output)
+    with open(os.path.join(args.output, MARKER), 'w', encoding='utf-8') as f:
+        f.write('Written by scripts/generate-corpus.py; the next run replaces this directory.\n')
+
+    rng = random.Random(args.seed)
+    for number in range(1, args.books + 1):
+        generate_book(args.output, f'synthetic-{number:02d}', rng, args, args.diagrams)
+
+    print(f"Generated {args.books} book(s) with {args.books * args.chapters} chapter(s) "
+          f"and {args.books * args.diagrams} diagram(s) in {args.output}")
+
+
+if __name__ == '__main__':
+    main()
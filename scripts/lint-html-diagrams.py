@@ -9,6 +9,10 @@ Rules checked:
 5. No web fonts in SVG (use Liberation Sans, Arial, or sans-serif)
 6. All text elements must have explicit font-family attribute
 7. Minimum 50px gap between title and first content element
+
+Rules 2 and 3 are fixable with fix-html-diagrams.py. --format json|sarif
+streams diagnostics with file, line, column, rule ID and fix availability
+instead of the text report (see lint_report.py).
 """
 
 # Minimum gap in pixels between title text and first content element
@@ -27,9 +31,39 @@ DISALLOWED_FONTS = [
     'Droid Sans',
     'Helvetica Neue',
 ]
+import argparse
 import sys
 import re
 import glob
+from dataclasses import dataclass
+
+from lint_report import FORMATS, Diagnostic, make_reporter
+
+# Rule IDs used in structured output
+RULES = {
+    'missing-svg': 'Diagram must contain an <svg> element',
+    'external-title': 'No h1-h6 titles outside the SVG in diagram-container',
+    'svg-css-class': 'No CSS class attributes on SVG child elements',
+    'missing-viewbox': 'viewBox attribute required on <svg>',
+    'web-font': 'No web fonts in SVG; use Liberation Sans, Arial, or sans-serif',
+    'text-font-family': 'All <text> elements need an explicit font-family attribute',
+    'title-spacing': f'Minimum {MIN_TITLE_GAP}px gap between title and first content element',
+}
+
+# Rules fix-html-diagrams.py can fix
+FIXABLE_RULES = {'external-title', 'svg-css-class'}
+
+SVG_PATTERN = re.compile(r'<svg[^>]*>.*?</svg>', re.DOTALL)
+
+
+@dataclass
+class Violation:
+    message: str
+    rule: str
+    offset: int = 0  # position in the file content
+
+    def __str__(self) -> str:
+        return self.message
 
 
 def get_element_y(element_str: str) -> float | None:
@@ -117,16 +151,20 @@ def check_title_spacing(svg_content: str) -> str | None:
     return None
 
 
-def lint_file(path: str) -> list[str]:
-    """Return list of violations for a file."""
-    errors = []
-    with open(path, 'r', encoding='utf-8') as f:
-        content = f.read()
+def find_svg(content: str) -> re.Match | None:
+    """Locate a diagram's <svg> element (also used by diagram-budget.py)."""
+    return SVG_PATTERN.search(content)
+
+
+def check_content(content: str) -> list[Violation]:
+    """Return violations for a diagram's HTML, with their positions."""
+    violations = []
 
     # Rule 1: Must have SVG element
-    if not re.search(r'<svg[^>]*>', content):
-        errors.append("Missing <svg> element")
-        return errors  # Can't check other rules without SVG
+    svg_open = re.search(r'<svg[^>]*>', content)
+    if not svg_open:
+        violations.append(Violation("Missing <svg> element", 'missing-svg'))
+        return violations  # Can't check other rules without SVG
 
     # Rule 2: No external titles (h1-h6 outside SVG)
     # Check for headings in diagram-container but outside svg
@@ -140,78 +178,139 @@ def lint_file(path: str) -> list[str]:
         if svg_match:
             outside_svg = container.replace(svg_match.group(0), '')
             if re.search(r'<h[1-6][^>]*>', outside_svg):
-                errors.append("Title element (h1-h6) found outside SVG - move into SVG as <text>")
+                heading_pattern = re.compile(r'<h[1-6][^>]*>')
+                heading = (heading_pattern.search(container, 0, svg_match.start())
+                           or heading_pattern.search(container, svg_match.end()))
+                offset = container_match.start(1) + (heading.start() if heading else 0)
+                violations.append(Violation(
+                    "Title element (h1-h6) found outside SVG - move into SVG as <text>",
+                    'external-title', offset,
+                ))
+
+    svg_match = find_svg(content)
+    svg_content = svg_match.group(0) if svg_match else ''
+    svg_start = svg_match.start() if svg_match else 0
 
     # Rule 3: Check for CSS class usage on SVG elements
-    svg_match = re.search(r'<svg[^>]*>.*?</svg>', content, re.DOTALL)
     if svg_match:
-        svg_content = svg_match.group(0)
         # Find elements with class= inside SVG (excluding the svg tag itself)
-        inner_svg = re.sub(r'^<svg[^>]*>', '', svg_content)
-        if re.search(r'<[^>]+\sclass=', inner_svg):
-            errors.append("CSS class attribute found on SVG child element - use inline styles")
+        inner_start = re.match(r'<svg[^>]*>', svg_content).end()
+        class_match = re.compile(r'<[^>]+\sclass=').search(svg_content, inner_start)
+        if class_match:
+            violations.append(Violation(
+                "CSS class attribute found on SVG child element - use inline styles",
+                'svg-css-class', svg_start + class_match.start(),
+            ))
 
     # Rule 4: viewBox required
     if not re.search(r'<svg[^>]*viewBox=', content):
-        errors.append("Missing viewBox attribute on <svg>")
+        violations.append(Violation(
+            "Missing viewBox attribute on <svg>", 'missing-viewbox', svg_open.start()
+        ))
 
     # Rule 5: No web fonts in SVG (they don't render correctly in PDF)
-    svg_match = re.search(r'<svg[^>]*>.*?</svg>', content, re.DOTALL)
     if svg_match:
-        svg_content = svg_match.group(0)
+        svg_lower = svg_content.lower()
         for font in DISALLOWED_FONTS:
-            if font.lower() in svg_content.lower():
-                errors.append(
-                    f"Web font '{font}' found in SVG - use 'Liberation Sans, Arial, sans-serif' instead"
-                )
+            position = svg_lower.find(font.lower())
+            if position != -1:
+                violations.append(Violation(
+                    f"Web font '{font}' found in SVG - use 'Liberation Sans, Arial, sans-serif' instead",
+                    'web-font', svg_start + position,
+                ))
                 break  # Only report once per file
 
     # Rule 6: All text elements must have explicit font-family
-    svg_match = re.search(r'<svg[^>]*>.*?</svg>', content, re.DOTALL)
     if svg_match:
-        svg_content = svg_match.group(0)
         # Find all text elements
-        text_elements = re.findall(r'<text\s+[^>]*>', svg_content)
-        missing_font = 0
-        for text_el in text_elements:
-            if 'font-family=' not in text_el:
-                missing_font += 1
-        if missing_font > 0:
-            errors.append(
-                f"{missing_font} <text> element(s) missing font-family attribute"
-            )
+        missing_font = [
+            m for m in re.finditer(r'<text\s+[^>]*>', svg_content)
+            if 'font-family=' not in m.group(0)
+        ]
+        if missing_font:
+            violations.append(Violation(
+                f"{len(missing_font)} <text> element(s) missing font-family attribute",
+                'text-font-family', svg_start + missing_font[0].start(),
+            ))
 
     # Rule 7: Minimum title spacing
-    svg_match = re.search(r'<svg[^>]*>.*?</svg>', content, re.DOTALL)
     if svg_match:
-        svg_content = svg_match.group(0)
         spacing_error = check_title_spacing(svg_content)
         if spacing_error:
-            errors.append(spacing_error)
+            violations.append(Violation(spacing_error, 'title-spacing', svg_start))
 
-    return errors
+    return violations
+
+
+def check_file(path: str) -> tuple[str, list[Violation]]:
+    """Lint a file. Returns (content, violations)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    return content, check_content(content)
+
+
+def lint_file(path: str) -> list[str]:
+    """Return list of violations for a file."""
+    _, violations = check_file(path)
+    return [str(v) for v in violations]
+
+
+def line_and_column(content: str, offset: int) -> tuple[int, int]:
+    """Return the 1-based line and column of an offset into content."""
+    line = content.count('\n', 0, offset) + 1
+    column = offset - (content.rfind('\n', 0, offset) + 1) + 1
+    return line, column
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: lint-html-diagrams.py <path-or-glob>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Lint HTML diagrams for rule compliance')
+    parser.add_argument('pattern', help='Glob pattern for diagram files to lint')
+    parser.add_argument(
+        '--format',
+        choices=FORMATS,
+        default='text',
+        help='Output format: text (default), or json/sarif diagnostics '
+             'streamed as each file is linted'
+    )
+    args = parser.parse_args()
 
-    pattern = sys.argv[1]
-    files = glob.glob(pattern, recursive=True)
+    files = glob.glob(args.pattern, recursive=True)
 
     if not files:
-        print(f"No files found matching: {pattern}")
+        print(f"No files found matching: {args.pattern}")
         sys.exit(1)
 
+    reporter = None
+    if args.format != 'text':
+        reporter = make_reporter(args.format, sys.stdout, 'lint-html-diagrams', RULES)
+
     total_errors = 0
+    files_with_errors = 0
     for path in sorted(files):
-        errors = lint_file(path)
-        if errors:
+        content, violations = check_file(path)
+        if reporter is not None:
+            for violation in violations:
+                line, column = line_and_column(content, violation.offset)
+                reporter.report(Diagnostic(
+                    path, line, column, violation.rule, violation.message,
+                    violation.rule in FIXABLE_RULES,
+                ))
+            reporter.end_file()
+        elif violations:
             print(f"\n{path}:")
-            for err in errors:
+            for err in violations:
                 print(f"  - {err}")
-            total_errors += len(errors)
+        if violations:
+            files_with_errors += 1
+            total_errors += len(violations)
+
+    if reporter is not None:
+        reporter.finish({
+            'files': len(files),
+            'violations': total_errors,
+            'files_with_violations': files_with_errors,
+        })
+        sys.exit(1 if total_errors else 0)
 
     if total_errors:
         print(f"\n{total_errors} violation(s) found in {len(files)} file(s)")
@@ -5,13 +5,26 @@ Rules checked:
 1. Code blocks must be preceded by a blank line
 2. Inline code must be preceded by whitespace or allowed punctuation
 3. No em-dashes allowed (—, --, or ---) - rewrite sentences instead
-4. Commas must be followed by a space in prose (fixable with --fix)
+4. Commas must be followed by a space in prose
+
+Rules 1, 2 and 4 are fixable. With --fix, each file is linted and fixed in
+a single pass: fixes are recorded as offset-based edits, applied once, and
+the file is rewritten atomically only if its content changed.
+
+--format json|sarif streams diagnostics with file, line, column, rule ID
+and fix availability instead of the text report (see lint_report.py).
 """
 
 import argparse
 import sys
 import re
 import glob
+import os
+import tempfile
+from dataclasses import dataclass
+
+from lint_report import FORMATS, Diagnostic, make_reporter
+from markdown_blocks import parse_file
 
 # Pattern to find inline code spans (single backticks, not triple)
 # Matches: `code` but not ```code```
@@ -40,165 +53,239 @@ COMMA_SPACING_PATTERN = re.compile(r',([a-zA-Z])')
 # and markdown emphasis characters (* and _)
 ALLOWED_BEFORE_BACKTICK = set(" \t'\"([{<*_")
 
+# Rule IDs used in structured output
+RULES = {
+    'code-block-spacing': 'Code blocks must be preceded by a blank line',
+    'inline-code-spacing': 'Inline code must be preceded by whitespace or allowed punctuation',
+    'em-dash': 'No em-dashes (—, --, or ---); rewrite the sentence instead',
+    'comma-spacing': 'Commas must be followed by a space in prose',
+}
 
-def lint_file(path: str) -> list[str]:
-    """Return list of violations for a file."""
-    errors = []
-    with open(path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-
-    in_code_block = False
-
-    for i, line in enumerate(lines):
-        line_num = i + 1
-        stripped = line.rstrip('\n')
-
-        # Check if this line is a code fence
-        if stripped.startswith('```'):
-            if not in_code_block:
-                # Opening code fence - check if preceded by blank line
-                if i > 0:
-                    prev_line = lines[i - 1].rstrip('\n')
-                    # Previous line should be blank (empty or whitespace only)
-                    if prev_line.strip() != '':
-                        errors.append(
-                            f"Line {line_num}: Code block not preceded by blank line"
-                        )
-                in_code_block = True
-            else:
-                # Closing code fence
-                in_code_block = False
-            continue
 
-        # Skip inline code checks inside code blocks
-        if in_code_block:
-            continue
+@dataclass
+class Edit:
+    start: int  # offset into the file content
+    end: int
+    replacement: str
 
-        # Check for inline code spacing violations
-        for match in INLINE_CODE_PATTERN.finditer(stripped):
-            pos = match.start()
-            if pos == 0:
-                # Start of line is fine
-                continue
-
-            char_before = stripped[pos - 1]
-            if char_before not in ALLOWED_BEFORE_BACKTICK:
-                # Found a violation - letter/digit directly before backtick
-                inline_code = match.group(1)
-                # Truncate long inline code for readability
-                if len(inline_code) > 20:
-                    inline_code = inline_code[:17] + '...'
-                errors.append(
-                    f"Line {line_num}: Missing space before inline code {inline_code}"
-                )
-
-        # Check for em-dash violations (-- or --- used instead of —)
-        # Skip horizontal rules (--- at start of line)
-        if HORIZONTAL_RULE_PATTERN.match(stripped):
-            continue
 
-        # Skip table separator rows
-        if TABLE_SEPARATOR_PATTERN.match(stripped):
-            continue
+@dataclass
+class Violation:
+    line: int
+    message: str
+    fix: Edit | None = None
+    rule: str = ''
+    column: int = 1  # 1-based
 
-        # Remove inline code spans before checking for em-dash violations
-        # This prevents flagging -- inside backticks (e.g., `--help`)
-        line_without_code = INLINE_CODE_PATTERN.sub('', stripped)
-
-        # Check for word---word or word--word patterns
-        for match in EM_DASH_WORD_PATTERN.finditer(line_without_code):
-            # Extract context around the match
-            start = max(0, match.start() - 10)
-            end = min(len(line_without_code), match.end() + 10)
-            context = line_without_code[start:end]
-            errors.append(
-                f"Line {line_num}: Em-dash not allowed (rewrite sentence): ...{context}..."
-            )
+    def __str__(self) -> str:
+        return f"Line {self.line}: {self.message}"
 
-        # Check for spaced em-dashes like " -- " or " --- "
-        for match in EM_DASH_SPACED_PATTERN.finditer(line_without_code):
-            start = max(0, match.start() - 10)
-            end = min(len(line_without_code), match.end() + 10)
-            context = line_without_code[start:end]
-            errors.append(
-                f"Line {line_num}: Em-dash not allowed (rewrite sentence): ...{context}..."
-            )
-
-        # Check for Unicode em-dash character
-        for match in EM_DASH_UNICODE_PATTERN.finditer(line_without_code):
-            start = max(0, match.start() - 15)
-            end = min(len(line_without_code), match.end() + 15)
-            context = line_without_code[start:end]
-            errors.append(
-                f"Line {line_num}: Em-dash not allowed (rewrite sentence): ...{context}..."
-            )
-
-        # Check for comma spacing violations (comma directly followed by letter)
-        for match in COMMA_SPACING_PATTERN.finditer(line_without_code):
-            start = max(0, match.start() - 15)
-            end = min(len(line_without_code), match.end() + 15)
-            context = line_without_code[start:end]
-            errors.append(
-                f"Line {line_num}: Missing space after comma: ...{context}..."
-            )
 
-    return errors
-
-
-def fix_comma_spacing(path: str) -> int:
-    """Fix comma spacing violations in a file. Returns number of fixes made."""
-    with open(path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-
-    fixed_lines = []
-    total_fixes = 0
-    in_code_block = False
+def check_file(path: str) -> tuple[str, list[Violation]]:
+    """Lint a file in one pass. Returns (content, violations)."""
+    violations = []
+    document = parse_file(path)
+    lines = document.lines
 
+    # Offset of the start of each line, so fixes can address file content
+    line_offsets = [0]
     for line in lines:
-        stripped = line.rstrip('\n')
-
-        # Track code blocks
-        if stripped.startswith('```'):
-            in_code_block = not in_code_block
-            fixed_lines.append(line)
+        line_offsets.append(line_offsets[-1] + len(line) + 1)
+
+    for block in document.blocks:
+        if block.kind == 'code':
+            # Opening code fence - check if preceded by blank line
+            if block.start > 1:
+                prev_line = lines[block.start - 2]
+                # Previous line should be blank (empty or whitespace only)
+                if prev_line.strip() != '':
+                    offset = line_offsets[block.start - 1]
+                    violations.append(Violation(
+                        block.start,
+                        "Code block not preceded by blank line",
+                        Edit(offset, offset, '\n'),
+                        rule='code-block-spacing',
+                    ))
+            # Skip inline code checks inside code blocks
             continue
 
-        # Don't modify lines inside code blocks
-        if in_code_block:
-            fixed_lines.append(line)
-            continue
+        for line_num in range(block.start, block.end + 1):
+            violations.extend(
+                lint_line(lines[line_num - 1], line_num, line_offsets[line_num - 1])
+            )
 
-        # Skip horizontal rules and table separators
-        if HORIZONTAL_RULE_PATTERN.match(stripped) or TABLE_SEPARATOR_PATTERN.match(stripped):
-            fixed_lines.append(line)
-            continue
+    return document.content, violations
 
-        # Fix comma spacing while preserving inline code
-        # Strategy: temporarily replace inline code with placeholders, fix, restore
-        code_spans = []
 
-        def save_code(match):
-            code_spans.append(match.group(0))
-            return f'\x00CODE{len(code_spans) - 1}\x00'
+def lint_file(path: str) -> list[str]:
+    """Return list of violations for a file."""
+    _, violations = check_file(path)
+    return [str(v) for v in violations]
+
 
-        # Save inline code spans
-        line_with_placeholders = INLINE_CODE_PATTERN.sub(save_code, line)
+def original_position(position: int, code_spans: list[tuple[int, int]]) -> int:
+    """Map a position in a line with its code spans removed back to the original line."""
+    for start, end in code_spans:
+        if start > position:
+            break
+        position += end - start
+    return position
 
-        # Fix comma spacing: add space after comma before letters
-        fixed_line, num_fixes = COMMA_SPACING_PATTERN.subn(r', \1', line_with_placeholders)
-        total_fixes += num_fixes
 
-        # Restore inline code spans
-        for i, code in enumerate(code_spans):
-            fixed_line = fixed_line.replace(f'\x00CODE{i}\x00', code)
+def lint_line(line: str, line_num: int, line_offset: int = 0) -> list[Violation]:
+    """Return violations for a single line of prose (outside code blocks).
 
-        fixed_lines.append(fixed_line)
+    line_offset is the position of the line in the file, used to anchor fixes.
+    """
+    violations = []
 
-    if total_fixes > 0:
-        with open(path, 'w', encoding='utf-8') as f:
-            f.writelines(fixed_lines)
+    # Check for inline code spacing violations
+    code_spans = []
+    for match in INLINE_CODE_PATTERN.finditer(line):
+        code_spans.append(match.span())
+        pos = match.start()
+        if pos == 0:
+            # Start of line is fine
+            continue
 
-    return total_fixes
+        char_before = line[pos - 1]
+        if char_before not in ALLOWED_BEFORE_BACKTICK:
+            # Found a violation - letter/digit directly before backtick
+            inline_code = match.group(1)
+            # Truncate long inline code for readability
+            if len(inline_code) > 20:
+                inline_code = inline_code[:17] + '...'
+            violations.append(Violation(
+                line_num,
+                f"Missing space before inline code {inline_code}",
+                Edit(line_offset + pos, line_offset + pos, ' '),
+                rule='inline-code-spacing',
+                column=pos + 1,
+            ))
+
+    # Check for em-dash violations (-- or --- used instead of —)
+    # Skip horizontal rules (--- at start of line)
+    if HORIZONTAL_RULE_PATTERN.match(line):
+        return violations
+
+    # Skip table separator rows
+    if TABLE_SEPARATOR_PATTERN.match(line):
+        return violations
+
+    # Remove inline code spans before checking for em-dash violations
+    # This prevents flagging -- inside backticks (e.g., `--help`)
+    line_without_code = INLINE_CODE_PATTERN.sub('', line)
+
+    # Check for word---word or word--word patterns
+    for match in EM_DASH_WORD_PATTERN.finditer(line_without_code):
+        # Extract context around the match
+        start = max(0, match.start() - 10)
+        end = min(len(line_without_code), match.end() + 10)
+        context = line_without_code[start:end]
+        violations.append(Violation(
+            line_num, f"Em-dash not allowed (rewrite sentence): ...{context}...",
+            rule='em-dash', column=original_position(match.start() + 1, code_spans) + 1,
+        ))
+
+    # Check for spaced em-dashes like " -- " or " --- "
+    for match in EM_DASH_SPACED_PATTERN.finditer(line_without_code):
+        start = max(0, match.start() - 10)
+        end = min(len(line_without_code), match.end() + 10)
+        context = line_without_code[start:end]
+        violations.append(Violation(
+            line_num, f"Em-dash not allowed (rewrite sentence): ...{context}...",
+            rule='em-dash', column=original_position(match.start() + 1, code_spans) + 1,
+        ))
+
+    # Check for Unicode em-dash character
+    for match in EM_DASH_UNICODE_PATTERN.finditer(line_without_code):
+        start = max(0, match.start() - 15)
+        end = min(len(line_without_code), match.end() + 15)
+        context = line_without_code[start:end]
+        violations.append(Violation(
+            line_num, f"Em-dash not allowed (rewrite sentence): ...{context}...",
+            rule='em-dash', column=original_position(match.start(), code_spans) + 1,
+        ))
+
+    # Check for comma spacing violations (comma directly followed by letter).
+    # Code spans are blanked out rather than removed, so each match is at its
+    # position in the original line and anchors its own fix.
+    line_masked = INLINE_CODE_PATTERN.sub(lambda m: ' ' * len(m.group(0)), line)
+    for match in COMMA_SPACING_PATTERN.finditer(line_masked):
+        start = max(0, match.start() - 15)
+        end = min(len(line), match.end() + 15)
+        context = line[start:end]
+        offset = line_offset + match.start() + 1
+        violations.append(Violation(
+            line_num, f"Missing space after comma: ...{context}...", Edit(offset, offset, ' '),
+            rule='comma-spacing', column=match.start() + 1,
+        ))
+
+    return violations
+
+
+def apply_edits(content: str, edits: list[Edit]) -> str:
+    """Apply non-overlapping edits to content in a single pass."""
+    pieces = []
+    position = 0
+    for edit in sorted(edits, key=lambda e: (e.start, e.end)):
+        if edit.start < position:
+            # Overlaps an earlier edit; leave it for the next run
+            continue
+        pieces.append(content[position:edit.start])
+        pieces.append(edit.replacement)
+        position = edit.end
+    pieces.append(content[position:])
+    return ''.join(pieces)
+
+
+def write_atomic(path: str, content: str) -> None:
+    """Write content via a temp file in the same directory, then rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.lint-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def fix_file(path: str) -> tuple[int, list[Violation]]:
+    """Lint a file and apply all fixable violations in one pass.
+
+    Returns (fixes applied, remaining violations). Remaining violations are
+    reported against the fixed file's line numbers.
+    """
+    content, violations = check_file(path)
+    edits = [v.fix for v in violations if v.fix]
+    remaining = [v for v in violations if not v.fix]
+
+    if not edits:
+        return 0, remaining
+
+    fixed = apply_edits(content, edits)
+    if fixed != content:
+        write_atomic(path, fixed)
+
+    # Inserted spaces shift later columns on the same line, and inserted
+    # blank lines shift the lines that follow them
+    line_starts = [0] + [i + 1 for i, c in enumerate(content) if c == '\n']
+    for violation in remaining:
+        line_start = line_starts[violation.line - 1]
+        position = line_start + violation.column - 1
+        violation.column += sum(
+            len(e.replacement) for e in edits
+            if e.replacement != '\n' and line_start <= e.start < position
+        )
+        violation.line += sum(
+            1 for e in edits
+            if e.replacement == '\n' and content.count('\n', 0, e.start) < violation.line
+        )
+
+    return len(edits), remaining
 
 
 def main():
@@ -209,7 +296,15 @@ def main():
     parser.add_argument(
         '--fix',
         action='store_true',
-        help='Auto-fix comma spacing violations'
+        help='Fix code block spacing, inline code spacing and comma '
+             'spacing in place, then report what remains'
+    )
+    parser.add_argument(
+        '--format',
+        choices=FORMATS,
+        default='text',
+        help='Output format: text (default), or json/sarif diagnostics '
+             'streamed as each file is linted'
     )
     args = parser.parse_args()
 
@@ -219,41 +314,59 @@ def main():
         print(f"No files found matching: {args.pattern}")
         sys.exit(1)
 
-    if args.fix:
-        # Fix mode: fix comma spacing violations
-        total_fixes = 0
-        files_fixed = 0
-        for path in sorted(files):
-            fixes = fix_comma_spacing(path)
-            if fixes > 0:
+    reporter = None
+    if args.format != 'text':
+        reporter = make_reporter(args.format, sys.stdout, 'lint-markdown', RULES)
+
+    total_errors = 0
+    total_fixes = 0
+    files_with_errors = 0
+    files_fixed = 0
+    for path in sorted(files):
+        if args.fix:
+            fixes, violations = fix_file(path)
+            if fixes:
                 files_fixed += 1
                 total_fixes += fixes
-                print(f"Fixed {fixes} comma spacing violation(s) in {path}")
-
-        if total_fixes:
-            print(f"\nFixed {total_fixes} total violation(s) in {files_fixed} file(s)")
+                if reporter is None:
+                    print(f"Fixed {fixes} violation(s) in {path}")
         else:
-            print(f"No comma spacing violations found in {len(files)} file(s)")
-        sys.exit(0)
+            _, violations = check_file(path)
+
+        if reporter is not None:
+            for violation in violations:
+                reporter.report(Diagnostic(
+                    path, violation.line, violation.column, violation.rule,
+                    violation.message, violation.fix is not None,
+                ))
+            reporter.end_file()
+        elif violations:
+            print(f"\n{path}:")
+            for violation in violations:
+                print(f"  - {violation}")
+
+        if violations:
+            files_with_errors += 1
+            total_errors += len(violations)
+
+    if reporter is not None:
+        reporter.finish({
+            'files': len(files),
+            'violations': total_errors,
+            'files_with_violations': files_with_errors,
+            'fixed': total_fixes,
+        })
+        sys.exit(1 if total_errors else 0)
+
+    if total_fixes:
+        print(f"\nFixed {total_fixes} total violation(s) in {files_fixed} file(s)")
+
+    if total_errors:
+        print(f"\n{total_errors} violation(s) found in {files_with_errors} file(s)")
+        sys.exit(1)
     else:
-        # Lint mode: report all violations
-        total_errors = 0
-        files_with_errors = 0
-        for path in sorted(files):
-            errors = lint_file(path)
-            if errors:
-                files_with_errors += 1
-                print(f"\n{path}:")
-                for err in errors:
-                    print(f"  - {err}")
-                total_errors += len(errors)
-
-        if total_errors:
-            print(f"\n{total_errors} violation(s) found in {files_with_errors} file(s)")
-            sys.exit(1)
-        else:
-            print(f"All {len(files)} markdown file(s) pass lint checks")
-            sys.exit(0)
+        print(f"All {len(files)} markdown file(s) pass lint checks")
+        sys.exit(0)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,124 @@
+"""Structured output for the linters (--format json|sarif).
+
+Diagnostics are written as they are produced rather than collected first:
+each reporter writes its document header up front, one diagnostic per
+line as files are linted (flushing after each file), and the closing
+summary at the end. The output is a single valid JSON document once the
+run completes, and line-oriented consumers can read diagnostics before
+then.
+
+json  - {"tool": ..., "diagnostics": [...], "summary": {...}}
+sarif - SARIF 2.1.0 with one run; results come before the tool and rule
+        metadata so they can be streamed
+"""
+
+import json
+import os
+from dataclasses import dataclass
+
+FORMATS = ('text', 'json', 'sarif')
+
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+
+
+@dataclass
+class Diagnostic:
+    path: str
+    line: int     # 1-based
+    column: int   # 1-based
+    rule: str
+    message: str
+    fixable: bool = False
+
+
+class JsonReporter:
+    """Stream diagnostics as a JSON object with a diagnostics array."""
+
+    def __init__(self, stream, tool: str, rules: dict[str, str]):
+        self.stream = stream
+        self.count = 0
+        stream.write(f'{{"tool": {json.dumps(tool)}, "diagnostics": [')
+
+    def report(self, diagnostic: Diagnostic) -> None:
+        record = {
+            'file': diagnostic.path,
+            'line': diagnostic.line,
+            'column': diagnostic.column,
+            'rule': diagnostic.rule,
+            'message': diagnostic.message,
+            'fixable': diagnostic.fixable,
+        }
+        separator = ',' if self.count else ''
+        self.stream.write(f'{separator}\n  {json.dumps(record)}')
+        self.count += 1
+
+    def end_file(self) -> None:
+        self.stream.flush()
+
+    def finish(self, summary: dict) -> None:
+        self.stream.write(f'\n], "summary": {json.dumps(summary)}}}\n')
+        self.stream.flush()
+
+
+class SarifReporter:
+    """Stream diagnostics as a SARIF 2.1.0 log."""
+
+    def __init__(self, stream, tool: str, rules: dict[str, str]):
+        self.stream = stream
+        self.tool = tool
+        self.rules = rules
+        self.count = 0
+        stream.write(
+            f'{{"$schema": {json.dumps(SARIF_SCHEMA)}, "version": "2.1.0", '
+            f'"runs": [{{"results": ['
+        )
+
+    def report(self, diagnostic: Diagnostic) -> None:
+        result = {
+            'ruleId': diagnostic.rule,
+            'level': 'error',
+            'message': {'text': diagnostic.message},
+            'locations': [{
+                'physicalLocation': {
+                    'artifactLocation': {'uri': diagnostic.path.replace(os.sep, '/')},
+                    'region': {
+                        'startLine': diagnostic.line,
+                        'startColumn': diagnostic.column,
+                    },
+                },
+            }],
+            'properties': {'fixable': diagnostic.fixable},
+        }
+        separator = ',' if self.count else ''
+        self.stream.write(f'{separator}\n  {json.dumps(result)}')
+        self.count += 1
+
+    def end_file(self) -> None:
+        self.stream.flush()
+
+    def finish(self, summary: dict) -> None:
+        driver = {
+            'name': self.tool,
+            'rules': [
+                {'id': rule, 'shortDescription': {'text': description}}
+                for rule, description in self.rules.items()
+            ],
+        }
+        invocation = {
+            'executionSuccessful': True,
+            'properties': summary,
+        }
+        self.stream.write(
+            f'\n], "tool": {{"driver": {json.dumps(driver)}}}, '
+            f'"invocations": [{json.dumps(invocation)}]}}]}}\n'
+        )
+        self.stream.flush()
+
+
+def make_reporter(fmt: str, stream, tool: str, rules: dict[str, str]):
+    """Return a streaming reporter for a structured format."""
+    if fmt == 'json':
+        return JsonReporter(stream, tool, rules)
+    if fmt == 'sarif':
+        return SarifReporter(stream, tool, rules)
+    raise ValueError(f"Unsupported format: {fmt}")
@@ -0,0 +1,197 @@
+"""Shared block-level markdown parser for chapter tools.
+
+Splits a chapter into typed blocks with 1-based line spans so that the
+linters, the preprocessor and the plagiarism checker all agree on what is
+code, what is prose, and where each construct starts and ends.
+
+Block kinds:
+  heading     - ATX heading (# Title)
+  paragraph   - prose lines (including list items) up to a blank line
+  code        - fenced code block, fences included; info holds the language
+  table       - consecutive | table rows
+  image       - standalone ![alt](path) line
+  callout     - consecutive > blockquote lines
+  navigation  - **Next: [...]** chapter navigation line
+  comment     - <!-- HTML comment -->, possibly spanning lines
+  pagebreak   - \\newpage
+  rule        - horizontal rule (---)
+
+Parsed block spans are cached per file content hash under
+build/.cache/markdown-blocks/, so a pipeline that lints, preprocesses and
+spot-checks the same chapters only parses each one once.
+"""
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Iterator
+
+# Bump when block classification changes to invalidate cached parses
+PARSER_VERSION = 1
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(REPO_ROOT, 'build', '.cache', 'markdown-blocks')
+
+HEADING_PATTERN = re.compile(r'^#{1,6}\s')
+NAVIGATION_PATTERN = re.compile(r'^\*\*Next:\s*\[')
+RULE_PATTERN = re.compile(r'^---+$')
+
+
+@dataclass
+class Block:
+    kind: str
+    start: int  # first line, 1-based
+    end: int    # last line, 1-based and inclusive
+    info: str = ''
+
+
+@dataclass
+class MarkdownDocument:
+    path: str
+    content: str
+    lines: list[str]
+    blocks: list[Block]
+    digest: str
+
+    def block_lines(self, block: Block) -> list[str]:
+        """Return the raw lines of a block."""
+        return self.lines[block.start - 1:block.end]
+
+    def blocks_of(self, *kinds: str) -> list[Block]:
+        """Return blocks of the given kinds, in document order."""
+        return [b for b in self.blocks if b.kind in kinds]
+
+
+def classify_line(stripped: str) -> str | None:
+    """Return the single-line block kind for a stripped line, or None for prose."""
+    if HEADING_PATTERN.match(stripped):
+        return 'heading'
+    if stripped.startswith('|'):
+        return 'table'
+    if stripped.startswith('!['):
+        return 'image'
+    if stripped.startswith('>'):
+        return 'callout'
+    if stripped.startswith('\\newpage'):
+        return 'pagebreak'
+    if NAVIGATION_PATTERN.match(stripped):
+        return 'navigation'
+    if stripped.startswith('<!--'):
+        return 'comment'
+    if RULE_PATTERN.match(stripped):
+        return 'rule'
+    return None
+
+
+def iter_blocks(lines: list[str]) -> Iterator[Block]:
+    """Yield typed blocks from a list of lines in a single forward pass."""
+    i = 0
+    total = len(lines)
+
+    while i < total:
+        stripped = lines[i].strip()
+
+        if not stripped:
+            i += 1
+            continue
+
+        start = i + 1
+
+        # Fenced code: runs to the closing fence (or end of file)
+        if stripped.startswith('```'):
+            info = stripped[3:].strip()
+            i += 1
+            while i < total and not lines[i].strip().startswith('```'):
+                i += 1
+            end = min(i + 1, total)
+            yield Block('code', start, end, info)
+            i += 1
+            continue
+
+        kind = classify_line(stripped)
+
+        if kind == 'comment':
+            while '-->' not in lines[i] and i + 1 < total:
+                i += 1
+            yield Block('comment', start, i + 1)
+            i += 1
+            continue
+
+        # Tables and callouts group consecutive lines of the same kind
+        if kind in ('table', 'callout'):
+            while i + 1 < total and classify_line(lines[i + 1].strip()) == kind:
+                i += 1
+            yield Block(kind, start, i + 1)
+            i += 1
+            continue
+
+        if kind is not None:
+            yield Block(kind, start, start)
+            i += 1
+            continue
+
+        # Paragraph: prose until a blank line, fence or non-prose line
+        while i + 1 < total:
+            following = lines[i + 1].strip()
+            if (not following or following.startswith('```')
+                    or classify_line(following) is not None):
+                break
+            i += 1
+        yield Block('paragraph', start, i + 1)
+        i += 1
+
+
+def _cache_path(digest: str) -> str:
+    return os.path.join(CACHE_DIR, f'{digest}.json')
+
+
+def _load_cached_blocks(digest: str) -> list[Block] | None:
+    try:
+        with open(_cache_path(digest), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != PARSER_VERSION:
+        return None
+    return [Block(*fields) for fields in data['blocks']]
+
+
+def _store_cached_blocks(digest: str, blocks: list[Block]) -> None:
+    data = {
+        'version': PARSER_VERSION,
+        'blocks': [[b.kind, b.start, b.end, b.info] for b in blocks],
+    }
+    path = _cache_path(digest)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Caching is best-effort; a read-only tree still parses fine
+        pass
+
+
+def parse_markdown(content: str, path: str = '<string>') -> MarkdownDocument:
+    """Parse markdown text into a document, using the on-disk block cache."""
+    digest = hashlib.sha256(
+        f'{PARSER_VERSION}:{content}'.encode('utf-8')
+    ).hexdigest()
+    lines = content.split('\n')
+
+    blocks = _load_cached_blocks(digest)
+    if blocks is None:
+        blocks = list(iter_blocks(lines))
+        _store_cached_blocks(digest, blocks)
+
+    return MarkdownDocument(path, content, lines, blocks, digest)
+
+
+def parse_file(path: str) -> MarkdownDocument:
+    """Read and parse a markdown file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    return parse_markdown(content, path)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Convert chapters to pandoc JSON ASTs in parallel and assemble one book AST.
+
+Each preprocessed chapter is parsed separately with `pandoc --to json` and
+the result is cached under build/.cache/pandoc-ast/, keyed by the chapter
+content, the reader format and the pandoc version. The chapter ASTs are
+then concatenated into a single document that the format recipes render
+with `--from json`, so after a one-line edit only that chapter is parsed
+again.
+
+Header identifiers are de-duplicated across chapters the same way pandoc
+does for concatenated input (summary, summary-1, ...), since each chapter
+is parsed on its own. The ids come from check-links.py, which slugs the
+chapter sources' headings like pandoc and numbers repeats across the book,
+so incremental builds get the anchors the link checker expects.
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from build_profile import record
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+CACHE_DIR = os.path.join(REPO_ROOT, 'build', '.cache', 'pandoc-ast')
+
+
+def load_link_checker():
+    """Import check-links.py, whose hyphenated name blocks a normal import."""
+    spec = importlib.util.spec_from_file_location(
+        'check_links', os.path.join(SCRIPT_DIR, 'check-links.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def pandoc_version() -> str:
+    """Return the first line of `pandoc --version`."""
+    result = subprocess.run(
+        ['pandoc', '--version'], capture_output=True, text=True, check=True
+    )
+    return result.stdout.splitlines()[0]
+
+
+def cache_key(chapter_path: str, reader: str, version: str) -> str:
+    """Hash the chapter content together with everything that affects parsing."""
+    digest = hashlib.sha256(f'{version}\0{reader}\0'.encode('utf-8'))
+    with open(chapter_path, 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def cached_ast_path(chapter_path: str, reader: str, version: str) -> str:
+    """Return where the chapter's AST is cached."""
+    return os.path.join(CACHE_DIR, f'{cache_key(chapter_path, reader, version)}.json')
+
+
+def convert_chapter(chapter_path: str, reader: str, version: str) -> tuple[dict, bool]:
+    """Return (chapter AST, cache hit), converting with pandoc on a miss."""
+    cache_path = cached_ast_path(chapter_path, reader, version)
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f), True
+
+    start = time.perf_counter()
+    result = subprocess.run(
+        ['pandoc', chapter_path, '--from', reader, '--to', 'json'],
+        capture_output=True, text=True,
+    )
+    record('parse', 'pandoc', os.path.basename(chapter_path), time.perf_counter() - start)
+    if result.returncode != 0:
+        raise RuntimeError(f"pandoc failed on {chapter_path}:\n{result.stderr}")
+
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(result.stdout)
+    os.replace(tmp_path, cache_path)
+
+    return json.loads(result.stdout), False
+
+
+def iter_headers(node):
+    """Yield the Header blocks in an AST fragment in document order, nested ones included."""
+    if isinstance(node, dict):
+        if node.get('t') == 'Header':
+            yield node
+            return
+        node = node.get('c')
+    if isinstance(node, list):
+        for child in node:
+            yield from iter_headers(child)
+
+
+def deduplicate_header_ids(blocks: list, anchors: list[str] | None, used_ids: set[str]) -> None:
+    """Give a chapter's headers their book-wide identifiers, in place.
+
+    `anchors` are the chapter's heading ids in order, from check-links.py.
+    If they don't line up with the AST's headers (e.g. setext headings the
+    link checker doesn't index), repeated ids are suffixed instead.
+    """
+    headers = [header for header in iter_headers(blocks) if header['c'][1][0]]
+    if anchors is not None and len(anchors) == len(headers):
+        for header, anchor in zip(headers, anchors):
+            header['c'][1][0] = anchor
+            used_ids.add(anchor)
+        return
+
+    for header in headers:
+        attr = header['c'][1]
+        identifier = attr[0]
+        unique = identifier
+        suffix = 1
+        while unique in used_ids:
+            unique = f'{identifier}-{suffix}'
+            suffix += 1
+        attr[0] = unique
+        used_ids.add(unique)
+
+
+def assemble(chapter_asts: list[dict], chapter_paths: list[str]) -> dict:
+    """Concatenate chapter ASTs (parsed from `chapter_paths`) into a single pandoc document."""
+    links = load_link_checker()
+    anchors = links.heading_anchors([links.load_index(path) for path in chapter_paths])
+    used_ids = set()
+    blocks = []
+    for ast, path in zip(chapter_asts, chapter_paths):
+        deduplicate_header_ids(ast['blocks'], anchors.get(path), used_ids)
+        blocks.extend(ast['blocks'])
+    return {
+        'pandoc-api-version': chapter_asts[0]['pandoc-api-version'],
+        'meta': {},
+        'blocks': blocks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Convert chapters to cached pandoc ASTs and assemble a book'
+    )
+    parser.add_argument('chapters', nargs='+', help='Preprocessed chapter files, in order')
+    parser.add_argument('--from', dest='reader', default='markdown',
+                        help='Pandoc reader format (default: markdown)')
+    parser.add_argument('--output', required=True, help='Assembled JSON AST path')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Parallel pandoc processes (default: CPU count)')
+    args = parser.parse_args()
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    version = pandoc_version()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+            results = list(pool.map(
+                lambda path: convert_chapter(path, args.reader, version),
+                args.chapters,
+            ))
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    converted = sum(1 for _, hit in results if not hit)
+    print(f"  Parsed {converted} chapter(s), {len(results) - converted} from cache")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(assemble([ast for ast, _ in results], args.chapters), f)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,447 @@
+"""Merge the per-diagram font subsets embedded in a finished PDF book.
+
+Every diagram PDF from rsvg-convert embeds its own subset of Liberation
+Sans, and xelatex copies each of them into the book, so a book carries a
+separate font program per diagram and face. dedupe_fonts() replaces them
+with one font per face:
+
+- fonts used by included graphics (form XObjects) are grouped by their
+  PostScript name without the subset tag (ABCDEF+)
+- each subset glyph is matched to the installed font (found with
+  fc-match) by outline and advance width, which also covers ligatures
+  and other glyphs that have no single character
+- the installed font is subset once to the glyphs the whole group uses,
+  keeping glyph ids, and embedded as one Identity-H CID font
+- text in the graphics is re-encoded from the old subsets' codes to
+  glyph ids of the shared font
+
+A font is left as it is when it isn't TrueType, when a glyph or code it
+uses can't be matched, or when the installed font can't be found. Text
+drawn by xelatex itself (page content) is not touched.
+
+Needs pikepdf and fontTools; build.py skips this step without them.
+
+Usage:
+  pdf_fonts.py build/api-optimization/api-optimization.pdf
+"""
+import argparse
+import hashlib
+import io
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+try:
+    import pikepdf
+    from fontTools import subset as font_subset
+    from fontTools.ttLib import TTFont
+except ImportError:  # optional; without them there is nothing to merge with
+    pikepdf = None
+
+AVAILABLE = pikepdf is not None
+
+SUBSET_TAG_PATTERN = re.compile(r'^[A-Z]{6}\+')
+BFCHAR_PATTERN = re.compile(rb'beginbfchar(.*?)endbfchar', re.DOTALL)
+BFRANGE_PATTERN = re.compile(rb'beginbfrange(.*?)endbfrange', re.DOTALL)
+HEX_PATTERN = re.compile(rb'<([0-9A-Fa-f]*)>')
+RANGE_PATTERN = re.compile(rb'<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]+)>\s*(<[0-9A-Fa-f]*>|\[[^\]]*\])')
+
+SHOW_OPERATORS = ('Tj', 'TJ', "'", '"')
+CMAP_CHUNK = 100
+
+
+@dataclass
+class SubsetFont:
+    """An embedded font subset, with its codes mapped to installed glyph ids."""
+    font: object               # the font dictionary
+    face: str                  # PostScript name without the subset tag
+    code_width: int            # bytes per code: 2 for Identity-H, 1 for simple fonts
+    gids: dict[int, int]       # code -> glyph id in the installed font
+    text: dict[int, str]       # code -> text, from ToUnicode
+    descriptor: object = None
+
+
+@dataclass
+class InstalledFont:
+    path: str
+    font: object               # TTFont
+    glyphs: dict = field(default_factory=dict)   # outline key -> glyph id
+
+
+# ---------------------------------------------------------------------------
+# Fonts
+# ---------------------------------------------------------------------------
+
+def glyph_key(font, name: str) -> tuple:
+    """Identify a glyph by its flattened outline and advance width."""
+    glyf = font['glyf']
+    coordinates, end_points, flags = glyf[name].getCoordinates(glyf)
+    return (tuple(coordinates), tuple(end_points), bytes(flag & 1 for flag in flags),
+            font['hmtx'][name][0])
+
+
+@lru_cache(maxsize=None)
+def installed_font(face: str) -> InstalledFont | None:
+    """Find the installed TrueType font with this PostScript name."""
+    try:
+        result = subprocess.run(['fc-match', '-f', '%{file}', f':postscriptname={face}'],
+                                capture_output=True, text=True)
+    except OSError:
+        return None
+    path = result.stdout.strip()
+    if result.returncode != 0 or not path.lower().endswith('.ttf') or not os.path.exists(path):
+        return None
+    font = TTFont(path)
+    if font['name'].getDebugName(6) != face or 'glyf' not in font:
+        return None  # fc-match fell back to another font
+
+    installed = InstalledFont(path, font)
+    for gid, name in enumerate(font.getGlyphOrder()):
+        installed.glyphs.setdefault(glyph_key(font, name), gid)
+    return installed
+
+
+def parse_tounicode(data: bytes) -> dict[int, str]:
+    """Read a ToUnicode CMap's bfchar and bfrange entries."""
+    def text(hex_digits: bytes) -> str:
+        return bytes.fromhex(hex_digits.decode()).decode('utf-16-be', errors='replace')
+
+    mapping = {}
+    for block in BFCHAR_PATTERN.findall(data):
+        tokens = HEX_PATTERN.findall(block)
+        for source, target in zip(tokens[::2], tokens[1::2]):
+            mapping[int(source, 16)] = text(target)
+    for block in BFRANGE_PATTERN.findall(data):
+        for low, high, target in RANGE_PATTERN.findall(block):
+            low, high = int(low, 16), int(high, 16)
+            if target.startswith(b'['):
+                for code, item in zip(range(low, high + 1), HEX_PATTERN.findall(target)):
+                    mapping[code] = text(item)
+            else:
+                first = text(target[1:-1])
+                for offset, code in enumerate(range(low, high + 1)):
+                    mapping[code] = first[:-1] + chr(ord(first[-1]) + offset) if first else ''
+    return mapping
+
+
+def subset_codes(font, embedded) -> tuple[int, dict[int, str]] | None:
+    """Map a font's codes to glyph names in its embedded subset."""
+    names = embedded.getGlyphOrder()
+    if font.get('/Subtype') == '/Type0':
+        if font.get('/Encoding') != '/Identity-H':
+            return None
+        cid_font = font.DescendantFonts[0]
+        cid_to_gid = cid_font.get('/CIDToGIDMap')
+        if isinstance(cid_to_gid, pikepdf.Stream):
+            data = cid_to_gid.read_bytes()
+            gids = {cid: int.from_bytes(data[2 * cid:2 * cid + 2], 'big')
+                    for cid in range(len(data) // 2)}
+        else:
+            gids = {gid: gid for gid in range(len(names))}
+        return 2, {code: names[gid] for code, gid in gids.items() if gid < len(names)}
+
+    # Simple TrueType font: codes go through the subset's own cmap
+    if 'cmap' not in embedded:
+        return None
+    cmap = embedded['cmap']
+    codes = {}
+    for code in range(256):
+        for table, key in ((cmap.getcmap(3, 0), 0xF000 + code), (cmap.getcmap(3, 0), code),
+                           (cmap.getcmap(1, 0), code)):
+            if table is not None and key in table.cmap:
+                codes[code] = table.cmap[key]
+                break
+    return 1, codes
+
+
+def inspect_font(font) -> SubsetFont | None:
+    """Match an embedded TrueType subset's glyphs to the installed font, if possible."""
+    subtype = font.get('/Subtype')
+    if subtype == '/Type0':
+        descriptor = font.DescendantFonts[0].get('/FontDescriptor')
+        if font.DescendantFonts[0].get('/Subtype') != '/CIDFontType2':
+            return None
+    elif subtype == '/TrueType':
+        descriptor = font.get('/FontDescriptor')
+    else:
+        return None
+    if descriptor is None or '/FontFile2' not in descriptor or '/BaseFont' not in font:
+        return None
+
+    face = SUBSET_TAG_PATTERN.sub('', str(font.BaseFont)[1:])
+    installed = installed_font(face)
+    if installed is None:
+        return None
+    try:
+        embedded = TTFont(io.BytesIO(descriptor.FontFile2.read_bytes()))
+        codes = subset_codes(font, embedded)
+        if codes is None:
+            return None
+        code_width, names = codes
+        gids = {}
+        for code, name in names.items():
+            gid = installed.glyphs.get(glyph_key(embedded, name))
+            if gid is not None:
+                gids[code] = gid
+    except Exception:  # a subset fontTools can't read is left alone
+        return None
+    text = parse_tounicode(font.ToUnicode.read_bytes()) if '/ToUnicode' in font else {}
+    return SubsetFont(font, face, code_width, gids, text, descriptor)
+
+
+# ---------------------------------------------------------------------------
+# Content streams
+# ---------------------------------------------------------------------------
+
+def form_xobjects(pdf) -> list:
+    """Every form XObject reachable from the pages, once each."""
+    forms = []
+    seen = set()
+
+    def visit(resources) -> None:
+        for xobject in resources.get('/XObject', {}).values():
+            if xobject.objgen in seen or xobject.get('/Subtype') != '/Form':
+                continue
+            seen.add(xobject.objgen)
+            forms.append(xobject)
+            if '/Resources' in xobject:
+                visit(xobject.Resources)
+
+    for page in pdf.pages:
+        visit(page.resources)
+    return forms
+
+
+def reencode(data: bytes, subset: SubsetFont) -> bytes:
+    """Convert a shown string to 2-byte glyph ids; KeyError if a code isn't matched."""
+    width = subset.code_width
+    if len(data) % width:
+        raise KeyError(len(data))
+    return b''.join(subset.gids[int.from_bytes(data[i:i + width], 'big')].to_bytes(2, 'big')
+                    for i in range(0, len(data), width))
+
+
+def rewrite_form(form, subsets: dict[tuple, SubsetFont]) -> tuple[list | None, set, dict]:
+    """Re-encode a form's text for the fonts being merged.
+
+    Returns the new instructions (None if nothing changed), the fonts whose
+    codes couldn't all be matched, and the glyph ids used per font.
+    """
+    fonts = form.get('/Resources', {}).get('/Font', {})
+    by_name = {name: subsets[font.objgen] for name, font in fonts.items()
+               if font.objgen in subsets}
+    if not by_name:
+        return None, set(), {}
+
+    failed = set()
+    used = defaultdict(set)
+    instructions = []
+    current = None
+    stack = []
+    for instruction in pikepdf.parse_content_stream(form):
+        if not isinstance(instruction, pikepdf.ContentStreamInstruction):
+            instructions.append(instruction)
+            continue
+        operands, operator = list(instruction.operands), str(instruction.operator)
+        if operator == 'q':
+            stack.append(current)
+        elif operator == 'Q' and stack:
+            current = stack.pop()
+        elif operator == 'Tf':
+            current = by_name.get(str(operands[0]))
+        elif (operator == 'Tw' and current is not None and current.code_width == 1
+              and float(operands[0]) != 0):
+            failed.add(current.font.objgen)  # word spacing only applies to 1-byte codes
+        elif operator in SHOW_OPERATORS and current is not None:
+            try:
+                if operator == 'TJ':
+                    operands[0] = pikepdf.Array([
+                        pikepdf.String(reencode(bytes(item), current))
+                        if isinstance(item, pikepdf.String) else item
+                        for item in operands[0]
+                    ])
+                    shown = [bytes(item) for item in operands[0] if isinstance(item, pikepdf.String)]
+                else:
+                    if operator == '"' and current.code_width == 1 and float(operands[0]) != 0:
+                        failed.add(current.font.objgen)
+                    operands[-1] = pikepdf.String(reencode(bytes(operands[-1]), current))
+                    shown = [bytes(operands[-1])]
+            except KeyError:
+                failed.add(current.font.objgen)
+            else:
+                for data in shown:
+                    used[current.font.objgen].update(
+                        int.from_bytes(data[i:i + 2], 'big') for i in range(0, len(data), 2))
+        instructions.append(pikepdf.ContentStreamInstruction(operands, pikepdf.Operator(operator)))
+    return instructions, failed, used
+
+
+# ---------------------------------------------------------------------------
+# Shared fonts
+# ---------------------------------------------------------------------------
+
+def tounicode_cmap(text: dict[int, str]) -> bytes:
+    lines = [
+        '/CIDInit /ProcSet findresource begin', '12 dict begin', 'begincmap',
+        '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def',
+        '/CMapName /Adobe-Identity-UCS def', '/CMapType 2 def',
+        '1 begincodespacerange', '<0000> <FFFF>', 'endcodespacerange',
+    ]
+    entries = sorted(text.items())
+    for start in range(0, len(entries), CMAP_CHUNK):
+        chunk = entries[start:start + CMAP_CHUNK]
+        lines.append(f'{len(chunk)} beginbfchar')
+        lines += [f'<{gid:04X}> <{value.encode("utf-16-be").hex().upper()}>' for gid, value in chunk]
+        lines.append('endbfchar')
+    lines += ['endcmap', 'CMapName currentdict /CMap defineresource pop', 'end', 'end']
+    return '\n'.join(lines).encode('ascii')
+
+
+def shared_font(pdf, face: str, members: list[SubsetFont], gids: set[int]):
+    """Embed the installed font, subset to `gids` with ids kept, as one Type0 font."""
+    installed = installed_font(face)
+    options = font_subset.Options()
+    options.retain_gids = True
+    options.notdef_outline = True
+    options.layout_features = []
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(gids=sorted(gids | {0}))
+    font = TTFont(installed.path)
+    subsetter.subset(font)
+    buffer = io.BytesIO()
+    font.save(buffer)
+    data = buffer.getvalue()
+
+    digest = hashlib.sha256(f'{face}:{sorted(gids)}'.encode()).digest()
+    name = pikepdf.Name('/' + ''.join(chr(65 + b % 26) for b in digest[:6]) + '+' + face)
+
+    font_file = pikepdf.Stream(pdf, data)
+    font_file.Length1 = len(data)
+    descriptor = pikepdf.Dictionary({
+        key: value for key, value in members[0].descriptor.items()
+        if key not in ('/FontFile2', '/FontName', '/CIDSet')
+    })
+    descriptor.FontName = name
+    descriptor.FontFile2 = pdf.make_indirect(font_file)
+
+    scale = 1000 / installed.font['head'].unitsPerEm
+    order = installed.font.getGlyphOrder()
+    widths = pikepdf.Array()
+    for gid in sorted(gids):
+        widths.extend([gid, pikepdf.Array([round(installed.font['hmtx'][order[gid]][0] * scale)])])
+
+    text = {}
+    for member in members:
+        for code, value in member.text.items():
+            if code in member.gids:
+                text.setdefault(member.gids[code], value)
+
+    cid_font = pikepdf.Dictionary(
+        Type=pikepdf.Name.Font, Subtype=pikepdf.Name.CIDFontType2, BaseFont=name,
+        CIDSystemInfo=pikepdf.Dictionary(Registry=pikepdf.String('Adobe'),
+                                         Ordering=pikepdf.String('Identity'), Supplement=0),
+        FontDescriptor=pdf.make_indirect(descriptor), CIDToGIDMap=pikepdf.Name.Identity,
+        W=widths,
+    )
+    return pdf.make_indirect(pikepdf.Dictionary(
+        Type=pikepdf.Name.Font, Subtype=pikepdf.Name.Type0, BaseFont=name,
+        Encoding=pikepdf.Name('/Identity-H'), DescendantFonts=pikepdf.Array([pdf.make_indirect(cid_font)]),
+        ToUnicode=pdf.make_indirect(pikepdf.Stream(pdf, tounicode_cmap(text))),
+    ))
+
+
+def dedupe_fonts(input_path: str, output_path: str | None = None) -> dict:
+    """Merge the diagram font subsets in a PDF, writing it in place unless output_path is given.
+
+    Returns counts for reporting: fonts before and after, and file sizes.
+    """
+    output_path = output_path or input_path
+    stats = {'fonts': 0, 'merged_fonts': 0, 'bytes': os.path.getsize(input_path)}
+    stats['merged_bytes'] = stats['bytes']
+
+    with pikepdf.open(input_path, allow_overwriting_input=True) as pdf:
+        forms = form_xobjects(pdf)
+        subsets = {}
+        for form in forms:
+            for font in form.get('/Resources', {}).get('/Font', {}).values():
+                if font.is_indirect and font.objgen not in subsets:
+                    subsets[font.objgen] = inspect_font(font)
+        stats['fonts'] = len(subsets)
+        subsets = {objgen: subset for objgen, subset in subsets.items() if subset is not None}
+
+        # Drop fonts with unmatched codes until a pass re-encodes everything cleanly;
+        # a face left with a single font gains nothing from merging
+        while True:
+            faces = defaultdict(list)
+            for subset in subsets.values():
+                faces[subset.face].append(subset)
+            subsets = {subset.font.objgen: subset for members in faces.values()
+                       if len(members) > 1 for subset in members}
+            rewrites = {}
+            failed = set()
+            used = defaultdict(set)
+            for form in forms:
+                instructions, form_failed, form_used = rewrite_form(form, subsets)
+                failed |= form_failed
+                for objgen, gids in form_used.items():
+                    used[objgen] |= gids
+                if instructions is not None:
+                    rewrites[form.objgen] = (form, instructions)
+            if not failed:
+                break
+            for objgen in failed:
+                subsets.pop(objgen, None)
+
+        if not subsets:
+            stats['merged_fonts'] = stats['fonts']
+            if output_path != input_path:
+                pdf.save(output_path)
+            return stats
+
+        replacements = {}
+        for face, members in sorted(faces.items()):
+            members = [subset for subset in members if subset.font.objgen in subsets]
+            gids = set().union(*(used[subset.font.objgen] for subset in members))
+            font = shared_font(pdf, face, members, gids)
+            for subset in members:
+                replacements[subset.font.objgen] = font
+
+        for form, instructions in rewrites.values():
+            form.write(pikepdf.unparse_content_stream(instructions))
+            resources = pikepdf.Dictionary(form.Resources)
+            resources.Font = pikepdf.Dictionary({
+                name: replacements.get(font.objgen, font)
+                for name, font in form.Resources.Font.items()
+            })
+            form.Resources = resources
+
+        stats['merged_fonts'] = stats['fonts'] - len(replacements) + len(set(
+            font.objgen for font in replacements.values()))
+        pdf.save(output_path, compress_streams=True,
+                 object_stream_mode=pikepdf.ObjectStreamMode.generate)
+    stats['merged_bytes'] = os.path.getsize(output_path)
+    return stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Merge per-diagram font subsets in a PDF book")
+    parser.add_argument('pdf_file', help="PDF book to rewrite in place")
+    parser.add_argument('-o', '--output', help="Write here instead of in place")
+    args = parser.parse_args()
+
+    if not AVAILABLE:
+        print("Error: pikepdf and fontTools are required (pip install pikepdf fonttools)",
+              file=sys.stderr)
+        return 1
+    stats = dedupe_fonts(args.pdf_file, args.output)
+    print(f"{stats['fonts']} diagram fonts -> {stats['merged_fonts']}: "
+          f"{stats['bytes'] // 1024} KB -> {stats['merged_bytes'] // 1024} KB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Summarize build timing events into build-profile.json.
+
+Reads the JSON Lines log written during `just build` (see build.py,
+build_profile.py and profile.sh) and writes a structured profile with per-phase totals,
+per-step totals and per-file timings. Prints a summary table of the
+slowest phases, diagrams and chapters.
+
+Usage:
+  profile-report.py <events.jsonl> <build-profile.json> [--book B --format F --mode M]
+  profile-report.py --show <build-profile.json>
+"""
+import argparse
+import json
+import sys
+
+# Phases whose per-file timings are reported as diagrams or chapters
+DIAGRAM_PHASES = ('diagrams',)
+CHAPTER_PHASES = ('preprocess', 'parse')
+
+
+def load_events(path: str) -> list[dict]:
+    """Load timing events from a JSON Lines log."""
+    events = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+    return events
+
+
+def per_file(events: list[dict], phases: tuple[str, ...]) -> list[dict]:
+    """Combine per-file events of the given phases, slowest first."""
+    files = {}
+    for event in events:
+        if event['phase'] not in phases or not event['file']:
+            continue
+        entry = files.setdefault(event['file'], {'file': event['file'], 'total': 0.0})
+        entry[event['step']] = round(entry.get(event['step'], 0.0) + event['seconds'], 6)
+        entry['total'] = round(entry['total'] + event['seconds'], 6)
+    return sorted(files.values(), key=lambda e: e['total'], reverse=True)
+
+
+def build_profile(events: list[dict], metadata: dict) -> dict:
+    """Aggregate raw events into the build profile structure."""
+    phases = {}
+    steps = {}
+    for event in events:
+        if event['step'] == 'total':
+            phases[event['phase']] = round(
+                phases.get(event['phase'], 0.0) + event['seconds'], 6
+            )
+            continue
+        key = f"{event['phase']}/{event['step']}"
+        entry = steps.setdefault(key, {'count': 0, 'seconds': 0.0})
+        entry['count'] += 1
+        entry['seconds'] = round(entry['seconds'] + event['seconds'], 6)
+
+    return {
+        **metadata,
+        'total_seconds': round(sum(phases.values()), 6),
+        'phases': phases,
+        'steps': steps,
+        'diagrams': per_file(events, DIAGRAM_PHASES),
+        'chapters': per_file(events, CHAPTER_PHASES),
+        'events': events,
+    }
+
+
+def format_summary(profile: dict, limit: int = 10) -> str:
+    """Format the slowest phases, diagrams and chapters as a text table."""
+    lines = []
+    lines.append('=' * 70)
+    title = ' '.join(str(profile[k]) for k in ('book', 'format', 'mode') if profile.get(k))
+    lines.append(f'BUILD PROFILE {title}'.rstrip())
+    lines.append('=' * 70)
+
+    lines.append(f'\n{"Phase":<40}{"Seconds":>10}')
+    for phase, seconds in sorted(profile['phases'].items(), key=lambda p: p[1], reverse=True):
+        lines.append(f'{phase:<40}{seconds:>10.2f}')
+    for step, entry in sorted(profile['steps'].items()):
+        lines.append(f'  {step + " (" + str(entry["count"]) + "x)":<38}{entry["seconds"]:>10.2f}')
+    lines.append(f'{"Total":<40}{profile["total_seconds"]:>10.2f}')
+
+    for heading, entries in (('Slowest diagrams', profile['diagrams']),
+                             ('Slowest chapters', profile['chapters'])):
+        if not entries:
+            continue
+        steps = sorted({k for e in entries for k in e} - {'file', 'total'})
+        lines.append(f'\n{heading:<40}' + ''.join(f'{s:>10}' for s in steps) + f'{"total":>10}')
+        for entry in entries[:limit]:
+            name = entry['file'] if len(entry['file']) <= 38 else entry['file'][:35] + '...'
+            cells = ''.join(f'{entry.get(s, 0.0):>10.3f}' for s in steps)
+            lines.append(f'{name:<40}{cells}{entry["total"]:>10.3f}')
+
+    lines.append('=' * 70)
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize build timing events')
+    parser.add_argument('paths', nargs='+', help='<events.jsonl> <build-profile.json>, '
+                        'or just <build-profile.json> with --show')
+    parser.add_argument('--show', action='store_true',
+                        help='Print the summary of an existing build-profile.json')
+    parser.add_argument('--book')
+    parser.add_argument('--format')
+    parser.add_argument('--mode')
+    parser.add_argument('--limit', type=int, default=10,
+                        help='Rows per slowest-files table (default: 10)')
+    args = parser.parse_args()
+
+    if args.show:
+        with open(args.paths[0], 'r', encoding='utf-8') as f:
+            print(format_summary(json.load(f), args.limit))
+        return
+
+    if len(args.paths) != 2:
+        parser.error('expected <events.jsonl> <build-profile.json>')
+
+    metadata = {k: v for k, v in
+                (('book', args.book), ('format', args.format), ('mode', args.mode)) if v}
+    profile = build_profile(load_events(args.paths[0]), metadata)
+
+    with open(args.paths[1], 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+
+    print(f"  Build profile: {args.paths[1]} ({profile['total_seconds']:.1f}s)")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,34 @@
+#!/bin/bash
+# Build profiling helpers, sourced by shell wrappers such as timed-bin/xelatex.
+#
+# When BUILD_PROFILE_LOG is set, profile_record appends one JSON line per
+# timed step to it; scripts/profile-report.py turns the log into
+# build/<book>/build-profile.json. Without it, both functions are no-ops
+# apart from reading the clock.
+
+# Print the current time in microseconds
+profile_now() {
+    local now="${EPOCHREALTIME/./}"
+    echo "${now/,/}"
+}
+
+# Record a timed step: profile_record <phase> <step> <file|""> <start-us>
+profile_record() {
+    [ -n "${BUILD_PROFILE_LOG:-}" ] || return 0
+
+    local phase="$1" step="$2" file="$3" start="$4"
+    local end elapsed file_json
+    end=$(profile_now)
+    elapsed=$((end - start))
+
+    if [ -n "$file" ]; then
+        file="${file//\\/\\\\}"
+        file_json="\"${file//\"/\\\"}\""
+    else
+        file_json="null"
+    fi
+
+    printf '{"phase": "%s", "step": "%s", "file": %s, "seconds": %d.%06d}\n' \
+        "$phase" "$step" "$file_json" $((elapsed / 1000000)) $((elapsed % 1000000)) \
+        >> "$BUILD_PROFILE_LOG"
+}
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""Render a book's HTML diagrams to PNG in parallel and build contact sheets.
+
+Batch counterpart to render-html-to-png.sh for visual review. Every diagram
+in ebooks/<book>/assets/ is extracted to SVG and rasterized with
+rsvg-convert on a thread pool. PNGs are cached under
+build/.cache/diagram-png/, keyed by the diagram content, the render width
+and the extractor source, so a second run only renders diagrams that
+changed.
+
+Diagrams are then grouped by the chapter that references them (in
+reference order) and laid out on one contact sheet per chapter:
+
+  build/<book>/review/<name>.png               - each rendered diagram
+  build/<book>/review/<chapter>-contact-sheet.png
+
+Diagrams no chapter references go on unreferenced-contact-sheet.png.
+
+Usage:
+  render-diagrams.py api-optimization
+  render-diagrams.py api-optimization --chapter 02-fundamentals --columns 4
+"""
+import argparse
+import base64
+import glob
+import hashlib
+import importlib.util
+import os
+import re
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from html import escape
+
+from markdown_blocks import parse_file
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+CACHE_DIR = os.path.join(REPO_ROOT, 'build', '.cache', 'diagram-png')
+
+ASSET_REFERENCE_PATTERN = re.compile(r'\]\(\.\./assets/([^)]+)\.html\)')
+
+LABEL_HEIGHT = 28
+GUTTER = 16
+FONT = 'Liberation Sans, Arial, sans-serif'
+
+
+def load_extractor():
+    """Import extract-svg.py, whose hyphenated name blocks a normal import."""
+    spec = importlib.util.spec_from_file_location(
+        'extract_svg', os.path.join(SCRIPT_DIR, 'extract-svg.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def extractor_digest() -> str:
+    """Hash the extractor source so extraction changes invalidate the cache."""
+    with open(os.path.join(SCRIPT_DIR, 'extract-svg.py'), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def cache_key(html_path: str, width: int, extractor: str) -> str:
+    """Hash a diagram together with everything that affects its rendering."""
+    digest = hashlib.sha256(f'{extractor}\0{width}\0'.encode('utf-8'))
+    with open(html_path, 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def render_diagram(html_path: str, width: int, extractor: str, extract_svg) -> tuple[str, bool]:
+    """Return (cached PNG path, cache hit), rendering the diagram on a miss."""
+    png_path = os.path.join(CACHE_DIR, f'{cache_key(html_path, width, extractor)}.png')
+    if os.path.exists(png_path):
+        return png_path, True
+
+    fd, svg_path = tempfile.mkstemp(suffix='.svg')
+    os.close(fd)
+    tmp_png = f'{png_path}.{os.getpid()}.{os.path.basename(svg_path)}.tmp'
+    try:
+        extract_svg(html_path, svg_path)
+        result = subprocess.run(
+            ['rsvg-convert', '-w', str(width), '-f', 'png', '-o', tmp_png, svg_path],
+            capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"rsvg-convert failed on {html_path}:\n{result.stderr}")
+        os.replace(tmp_png, png_path)
+    finally:
+        os.unlink(svg_path)
+        if os.path.exists(tmp_png):
+            os.unlink(tmp_png)
+
+    return png_path, False
+
+
+def png_size(path: str) -> tuple[int, int]:
+    """Read (width, height) from a PNG's IHDR chunk."""
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    if header[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError(f"Not a PNG file: {path}")
+    return struct.unpack('>II', header[16:24])
+
+
+def chapter_diagrams(book_dir: str, diagrams: list[str]) -> dict[str, list[str]]:
+    """Group diagram names by the chapter that references them, in order."""
+    known = set(diagrams)
+    groups = {}
+    referenced = set()
+
+    for chapter_path in sorted(glob.glob(os.path.join(book_dir, 'chapters', '*.md'))):
+        document = parse_file(chapter_path)
+        names = []
+        for block in document.blocks_of('image', 'paragraph'):
+            for line in document.block_lines(block):
+                for name in ASSET_REFERENCE_PATTERN.findall(line):
+                    if name in known and name not in names:
+                        names.append(name)
+        if names:
+            groups[os.path.splitext(os.path.basename(chapter_path))[0]] = names
+            referenced.update(names)
+
+    unreferenced = [name for name in diagrams if name not in referenced]
+    if unreferenced:
+        groups['unreferenced'] = unreferenced
+    return groups
+
+
+def contact_sheet_svg(title: str, entries: list[tuple[str, str]], columns: int,
+                      thumb_width: int) -> str:
+    """Return an SVG laying out (name, PNG path) entries in a labelled grid."""
+    cells = []
+    row_heights = []
+    for index, (name, png_path) in enumerate(entries):
+        width, height = png_size(png_path)
+        thumb_height = round(height * thumb_width / width) if width else thumb_width
+        if index % columns == 0:
+            row_heights.append(0)
+        row_heights[-1] = max(row_heights[-1], thumb_height)
+        cells.append((name, png_path, thumb_height))
+
+    sheet_width = GUTTER + columns * (thumb_width + GUTTER)
+    top = 60
+    elements = [
+        f'<text x="{GUTTER}" y="36" font-size="22" font-weight="600" '
+        f'font-family="{FONT}" fill="#1e293b">{escape(title)}</text>'
+    ]
+
+    y = top
+    for row, row_height in enumerate(row_heights):
+        for column in range(columns):
+            index = row * columns + column
+            if index >= len(cells):
+                break
+            name, png_path, thumb_height = cells[index]
+            x = GUTTER + column * (thumb_width + GUTTER)
+            with open(png_path, 'rb') as f:
+                data = base64.b64encode(f.read()).decode('ascii')
+            elements.append(
+                f'<text x="{x}" y="{y + 18}" font-size="14" font-family="{FONT}" '
+                f'fill="#334155">{escape(name)}</text>'
+            )
+            elements.append(
+                f'<rect x="{x - 1}" y="{y + LABEL_HEIGHT - 1}" width="{thumb_width + 2}" '
+                f'height="{thumb_height + 2}" fill="none" stroke="#cbd5e1"/>'
+            )
+            elements.append(
+                f'<image x="{x}" y="{y + LABEL_HEIGHT}" width="{thumb_width}" '
+                f'height="{thumb_height}" href="data:image/png;base64,{data}"/>'
+            )
+        y += LABEL_HEIGHT + row_height + GUTTER
+
+    body = '\n  '.join(elements)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{sheet_width}" height="{y}" '
+        f'viewBox="0 0 {sheet_width} {y}">\n'
+        f'  <rect width="{sheet_width}" height="{y}" fill="#ffffff"/>\n'
+        f'  {body}\n</svg>\n'
+    )
+
+
+def write_contact_sheet(output_path: str, title: str, entries: list[tuple[str, str]],
+                        columns: int, thumb_width: int) -> None:
+    """Render a contact sheet PNG for one chapter."""
+    fd, svg_path = tempfile.mkstemp(suffix='.svg')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(contact_sheet_svg(title, entries, columns, thumb_width))
+        result = subprocess.run(
+            ['rsvg-convert', '-f', 'png', '-o', output_path, svg_path],
+            capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"rsvg-convert failed on contact sheet {title}:\n{result.stderr}")
+    finally:
+        os.unlink(svg_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Render diagrams to cached PNGs and per-chapter contact sheets'
+    )
+    parser.add_argument('bookname', help='Book directory name under ebooks/')
+    parser.add_argument('--chapter', help='Only build the sheet for this chapter (e.g. 02-fundamentals)')
+    parser.add_argument('--width', type=int, default=1000,
+                        help='Rendered diagram width in pixels (default: 1000)')
+    parser.add_argument('--columns', type=int, default=3,
+                        help='Diagrams per contact sheet row (default: 3)')
+    parser.add_argument('--thumb-width', type=int, default=480,
+                        help='Diagram width on contact sheets in pixels (default: 480)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Parallel renders (default: CPU count)')
+    args = parser.parse_args()
+
+    if not shutil.which('rsvg-convert'):
+        print("Error: rsvg-convert is required (sudo apt install librsvg2-bin)", file=sys.stderr)
+        sys.exit(1)
+
+    book_dir = os.path.join(REPO_ROOT, 'ebooks', args.bookname)
+    if not os.path.isdir(book_dir):
+        print(f"Error: Book directory not found: {book_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    html_files = sorted(glob.glob(os.path.join(book_dir, 'assets', '*.html')))
+    if not html_files:
+        print(f"No HTML diagrams found in {book_dir}/assets")
+        return
+
+    diagrams = [os.path.splitext(os.path.basename(path))[0] for path in html_files]
+    groups = chapter_diagrams(book_dir, diagrams)
+    if args.chapter:
+        if args.chapter not in groups:
+            print(f"Error: No diagrams referenced by chapter '{args.chapter}'", file=sys.stderr)
+            sys.exit(1)
+        groups = {args.chapter: groups[args.chapter]}
+
+    wanted = {name for names in groups.values() for name in names}
+    paths = {name: path for name, path in zip(diagrams, html_files) if name in wanted}
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    extractor = extractor_digest()
+    extract_svg = load_extractor().extract_svg
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+            rendered = dict(zip(paths, pool.map(
+                lambda path: render_diagram(path, args.width, extractor, extract_svg),
+                paths.values(),
+            )))
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    misses = sum(1 for _, hit in rendered.values() if not hit)
+    print(f"  Rendered {misses} diagram(s), {len(rendered) - misses} from cache")
+
+    review_dir = os.path.join(REPO_ROOT, 'build', args.bookname, 'review')
+    os.makedirs(review_dir, exist_ok=True)
+    for name, (png_path, _) in rendered.items():
+        shutil.copyfile(png_path, os.path.join(review_dir, f'{name}.png'))
+
+    try:
+        for chapter, names in groups.items():
+            entries = [(name, rendered[name][0]) for name in names]
+            sheet = os.path.join(review_dir, f'{chapter}-contact-sheet.png')
+            write_contact_sheet(sheet, chapter, entries, max(args.columns, 1), args.thumb_width)
+            print(f"  Contact sheet: {os.path.relpath(sheet, REPO_ROOT)} ({len(names)} diagram(s))")
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Rewrite chapters for a build target.
+
+Used by build.py. For each chapter:
+1. Replace ../assets/*.html image references with the target extension
+   (.pdf for PDF, .svg for HTML/EPUB)
+2. Strip the "Chapter N: " prefix from H1 headings (pandoc adds chapter numbers)
+
+Code blocks are left untouched, so examples that happen to contain
+"# Chapter 1: " or asset-like paths are not rewritten.
+"""
+import os
+import re
+import sys
+
+from build_profile import profile_step
+from markdown_blocks import parse_file
+
+ASSET_REFERENCE_PATTERN = re.compile(r'(!\[.*\]\(\.\./assets/[^)]*)\.html\)')
+CHAPTER_PREFIX_PATTERN = re.compile(r'^# Chapter [0-9]*: ')
+
+
+def rewrite_chapter(path: str, target_ext: str) -> str:
+    """Return chapter content rewritten for the target asset extension."""
+    document = parse_file(path)
+    lines = list(document.lines)
+
+    for block in document.blocks:
+        if block.kind == 'code':
+            continue
+
+        for index in range(block.start - 1, block.end):
+            line = ASSET_REFERENCE_PATTERN.sub(rf'\1.{target_ext})', lines[index])
+            if block.kind == 'heading':
+                line = CHAPTER_PREFIX_PATTERN.sub('# ', line)
+            lines[index] = line
+
+    return '\n'.join(lines)
+
+
+def main():
+    if len(sys.argv) < 4:
+        print("Usage: rewrite-chapters.py <target-ext> <output-dir> <chapter.md>...",
+              file=sys.stderr)
+        sys.exit(1)
+
+    target_ext = sys.argv[1]
+    output_dir = sys.argv[2]
+
+    for path in sys.argv[3:]:
+        filename = os.path.basename(path)
+        with profile_step('preprocess', 'rewrite', filename):
+            content = rewrite_chapter(path, target_ext)
+        with open(os.path.join(output_dir, filename), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+if __name__ == '__main__':
+    main()
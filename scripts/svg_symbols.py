@@ -0,0 +1,283 @@
+"""Share repeated SVG content across the diagrams of a single-file HTML book.
+
+Pandoc embeds every diagram as an <img> with a base64 SVG data URI, so the
+arrowhead markers, gradients, shadow filters, boxes and legend groups the
+diagrams have in common are repeated (and base64-inflated) once per
+diagram. inline_diagrams() rewrites the book so that:
+
+- each diagram is an inline <svg> (keeping role="img" and the label)
+- <defs> children that are identical in several diagrams, ignoring their
+  id, are defined once in a hidden sheet at the start of <body> under a
+  content-derived id (d-<hash>), and references to them are rewritten
+- elements repeated verbatim across diagrams (at least MIN_SYMBOL_BYTES
+  serialized) are moved into the sheet as s-<hash> and replaced with
+  <use href="#s-<hash>"/>
+- every other id is prefixed per diagram (dN-<id>), since the diagrams
+  now share one document
+
+Diagrams that don't parse, or that carry <style> or <script> elements
+(which would apply to the whole page once inlined), are left as <img>.
+
+Usage (build.py runs this on html renders):
+  svg_symbols.py build/api-optimization/api-optimization.html
+"""
+import argparse
+import base64
+import hashlib
+import html
+import re
+import sys
+import xml.etree.ElementTree as ET
+
+SVG_NS = 'http://www.w3.org/2000/svg'
+XLINK_NS = 'http://www.w3.org/1999/xlink'
+ET.register_namespace('', SVG_NS)
+ET.register_namespace('xlink', XLINK_NS)
+
+IMG_PATTERN = re.compile(r'<img\b[^>]*\bsrc="data:image/svg\+xml;base64,[^"]*"[^>]*>')
+ATTR_PATTERN = re.compile(r'([a-zA-Z][\w:-]*)="([^"]*)"')
+BODY_PATTERN = re.compile(r'<body\b[^>]*>')
+URL_REF_PATTERN = re.compile(r'url\(\s*#([^)\s]+)\s*\)')
+
+HREF_ATTRS = ('href', f'{{{XLINK_NS}}}href')
+UNSAFE_TAGS = {f'{{{SVG_NS}}}style', f'{{{SVG_NS}}}script', 'style', 'script'}
+# Elements that may be replaced with <use>, and parents that may hold a <use>
+USABLE_TAGS = {f'{{{SVG_NS}}}{tag}' for tag in (
+    'g', 'rect', 'circle', 'ellipse', 'line', 'polyline', 'polygon', 'path', 'text', 'image',
+)}
+USE_PARENTS = {f'{{{SVG_NS}}}{tag}' for tag in ('svg', 'g', 'a', 'switch')}
+
+MIN_SYMBOL_BYTES = 200
+HASH_LENGTH = 10
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:HASH_LENGTH]
+
+
+def canonical(element: ET.Element, drop_id: bool = False) -> str:
+    """Serialize an element for comparison: whitespace-only text and its tail ignored."""
+    copy = _normalized_copy(element)
+    if drop_id:
+        copy.attrib.pop('id', None)
+    return ET.tostring(copy, encoding='unicode')
+
+
+def _normalized_copy(element: ET.Element, in_text: bool = False) -> ET.Element:
+    # Whitespace between <tspan>s is rendered, so it is kept inside <text>
+    in_text = in_text or element.tag == f'{{{SVG_NS}}}text'
+    copy = ET.Element(element.tag, dict(sorted(element.attrib.items())))
+    if element.text and (in_text or element.text.strip()):
+        copy.text = element.text
+    for child in element:
+        child_copy = _normalized_copy(child, in_text)
+        if child.tail and (in_text or child.tail.strip()):
+            child_copy.tail = child.tail
+        copy.append(child_copy)
+    return copy
+
+
+def has_ids(element: ET.Element) -> bool:
+    return any('id' in node.attrib for node in element.iter())
+
+
+def references(element: ET.Element) -> bool:
+    """Whether anything in the subtree refers to an id (url(#x) or href="#x")."""
+    for node in element.iter():
+        for name, value in node.attrib.items():
+            if URL_REF_PATTERN.search(value):
+                return True
+            if name in HREF_ATTRS and value.startswith('#'):
+                return True
+    return False
+
+
+def rewrite_references(root: ET.Element, ids: dict[str, str]) -> None:
+    """Point url(#x) and href="#x" references at the renamed ids."""
+    def replace_url(match: re.Match) -> str:
+        return f'url(#{ids.get(match.group(1), match.group(1))})'
+
+    for node in root.iter():
+        for name, value in node.attrib.items():
+            if name in HREF_ATTRS and value.startswith('#'):
+                node.set(name, '#' + ids.get(value[1:], value[1:]))
+            elif 'url(' in value:
+                node.set(name, URL_REF_PATTERN.sub(replace_url, value))
+
+
+class Diagram:
+    def __init__(self, match: re.Match, root: ET.Element, attrs: dict[str, str]):
+        self.match = match
+        self.root = root
+        self.attrs = attrs
+
+
+def parse_diagram(match: re.Match) -> Diagram | None:
+    attrs = {name: html.unescape(value) for name, value in ATTR_PATTERN.findall(match.group(0))}
+    data = attrs.pop('src').split(',', 1)[1]
+    try:
+        root = ET.fromstring(base64.b64decode(data))
+    except (ValueError, ET.ParseError):
+        return None
+    if root.tag != f'{{{SVG_NS}}}svg' or any(node.tag in UNSAFE_TAGS for node in root.iter()):
+        return None
+    return Diagram(match, root, attrs)
+
+
+def share_defs(diagrams: list[Diagram], sheet: dict[str, ET.Element]) -> None:
+    """Move <defs> children into the sheet and give the remaining ids a per-diagram prefix.
+
+    Only self-contained definitions (no nested ids, no references of their
+    own) are shared, so a shared definition never depends on a diagram.
+    """
+    for number, diagram in enumerate(diagrams, 1):
+        ids = {}
+        for defs in diagram.root.iter(f'{{{SVG_NS}}}defs'):
+            for child in list(defs):
+                old_id = child.get('id')
+                if (old_id is None or references(child)
+                        or any('id' in node.attrib for node in child.iter() if node is not child)):
+                    continue
+                shared_id = 'd-' + content_hash(canonical(child, drop_id=True))
+                if shared_id not in sheet:
+                    child.set('id', shared_id)
+                    child.tail = None
+                    sheet[shared_id] = child
+                ids[old_id] = shared_id
+                defs.remove(child)
+
+        for node in diagram.root.iter():
+            old_id = node.get('id')
+            if old_id is not None and old_id not in ids:
+                ids[old_id] = f'd{number}-{old_id}'
+                node.set('id', ids[old_id])
+        rewrite_references(diagram.root, ids)
+
+        for parent in list(diagram.root.iter()):
+            for child in list(parent):
+                if child.tag == f'{{{SVG_NS}}}defs' and len(child) == 0:
+                    parent.remove(child)
+
+
+def share_subtrees(diagrams: list[Diagram], sheet: dict[str, ET.Element]) -> int:
+    """Replace elements repeated across the book with <use> of one sheet copy.
+
+    Candidates are counted everywhere, then replaced top-down so the largest
+    repeated element wins and its repeated children aren't factored again.
+    Returns the number of elements replaced.
+    """
+    keys: dict[int, str] = {}
+    counts: dict[str, int] = {}
+    for diagram in diagrams:
+        for parent in diagram.root.iter():
+            if parent.tag not in USE_PARENTS:
+                continue
+            for child in parent:
+                if child.tag not in USABLE_TAGS or has_ids(child):
+                    continue
+                text = canonical(child)
+                if len(text) < MIN_SYMBOL_BYTES:
+                    continue
+                keys[id(child)] = text
+                counts[text] = counts.get(text, 0) + 1
+
+    replaced = 0
+
+    def factor(parent: ET.Element) -> None:
+        nonlocal replaced
+        for index, child in enumerate(list(parent)):
+            text = keys.get(id(child))
+            if text is not None and counts[text] > 1:
+                symbol_id = 's-' + content_hash(text)
+                if symbol_id not in sheet:
+                    shared = _normalized_copy(child)
+                    shared.set('id', symbol_id)
+                    sheet[symbol_id] = shared
+                use = ET.Element(f'{{{SVG_NS}}}use', {'href': f'#{symbol_id}'})
+                use.tail = child.tail
+                parent.remove(child)
+                parent.insert(index, use)
+                replaced += 1
+            elif child.tag in USE_PARENTS:
+                factor(child)
+
+    for diagram in diagrams:
+        factor(diagram.root)
+    return replaced
+
+
+def inline_svg(diagram: Diagram) -> str:
+    root = diagram.root
+    label = diagram.attrs.get('aria-label') or diagram.attrs.get('alt')
+    root.set('role', diagram.attrs.get('role', 'img'))
+    if label:
+        root.set('aria-label', label)
+    classes = ['diagram', *diagram.attrs.get('class', '').split()]
+    root.set('class', ' '.join(classes))
+    for name in ('style', 'width', 'height'):
+        if name in diagram.attrs:
+            root.set(name, diagram.attrs[name])
+    return ET.tostring(root, encoding='unicode')
+
+
+def inline_diagrams(document: str) -> tuple[str, dict]:
+    """Inline a book's SVG diagrams around one shared sheet.
+
+    Returns the new document and counts for logging.
+    """
+    diagrams = [diagram for diagram in map(parse_diagram, IMG_PATTERN.finditer(document))
+                if diagram is not None]
+    body = BODY_PATTERN.search(document)
+    stats = {'diagrams': len(diagrams), 'defs': 0, 'symbols': 0, 'uses': 0}
+    if not diagrams or body is None:
+        return document, stats
+
+    defs_sheet: dict[str, ET.Element] = {}
+    share_defs(diagrams, defs_sheet)
+    symbol_sheet: dict[str, ET.Element] = {}
+    stats['uses'] = share_subtrees(diagrams, symbol_sheet)
+    stats['defs'] = len(defs_sheet)
+    stats['symbols'] = len(symbol_sheet)
+
+    sheet = ET.Element(f'{{{SVG_NS}}}svg', {
+        'width': '0', 'height': '0', 'style': 'position:absolute', 'aria-hidden': 'true',
+        'focusable': 'false',
+    })
+    defs = ET.SubElement(sheet, f'{{{SVG_NS}}}defs')
+    defs.extend([*defs_sheet.values(), *symbol_sheet.values()])
+
+    # Splice back to front so earlier match offsets stay valid
+    parts = []
+    end = len(document)
+    for diagram in reversed(diagrams):
+        start, stop = diagram.match.span()
+        parts.append(document[stop:end])
+        parts.append(inline_svg(diagram))
+        end = start
+    head = document[:end]
+    insert_at = body.end()
+    parts.append(head[insert_at:])
+    parts.append('\n' + ET.tostring(sheet, encoding='unicode'))
+    parts.append(head[:insert_at])
+    return ''.join(reversed(parts)), stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Inline HTML diagrams around a shared SVG sheet")
+    parser.add_argument('html_file', help="Single-file HTML book to rewrite in place")
+    parser.add_argument('-o', '--output', help="Write here instead of in place")
+    args = parser.parse_args()
+
+    with open(args.html_file, encoding='utf-8') as f:
+        document = f.read()
+    result, stats = inline_diagrams(document)
+    with open(args.output or args.html_file, 'w', encoding='utf-8') as f:
+        f.write(result)
+    print(f"{stats['diagrams']} diagrams inlined, {stats['defs']} shared definitions, "
+          f"{stats['symbols']} symbols used {stats['uses']} times: "
+          f"{len(document.encode())} -> {len(result.encode())} bytes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())